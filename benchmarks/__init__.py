@@ -0,0 +1,11 @@
+'''
+Benchmarks of restbook's hot paths over synthetic workloads of growing
+size. Run them with:
+
+    python -m benchmarks
+
+Results can be saved as a baseline with --save and later runs compared
+against it with --compare, which fails if any benchmark has slowed down
+by more than the given tolerance. Baselines are saved locally and not
+committed, as they only hold for the machine they were saved on.
+'''
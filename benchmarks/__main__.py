@@ -0,0 +1,268 @@
+'''Runs the benchmarks and saves or compares against a baseline.'''
+
+###############################################################################
+
+import argparse
+from datetime import timedelta
+import json
+import os
+import random
+import sys
+
+##############################
+
+from restbook import controller, entities, storage
+from restbook import usecases as use
+
+from benchmarks import timing, workloads
+
+###############################################################################
+
+'''
+Baselines are only comparable on the machine they were saved on, so the
+default baseline is kept beside the benchmarks but is not committed.
+'''
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+SIZES = (4, 16, 64)
+
+'''
+Each benchmark takes a Workload and a random.Random and returns the
+function to be timed along with a setup function giving its argument,
+or None if it takes no argument.
+'''
+
+BENCHMARKS = {}
+
+###############################################################################
+
+def benchmark(function):
+    '''
+    Registers the given function as a benchmark under its name.
+    '''
+
+    BENCHMARKS[function.__name__] = function
+    return function
+
+##############################
+
+def _restaurant(workload):
+    '''
+    Stores the restaurant and bookings of the given workload using a
+    fresh storage.MemoryStorage, and returns the restaurant's UUID.
+    '''
+
+    controller.use_storage(storage.MemoryStorage())
+
+    restaurant_id = controller.restaurant_create(**workload.restaurant)
+    controller.bookings_create_many(restaurant_id, workload.bookings)
+
+    return restaurant_id
+
+###############################################################################
+
+@benchmark
+def seating_plan(workload, rng):
+    tables = workload.restaurant['tables']
+    _, bookings = workloads.period_bookings(workload)
+
+    return lambda _: use.seating_plan(tables, bookings), None
+
+##############################
+
+@benchmark
+def space_available(workload, rng):
+    tables = workload.restaurant['tables']
+    period, bookings = workloads.period_bookings(workload)
+
+    def requested_booking():
+        return entities.Booking(**workloads.booking(rng, [period]))
+
+    def run(booking):
+        use.space_available(booking, tables, bookings)
+
+    return run, requested_booking
+
+##############################
+
+@benchmark
+def booking_create(workload, rng):
+    restaurant_id = _restaurant(workload)
+    opening_times = workload.restaurant['opening_times']
+
+    def run(booking):
+        controller.booking_create(restaurant_id, **booking)
+
+    return run, lambda: workloads.booking(rng, opening_times)
+
+##############################
+
+@benchmark
+def generate_report(workload, rng):
+    restaurant_id = _restaurant(workload)
+    current_storage = controller.use_storage(storage.MemoryStorage())
+
+    '''
+    Kept seating plans and reports are discarded before each report by
+    setting the storage again, so that each one is generated afresh.
+    '''
+
+    def date():
+        controller.use_storage(current_storage)
+        return workloads.WEEK_START + timedelta(days=rng.randrange(7))
+
+    def run(date):
+        controller.generate_report(restaurant_id, date)
+
+    return run, date
+
+###############################################################################
+
+def run(names, layouts, sizes, density, repeat):
+    '''
+    Runs the named benchmarks against workloads of each of the given
+    layouts and sizes, and returns a dictionary of their summaries
+    keyed on 'name/layout/size'.
+    '''
+
+    results = {}
+
+    for name in names:
+        for layout in layouts:
+            for size in sizes:
+                workload = workloads.workload(size, layout, density)
+                rng = random.Random('{}-{}-{}'.format(name, layout, size))
+
+                function, setup = BENCHMARKS[name](workload, rng)
+                latencies = timing.measure(function, repeat, setup)
+
+                key = '{}/{}/{}'.format(name, layout, size)
+                results[key] = timing.summarise(latencies)
+
+                print(_format(key, results[key]), flush=True)
+
+    return results
+
+##############################
+
+def _format(key, summary):
+    return '{:<36} {:>12.1f} ops/s {}'.format(
+        key,
+        summary['ops_per_sec'],
+        ' '.join(
+            'p{}={:.1f}us'.format(n, summary['p{}_us'.format(n)])
+            for n in timing.PERCENTILES
+        )
+    )
+
+##############################
+
+def regressions(results, baseline, tolerance):
+    '''
+    Returns a list of the keys of the given results whose median
+    latency exceeds that of the given baseline by more than the given
+    fraction. Keys missing from the baseline are ignored.
+    '''
+
+    return [
+        key for key, summary in results.items()
+        if key in baseline and
+        summary['p50_us'] > baseline[key]['p50_us'] * (1 + tolerance)
+    ]
+
+###############################################################################
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument(
+        'names',
+        nargs='*',
+        metavar='name',
+        help='benchmarks to run, all by default: {}'.format(
+            ', '.join(sorted(BENCHMARKS))
+        )
+    )
+    parser.add_argument(
+        '--layouts',
+        nargs='+',
+        choices=sorted(workloads.LAYOUTS),
+        default=sorted(workloads.LAYOUTS)
+    )
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES)
+    parser.add_argument(
+        '--density',
+        type=int,
+        default=4,
+        help='bookings per table per day'
+    )
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument(
+        '--save',
+        nargs='?',
+        const=BASELINE,
+        metavar='PATH',
+        help='save the results as a baseline'
+    )
+    parser.add_argument(
+        '--compare',
+        nargs='?',
+        const=BASELINE,
+        metavar='PATH',
+        help='fail if slower than the given baseline'
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.25,
+        help='fraction by which median latency may exceed the baseline'
+    )
+
+    options = parser.parse_args(arguments)
+
+    for name in options.names:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark: {}'.format(name))
+
+    if options.compare and not os.path.exists(options.compare) and \
+        options.compare != options.save:
+        parser.error(
+            'no baseline at {}: save one on this machine with --save'.format(
+                options.compare
+            )
+        )
+
+    results = run(
+        options.names or sorted(BENCHMARKS),
+        options.layouts,
+        options.sizes,
+        options.density,
+        options.repeat
+    )
+
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+
+        slower = regressions(results, baseline, options.tolerance)
+
+        for key in slower:
+            print('Regression: {} p50 {:.1f}us, baseline {:.1f}us'.format(
+                key,
+                results[key]['p50_us'],
+                baseline[key]['p50_us']
+            ))
+
+        if slower:
+            return 1
+
+    return 0
+
+##############################
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+'''Timing of repeated calls, summarised as throughput and latencies.'''
+
+###############################################################################
+
+import gc
+from time import perf_counter
+
+###############################################################################
+
+PERCENTILES = (50, 90, 99)
+
+###############################################################################
+
+def measure(function, repeat, setup=None):
+    '''
+    Calls the given function the given number of times and returns a
+    list of how long each call took, in seconds. If setup is given it is
+    called, untimed, before each call and its result is passed to the
+    function. Garbage collection is paused while timing.
+    '''
+
+    latencies = []
+    enabled = gc.isenabled()
+
+    gc.disable()
+
+    try:
+        for _ in range(repeat):
+            argument = setup() if setup else None
+
+            started = perf_counter()
+            function(argument)
+            latencies.append(perf_counter() - started)
+    finally:
+        if enabled:
+            gc.enable()
+
+    return latencies
+
+##############################
+
+def percentile(ordered, n):
+    '''
+    Returns the nth percentile of the given sorted list, taking the
+    nearest rank.
+    '''
+
+    rank = max(1, -(-n * len(ordered) // 100))
+
+    return ordered[rank - 1]
+
+##############################
+
+def summarise(latencies):
+    '''
+    Returns a dictionary of the calls made per second and the latency
+    percentiles, in microseconds, of the given list of latencies.
+    '''
+
+    ordered = sorted(latencies)
+    total = sum(ordered)
+
+    summary = {
+        'calls': len(ordered),
+        'ops_per_sec': len(ordered) / total if total else float('inf'),
+    }
+
+    for n in PERCENTILES:
+        summary['p{}_us'.format(n)] = percentile(ordered, n) * 1e6
+
+    return summary
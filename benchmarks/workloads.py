@@ -0,0 +1,153 @@
+'''Reproducible synthetic restaurants and bookings for benchmarking.'''
+
+###############################################################################
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+import random
+
+##############################
+
+from restbook import entities
+from restbook.time import MinuteOffset
+
+###############################################################################
+
+'''
+Every workload is made within the ISO week beginning on WEEK_START, so
+that the bookings of a workload always fall within the same week.
+'''
+
+WEEK_START = datetime(2016, 5, 2)
+
+'''
+The opening times of a workload are laid out in one of the following
+ways, each given as a list of (day, opens, closes) tuples with the
+hours of each period:
+
+lunch_dinner: separate lunch and dinner services every day.
+all_day: a single long period every day.
+chained: short periods every day, each opening in the minute after the
+    previous one closes, so that bookings may span several of them.
+'''
+
+LAYOUTS = {
+    'lunch_dinner': [
+        (day, opens, closes)
+        for day in range(7)
+        for opens, closes in ((12, 15), (18, 23))
+    ],
+    'all_day': [
+        (day, 8, 23)
+        for day in range(7)
+    ],
+    'chained': [
+        (day, hour, hour + 1)
+        for day in range(7)
+        for hour in range(12, 23)
+    ],
+}
+
+'''
+A workload describes a restaurant, as the keyword arguments taken by
+controller.restaurant_create, along with the bookings made for it.
+'''
+
+Workload = namedtuple('Workload', ['restaurant', 'bookings'])
+
+###############################################################################
+
+def _opening_times(layout):
+    '''
+    Returns the opening times of the given layout, as a list of pairs
+    of MinuteOffsets.
+    '''
+
+    opening_times = []
+
+    for day, opens, closes in LAYOUTS[layout]:
+        time_opens = MinuteOffset.from_integers(day, opens, 0)
+        time_closes = MinuteOffset.from_integers(day, closes, 0)
+
+        if opening_times and opening_times[-1][1] == time_opens:
+            time_opens += 1
+
+        opening_times.append((time_opens, time_closes))
+
+    return opening_times
+
+##############################
+
+def booking(rng, opening_times, reference=None):
+    '''
+    Returns the keyword arguments taken by controller.booking_create,
+    less the restaurant_id, for a booking of between one and eight
+    covers lasting up to three hours. It starts on the quarter hour
+    within one of the given opening times, picked using the given
+    random.Random, though it may finish after that period closes.
+    '''
+
+    time_opens, time_closes = rng.choice(opening_times)
+    quarters = max(1, (time_closes - time_opens) // 15)
+
+    start = WEEK_START + timedelta(
+        minutes=time_opens + 15 * rng.randrange(quarters)
+    )
+
+    return {
+        'reference': reference,
+        'covers': rng.randint(1, 8),
+        'start': start,
+        'finish': start + timedelta(minutes=15 * rng.randint(2, 12)),
+    }
+
+##############################
+
+def workload(size, layout='lunch_dinner', density=4, seed=0):
+    '''
+    Returns a Workload with the given number of tables, of between two
+    and eight covers, opening times laid out as the given layout and
+    density bookings for each table and each day of the week. The same
+    arguments always give the same workload.
+    '''
+
+    rng = random.Random('{}-{}-{}-{}'.format(size, layout, density, seed))
+    opening_times = _opening_times(layout)
+
+    restaurant = {
+        'name': 'Synthetic {} x{}'.format(layout, size),
+        'description': 'A restaurant generated for benchmarking.',
+        'opening_times': opening_times,
+        'tables': [rng.choice((2, 2, 4, 4, 6, 8)) for _ in range(size)],
+    }
+
+    bookings = [
+        booking(rng, opening_times, reference='b{}'.format(n))
+        for n in range(size * density * 7)
+    ]
+
+    return Workload(restaurant, bookings)
+
+##############################
+
+def period_bookings(workload):
+    '''
+    Returns the opening period of the given workload holding the most
+    bookings, and the Bookings made within it.
+    '''
+
+    bookings = [entities.Booking(**x) for x in workload.bookings]
+    periods = entities.OpeningTimes(workload.restaurant['opening_times'])
+
+    best = None, []
+
+    for time_opens, time_closes in periods:
+        within = [
+            x for x in bookings
+            if x.within(WEEK_START, time_opens, time_closes)
+        ]
+
+        if len(within) > len(best[1]):
+            best = (time_opens, time_closes), within
+
+    return best
@@ -0,0 +1,182 @@
+
+'''Awaitable versions of the controller's functions for use with asyncio.'''
+
+###############################################################################
+
+import asyncio
+import functools
+import weakref
+
+##############################
+
+from restbook import controller
+
+###############################################################################
+
+'''
+The controller's functions run in an executor so that seating plans can
+be worked out without blocking the event loop. The loop's default
+executor is used unless another is given to use_executor.
+'''
+
+_executor = None
+
+'''
+Bookings for each restaurant wait on an asyncio.Lock of their own, so
+that however many are in flight, only one at a time is handed to the
+executor for each restaurant and none of its threads are left waiting.
+Locks belong to an event loop, so they are kept separately for each.
+'''
+
+_restaurant_locks = weakref.WeakKeyDictionary()
+
+###############################################################################
+
+def use_executor(executor):
+    '''
+    Runs the controller's functions using the given
+    concurrent.futures.Executor from now on. If None is given then each
+    event loop's default executor is used.
+    '''
+
+    global _executor
+    _executor = executor
+
+##############################
+
+def _restaurant_lock(restaurant_id):
+    '''
+    Returns the asyncio.Lock that bookings for the restaurant with the
+    given restaurant_id wait on.
+    '''
+
+    locks = _restaurant_locks.setdefault(asyncio.get_running_loop(), {})
+
+    try:
+        return locks[restaurant_id]
+    except KeyError:
+        return locks.setdefault(restaurant_id, asyncio.Lock())
+
+##############################
+
+async def _run(function, *args, **kwargs):
+    '''
+    Runs the given function with the given arguments in the executor
+    and returns its result.
+    '''
+
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(
+        _executor,
+        functools.partial(function, *args, **kwargs)
+    )
+
+###############################################################################
+
+async def restaurant_create(name, description, opening_times=None, tables=None):
+    '''
+    Awaitable version of controller.restaurant_create.
+    '''
+
+    return await _run(
+        controller.restaurant_create,
+        name=name,
+        description=description,
+        opening_times=opening_times,
+        tables=tables
+    )
+
+##############################
+
+async def restaurant_from_id(id):
+    '''
+    Awaitable version of controller.restaurant_from_id.
+    '''
+
+    return await _run(controller.restaurant_from_id, id)
+
+###############################################################################
+
+async def booking_create(restaurant_id, reference, covers, start, finish):
+    '''
+    Awaitable version of controller.booking_create.
+    '''
+
+    async with _restaurant_lock(restaurant_id):
+        return await _run(
+            controller.booking_create,
+            restaurant_id=restaurant_id,
+            reference=reference,
+            covers=covers,
+            start=start,
+            finish=finish
+        )
+
+##############################
+
+async def bookings_create_many(restaurant_id, bookings):
+    '''
+    Awaitable version of controller.bookings_create_many.
+    '''
+
+    async with _restaurant_lock(restaurant_id):
+        return await _run(
+            controller.bookings_create_many,
+            restaurant_id=restaurant_id,
+            bookings=list(bookings)
+        )
+
+##############################
+
+async def booking_from_id(id):
+    '''
+    Awaitable version of controller.booking_from_id.
+    '''
+
+    return await _run(controller.booking_from_id, id)
+
+##############################
+
+async def booking_update(id, covers=None, start=None, finish=None):
+    '''
+    Awaitable version of controller.booking_update.
+    '''
+
+    restaurant_id = await _run(controller.booking_restaurant_id, id)
+
+    if restaurant_id is None:
+        return False
+
+    async with _restaurant_lock(restaurant_id):
+        return await _run(
+            controller.booking_update,
+            id,
+            covers=covers,
+            start=start,
+            finish=finish
+        )
+
+##############################
+
+async def booking_cancel(id):
+    '''
+    Awaitable version of controller.booking_cancel.
+    '''
+
+    restaurant_id = await _run(controller.booking_restaurant_id, id)
+
+    if restaurant_id is None:
+        return False
+
+    async with _restaurant_lock(restaurant_id):
+        return await _run(controller.booking_cancel, id)
+
+##############################
+
+async def generate_report(restaurant_id, date):
+    '''
+    Awaitable version of controller.generate_report.
+    '''
+
+    return await _run(controller.generate_report, restaurant_id, date)
@@ -0,0 +1,270 @@
+'''Occupancy of each table over a week, for capacity dashboards.'''
+
+###############################################################################
+
+from datetime import timedelta
+
+import numpy
+
+##############################
+
+from restbook.time import MinuteOffset
+
+###############################################################################
+
+'''
+Occupancy is held as a matrix with a row for each table and a column for
+each minute of the week, holding the covers seated at that table in that
+minute. Bookings occupy the minutes from their start up to but not
+including their finish, and any part of a booking that runs past the
+end of the week is left out.
+'''
+
+MINUTES = MinuteOffset.MINUTES_IN_WEEK
+
+'''
+Plans are painted a batch at a time, with no more than CHUNK_TABLES
+tables in each batch unless a single plan has more, so that the working
+matrix stays small however many plans are given.
+'''
+
+CHUNK_TABLES = 256
+
+###############################################################################
+
+def _intervals(plan):
+    '''
+    Returns the number of tables in the given seating plan, as given by
+    usecases.seating_plan, along with arrays of the table, start
+    offset, finish offset and covers of each booking seated at a table.
+    Bookings assigned to None are left out.
+    '''
+
+    tables = [table for table in plan if table is not None]
+    seated = [
+        (table, booking)
+        for table in tables
+        for booking in plan[table]
+    ]
+
+    rows = numpy.array([table for table, _ in seated], dtype=numpy.intp)
+    covers = numpy.array([x.covers for _, x in seated], dtype=numpy.int32)
+    starts = numpy.array(
+        [x.start_dateinfo.offset for _, x in seated],
+        dtype=numpy.intp
+    )
+    durations = numpy.array(
+        [(x.finish - x.start) // timedelta(minutes=1) for _, x in seated],
+        dtype=numpy.intp
+    )
+
+    finishes = numpy.clip(starts + durations, starts, MINUTES)
+
+    return len(tables), rows, starts, finishes, covers
+
+##############################
+
+def _paint(height, rows, starts, finishes, values):
+    '''
+    Returns a matrix of the given height with a column for each minute
+    of the week, holding the sum of the given values over the minutes
+    from each start to each finish in the given rows.
+
+    Each interval only marks the minute it starts and the minute it
+    finishes, and a cumulative sum along each row fills in the minutes
+    between.
+    '''
+
+    steps = numpy.zeros((height, MINUTES + 1), dtype=numpy.int32)
+
+    numpy.add.at(steps, (rows, starts), values)
+    numpy.subtract.at(steps, (rows, finishes), values)
+
+    return numpy.cumsum(steps[:, :-1], axis=1, dtype=numpy.int32)
+
+##############################
+
+def open_minutes(opening_times):
+    '''
+    Returns a boolean array with an entry for each minute of the week,
+    which is True for the minutes within the given opening times.
+    '''
+
+    opens = numpy.array(
+        [time_opens for time_opens, _ in opening_times],
+        dtype=numpy.intp
+    )
+    closes = numpy.array(
+        [time_closes for _, time_closes in opening_times],
+        dtype=numpy.intp
+    )
+
+    opens = numpy.clip(opens, 0, MINUTES)
+    closes = numpy.clip(closes, opens, MINUTES)
+
+    painted = _paint(
+        1,
+        numpy.zeros(len(opens), dtype=numpy.intp),
+        opens,
+        closes,
+        1
+    )
+
+    return painted[0] > 0
+
+###############################################################################
+
+class Occupancy:
+    '''
+    The covers seated at each table in each minute of a week, with
+    reductions for summarising it.
+    '''
+
+    def __init__(self, matrix):
+        '''
+        Takes a matrix with a row for each table and a column for each
+        minute of the week.
+        '''
+
+        self.matrix = matrix
+
+##############################
+
+    def _minutes(self, opening_times):
+        '''
+        Returns the columns of the matrix within the given opening
+        times, or every column if None is given.
+        '''
+
+        if opening_times is None:
+            return self.matrix
+
+        return self.matrix[:, open_minutes(opening_times)]
+
+##############################
+
+    def covers_per_minute(self):
+        '''
+        Returns an array of the covers seated across every table in
+        each minute of the week.
+        '''
+
+        return self.matrix.sum(axis=0)
+
+##############################
+
+    def peak_covers(self):
+        '''
+        Returns the most covers seated at once during the week.
+        '''
+
+        if not len(self.matrix):
+            return 0
+
+        return int(self.covers_per_minute().max())
+
+##############################
+
+    def occupied_minutes(self, opening_times=None):
+        '''
+        Returns an array of the number of minutes each table has
+        someone seated at it, within the given opening times if any.
+        '''
+
+        return numpy.count_nonzero(self._minutes(opening_times), axis=1)
+
+##############################
+
+    def idle_table_minutes(self, opening_times=None):
+        '''
+        Returns the number of minutes, summed over every table, that a
+        table has nobody seated at it, within the given opening times
+        if any.
+        '''
+
+        minutes = self._minutes(opening_times)
+
+        return int(minutes.size - numpy.count_nonzero(minutes))
+
+##############################
+
+    def utilisation(self, opening_times=None):
+        '''
+        Returns an array of the fraction of minutes that each table has
+        someone seated at it, within the given opening times if any.
+        Tables are given a utilisation of 0 if there are no such
+        minutes.
+        '''
+
+        minutes = self._minutes(opening_times)
+        available = minutes.shape[1]
+
+        if not available:
+            return numpy.zeros(len(minutes))
+
+        return numpy.count_nonzero(minutes, axis=1) / available
+
+###############################################################################
+
+def occupancy(plan):
+    '''
+    Returns the Occupancy of the given seating plan, as given by
+    usecases.seating_plan, for a single week.
+    '''
+
+    return occupancies([plan])[0]
+
+##############################
+
+def occupancies(plans):
+    '''
+    Returns a list of the Occupancy of each of the given seating plans,
+    as given by usecases.seating_plan, each for a single week.
+
+    The tables of several plans are painted into one matrix at once, so
+    that the cost of working through many restaurants in a batch is
+    spread across few NumPy calls, while each matrix is kept to about
+    CHUNK_TABLES rows.
+    '''
+
+    found = []
+    heights = []
+    intervals = []
+    base = 0
+
+    for plan in plans:
+        height, rows, starts, finishes, covers = _intervals(plan)
+
+        if heights and base + height > CHUNK_TABLES:
+            found.extend(_occupancies(base, heights, intervals))
+            heights = []
+            intervals = []
+            base = 0
+
+        heights.append(height)
+        intervals.append((rows + base, starts, finishes, covers))
+        base += height
+
+    if heights:
+        found.extend(_occupancies(base, heights, intervals))
+
+    return found
+
+##############################
+
+def _occupancies(height, heights, intervals):
+    '''
+    Returns a list of the Occupancy of each of a batch of plans, given
+    the total number of tables, the number of tables in each plan and
+    the intervals of each plan with their rows offset to follow the
+    plans before it.
+    '''
+
+    rows, starts, finishes, covers = (
+        numpy.concatenate(column) for column in zip(*intervals)
+    )
+
+    matrix = _paint(height, rows, starts, finishes, covers)
+    bounds = numpy.cumsum(heights)[:-1]
+
+    return [Occupancy(x) for x in numpy.split(matrix, bounds)]
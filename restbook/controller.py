@@ -1,44 +1,444 @@
 
-'''A controller that stores restaurants and bookings in memory.'''
+'''A controller that stores restaurants and bookings, by default in memory.'''
 
 ###############################################################################
 
-from collections import defaultdict
+from collections import OrderedDict
+from datetime import timedelta
+import threading
 from uuid import uuid1 as generate_id
 
 ##############################
 
 from restbook import entities
+from restbook import instrumentation
+from restbook import storage
 from restbook import usecases as use
+from restbook.time import MinuteOffset, get_dateinfo
 
 ###############################################################################
 
 '''
-Restaurants and bookings are stored in dictionaries with their
-unique id acting as the key.
+Restaurants and bookings are kept by a storage object, as described by
+storage.Storage. They are stored in memory unless use_storage is called
+with another storage object, such as a storage.SQLiteStorage.
 '''
 
-_restaurants = {}
-_bookings = {}
+_storage = storage.MemoryStorage()
 
 '''
-We associate bookings with restaurants by listing them in a
-dictionary using the restaurant ID as the key.
+A seating plan is kept for each opening period that has been booked or
+reported upon, or one for each chain of periods that open in the minute
+after the last closes, so that bookings running across a chain and
+those within its periods share its tables. Plans are grouped by the
+restaurant ID and the ISO year and week they belong to, and then by the
+(opens, closes) offsets of the period or chain. They are updated as
+bookings are accepted, changed and cancelled rather than being
+generated afresh. Only the plans for the SEATING_PLAN_WEEKS most
+recently used weeks are kept, so that the plans need not hold every
+booking in storage.
+
+Each accepted booking is stored with the table it is seated at, and
+plans are made from those tables, so a booking keeps its table from
+one report to the next. Bookings are only moved when a new or changed
+booking could not otherwise be seated, and each move is stored too.
+'''
+
+SEATING_PLAN_WEEKS = 4096
+
+_seating_plans = OrderedDict()
+
+'''
+The part of a report describing each opening period is kept once it
+has been generated, grouped in the same way as seating plans, so that
+reports requested again and again cost no more than a lookup. A part
+is discarded whenever a booking is accepted, changed or cancelled
+within its opening period. Only the parts for the REPORT_WEEKS most
+recently used weeks are kept.
+'''
+
+REPORT_WEEKS = 1024
+
+_reports = OrderedDict()
+
+'''
+Once use_journal has been called, each restaurant and booking accepted
+is recorded by a journal.Journal before it is stored, and each booking
+changed or cancelled before it is replaced or removed.
+'''
+
+_journal = None
+_journal_lock = threading.Lock()
+
+'''
+The controller may be used from several threads at once. Each
+restaurant has its own lock, which is held while its bookings are
+checked, made and reported upon, so bookings for different restaurants
+can be made in parallel. Journalled changes are written one at a time
+so that snapshots always match the journal.
 '''
 
-_bookings_by_restaurant = defaultdict(list)
+_restaurant_locks = {}
+_restaurant_locks_lock = threading.Lock()
+
+###############################################################################
+
+def use_storage(new_storage):
+    '''
+    Stores restaurants and bookings using the given storage object from
+    now on, and returns the storage object used previously. Restaurants
+    and bookings are not copied from one to the other.
+    '''
+
+    global _storage
+
+    previous_storage = _storage
+    _storage = new_storage
+    _seating_plans.clear()
+    _reports.clear()
+
+    return previous_storage
+
+##############################
+
+def use_journal(new_journal):
+    '''
+    Restores the restaurants and bookings recorded by the given
+    journal.Journal into the current storage, then records each
+    restaurant and booking accepted from now on with that journal.
+    Returns the number of journal entries that were replayed. If None
+    is given then changes are no longer recorded. Any journal used
+    previously is closed.
+    '''
+
+    global _journal
+
+    if _journal is not None:
+        _journal.close()
+
+    replayed = 0
+
+    if new_journal is not None:
+        replayed = new_journal.restore(_storage)
+        _seating_plans.clear()
+        _reports.clear()
+
+    _journal = new_journal
+
+    return replayed
+
+##############################
+
+def _restaurant_lock(restaurant_id):
+    '''
+    Returns the lock held while making changes to the restaurant with
+    the given restaurant_id.
+    '''
+
+    try:
+        return _restaurant_locks[restaurant_id]
+    except KeyError:
+        with _restaurant_locks_lock:
+            return _restaurant_locks.setdefault(
+                restaurant_id,
+                threading.RLock()
+            )
+
+##############################
+
+def _checkpoint():
+    '''
+    Writes a snapshot of the storage with the journal, if one is due.
+    Should only be called while holding _journal_lock.
+    '''
+
+    if _journal.snapshot_due():
+        _journal.snapshot(_storage)
+
+##############################
+
+def _record_restaurant(id, restaurant):
+    '''
+    Stores the given restaurant under the given id, recording it with
+    the journal first if there is one.
+    '''
+
+    if _journal is None:
+        _storage.restaurant_add(id, restaurant)
+        return
+
+    with _journal_lock:
+        _journal.restaurant_created(id, restaurant)
+        _storage.restaurant_add(id, restaurant)
+        _checkpoint()
+
+##############################
+
+def _record_booking(id, restaurant_id, booking):
+    '''
+    Stores the given booking under the given id, recording it with the
+    journal first if there is one.
+    '''
+
+    if _journal is None:
+        _storage.booking_add(id, restaurant_id, booking)
+        return
+
+    with _journal_lock:
+        _journal.booking_created(id, restaurant_id, booking)
+        _storage.booking_add(id, restaurant_id, booking)
+        _checkpoint()
+
+##############################
+
+def _record_update(id, booking):
+    '''
+    Replaces the booking stored under the given id with the given
+    booking, recording the change with the journal first if there is
+    one.
+    '''
+
+    if _journal is None:
+        _storage.booking_replace(id, booking)
+        return
+
+    with _journal_lock:
+        _journal.booking_updated(id, booking)
+        _storage.booking_replace(id, booking)
+        _checkpoint()
+
+##############################
+
+def _record_seats(moves):
+    '''
+    Sets the table of each booking stored under an id in the given
+    dictionary of moves, as given by StableSeatingPlan.place, to the
+    table it is mapped to. Each is recorded with the journal first if
+    there is one. Moves keyed on None are ignored.
+    '''
+
+    moves = [(id, table) for id, table in moves.items() if id is not None]
+
+    if not moves:
+        return
+
+    if _journal is None:
+        for id, table in moves:
+            _storage.booking_seat(id, table)
+        return
+
+    with _journal_lock:
+        for id, table in moves:
+            _journal.booking_seated(id, table)
+            _storage.booking_seat(id, table)
+        _checkpoint()
+
+##############################
+
+def _record_cancellation(id):
+    '''
+    Removes the booking stored under the given id, recording its
+    cancellation with the journal first if there is one. Returns the
+    removed booking, or None if there was no such booking.
+    '''
+
+    if _journal is None:
+        return _storage.booking_remove(id)
+
+    with _journal_lock:
+        if _storage.booking_get(id) is None:
+            return None
+
+        _journal.booking_cancelled(id)
+        booking = _storage.booking_remove(id)
+        _checkpoint()
+
+    return booking
 
 ###############################################################################
 
-def restaurant_create(name, description, opening_times=None, tables=None):
+def _week_key(restaurant_id, datetime_context):
+    '''
+    Returns a key of the given restaurant_id with the ISO year and week
+    of the given datetime_context.
+    '''
+
+    dateinfo = get_dateinfo(datetime_context)
+
+    return restaurant_id, dateinfo.year, dateinfo.week
+
+##############################
+
+def _week_entries(cache, week_key, weeks):
+    '''
+    Returns the dictionary kept in the given cache for the week with
+    the given week_key, discarding those of the least recently used
+    weeks if there are more than the given number of weeks.
+    '''
+
+    entries = cache.get(week_key)
+
+    if entries is not None:
+        try:
+            cache.move_to_end(week_key)
+        except KeyError:
+            pass
+        return entries
+
+    entries = cache[week_key] = {}
+
+    '''
+    Another thread may discard entries at the same time, but they can
+    always be generated again from storage.
+    '''
+
+    while len(cache) > weeks:
+        try:
+            cache.popitem(last=False)
+        except KeyError:
+            break
+
+    return entries
+
+##############################
+
+def _week_plans(week_key):
+    '''
+    Returns the dictionary of seating plans kept for the week with the
+    given week_key.
+    '''
+
+    return _week_entries(_seating_plans, week_key, SEATING_PLAN_WEEKS)
+
+##############################
+
+def _plan_period(restaurant, time_opens, time_closes):
+    '''
+    Returns the opening and closing offsets of the chain of periods of
+    the given restaurant that holds the given opening period, or those
+    of the period itself if it is not chained to another. A chain has a
+    single seating plan, so that the bookings that run across it and
+    those within each of its periods are seated together.
+    '''
+
+    index = restaurant.opening_times.periods_index()
+    chain = index.chain_fulfilling(time_opens, time_closes) if index else []
+
+    if not chain:
+        return time_opens, time_closes
+
+    return chain[0][0], chain[-1][1]
+
+##############################
+
+def _seating_plan(week_key, restaurant, time_opens, time_closes):
+    '''
+    Returns the StableSeatingPlan for the given opening period of the
+    given restaurant in the week identified by the given week_key,
+    which is that of the chain of periods holding it, as given by
+    _plan_period. The plan is made from the bookings already accepted
+    if it has not been used before. Any booking that the plan seats at
+    a table other than the one stored with it is stored with its new
+    table.
+    '''
+
+    plans = _week_plans(week_key)
+    period = _plan_period(restaurant, time_opens, time_closes)
+
+    if period not in plans:
+        if instrumentation.enabled:
+            instrumentation.count('seating_plans_built')
+
+        plans[period] = use.StableSeatingPlan(
+            restaurant.tables,
+            _storage.booking_items_for_period(*week_key, *period)
+        )
+        _record_seats(plans[period].changes)
+    elif instrumentation.enabled:
+        instrumentation.count('seating_plans_kept')
+
+    return plans[period]
+
+##############################
+
+def _update_periods(period, booking, update):
+    '''
+    Calls the given update with each seating plan kept for the week
+    that the given booking falls within, and with the plan of the given
+    period, as given by _opening_period, whether or not the booking
+    falls within it. Bookings may be moved anywhere in those plans, so
+    the reports of every opening period they cover are discarded.
+    '''
+
+    week_key, opening_time, closing_time = period
+    plans = _seating_plans.get(week_key, {})
+
+    affected = [
+        (time_opens, time_closes)
+        for time_opens, time_closes in plans
+        if (time_opens, time_closes) == (opening_time, closing_time) or
+        booking.within(booking.start, time_opens, time_closes)
+    ]
+
+    if opening_time is not None:
+        affected.append((opening_time, closing_time))
+
+    for time_opens, time_closes in set(affected):
+        if (time_opens, time_closes) in plans:
+            update(plans[(time_opens, time_closes)])
+
+    reports = _reports.get(week_key, {})
+
+    for time_opens, time_closes in list(reports):
+        if any(
+            time_opens >= plan_opens and time_closes <= plan_closes
+            for plan_opens, plan_closes in affected
+        ):
+            reports.pop((time_opens, time_closes), None)
+
+##############################
+
+def _store_booking(id, period, booking, moves):
+    '''
+    Stores the given accepted booking under the given id, at the table
+    that the given moves, as given by StableSeatingPlan.place, key on
+    None. The other bookings moved are stored with their new tables,
+    and the moves are made in the seating plan of the given period,
+    which gave them, and of each opening period that the booking falls
+    within.
+    '''
+
+    booking.table = moves[None]
+
+    _record_seats(moves)
+    _record_booking(id, period[0][0], booking)
+    _update_periods(
+        period,
+        booking,
+        lambda plan: plan.insert(id, booking, moves)
+    )
+
+###############################################################################
+
+def restaurant_create(
+    name,
+    description,
+    opening_times=None,
+    tables=None,
+    id=None
+):
     '''
     Takes the properties of a restaurant, generates a UUID for it and,
     if that restaurant passes validation, stores it for later retreival.
     If a restaurant is successfully stored, its UUID is returned.
     Otherwise, the return value is None.
+
+    A UUID may be given as id to be used in place of a generated one,
+    for when restaurants are assigned their UUIDs elsewhere.
     '''
 
-    id = generate_id()
+    if id is None:
+        id = generate_id()
 
     restaurant = entities.Restaurant(
         name=name,
@@ -48,7 +448,7 @@ def restaurant_create(name, description, opening_times=None, tables=None):
     )
 
     if restaurant.is_valid():
-        _restaurants[id] = restaurant
+        _record_restaurant(id, restaurant)
         return id
     else:
         return None
@@ -62,13 +462,76 @@ def restaurant_from_id(id):
     returns None.
     '''
 
-    try:
-        return _restaurants[id]
-    except KeyError:
-        return None
+    return _storage.restaurant_get(id)
 
 ###############################################################################
 
+def _opening_period(restaurant_id, restaurant, booking):
+    '''
+    Returns the week key and the opening and closing offsets of the
+    seating plan that the given booking is placed in, as given by
+    _plan_period for the opening period it is made within, or None if
+    the restaurant is not open for the whole booking.
+    '''
+
+    restaurant_open = use.fulfills_times(
+        opening_times=restaurant.opening_times,
+        start=booking.start,
+        finish=booking.finish
+    )
+
+    if not restaurant_open:
+        return None
+
+    opening_time, closing_time = _plan_period(
+        restaurant,
+        *restaurant_open[0]
+    )
+    dateinfo = booking.start_dateinfo
+
+    return (
+        (restaurant_id, dateinfo.year, dateinfo.week),
+        opening_time,
+        closing_time
+    )
+
+##############################
+
+def _booking_period(restaurant_id, restaurant, booking):
+    '''
+    Returns the opening period of the given stored booking as given by
+    _opening_period, or its week key with no opening and closing
+    offsets if the restaurant is no longer open for the whole booking.
+    '''
+
+    return _opening_period(restaurant_id, restaurant, booking) or \
+        (_week_key(restaurant_id, booking.start), None, None)
+
+##############################
+
+def _accept_booking(restaurant, plan, period, booking):
+    '''
+    Stores the given booking if it can be placed in the given seating
+    plan, that of the given period as given by _opening_period, without
+    leaving any other booking unseated. Returns the UUID of the stored
+    booking or None.
+    '''
+
+    if not restaurant.tables:
+        return None
+
+    moves = plan.place(booking)
+
+    if moves is None:
+        return None
+
+    id = generate_id()
+    _store_booking(id, period, booking, moves)
+
+    return id
+
+##############################
+
 def booking_create(restaurant_id, reference, covers, start, finish):
     '''
     Takes a restaurant_id generated by restaurant_create, a booking
@@ -82,41 +545,274 @@ def booking_create(restaurant_id, reference, covers, start, finish):
     if not restaurant:
         return None
 
-    restaurant_open = use.fulfills_times(
-        opening_times=restaurant.opening_times,
+    requested_booking = entities.Booking(
+        reference=reference,
+        covers=covers,
         start=start,
         finish=finish
     )
 
-    if not restaurant_open:
+    period = _opening_period(restaurant_id, restaurant, requested_booking)
+
+    if not period:
         return None
 
-    opening_time, closing_time = restaurant_open[0]
+    week_key, opening_time, closing_time = period
 
-    tables = restaurant.tables
+    with _restaurant_lock(restaurant_id):
+        plan = _seating_plan(
+            week_key,
+            restaurant,
+            opening_time,
+            closing_time
+        )
 
-    existing_bookings = use.relevant_bookings(
-        bookings=_bookings_by_restaurant[restaurant_id],
-        datetime_context=start,
-        start_offset=opening_time,
-        end_offset=closing_time
-    )
+        return _accept_booking(restaurant, plan, period, requested_booking)
 
-    requested_booking = entities.Booking(
-        reference=reference,
-        covers=covers,
-        start=start,
-        finish=finish
-    )
+##############################
 
-    if use.space_available(requested_booking, tables, existing_bookings):
-        id = generate_id()
-        _bookings[id] = requested_booking
-        _bookings_by_restaurant[restaurant_id].append(requested_booking)
-        return id
-    else:
+def bookings_create_many(restaurant_id, bookings):
+    '''
+    Takes a restaurant_id generated by restaurant_create and an
+    iterable of bookings, each a dictionary holding the reference,
+    covers, start and finish arguments taken by booking_create, and
+    makes each booking in turn. Returns a list holding the UUID of each
+    new booking, or None where a booking could not be made, in the
+    order that the bookings were given.
+
+    The bookings are grouped by the opening period they fall within so
+    that each period's seating plan is only looked up once, however
+    many bookings are made within it.
+    '''
+
+    requested_bookings = [entities.Booking(**x) for x in bookings]
+
+    restaurant = restaurant_from_id(restaurant_id)
+
+    if not restaurant:
+        return [None] * len(requested_bookings)
+
+    periods = [
+        _opening_period(restaurant_id, restaurant, x)
+        for x in requested_bookings
+    ]
+
+    plans = {}
+    results = []
+
+    with _restaurant_lock(restaurant_id):
+        for booking, period in zip(requested_bookings, periods):
+            if not period:
+                results.append(None)
+                continue
+
+            if period not in plans:
+                week_key, opening_time, closing_time = period
+                plans[period] = _seating_plan(
+                    week_key,
+                    restaurant,
+                    opening_time,
+                    closing_time
+                )
+
+            results.append(
+                _accept_booking(restaurant, plans[period], period, booking)
+            )
+
+    return results
+
+##############################
+
+def find_available_slots(
+    restaurant_id,
+    covers,
+    duration,
+    around,
+    limit=5,
+    granularity=timedelta(minutes=15),
+    horizon=timedelta(days=1)
+):
+    '''
+    Takes a restaurant_id generated by restaurant_create, a number of
+    covers, a duration given as a timedelta and a datetime around which
+    to search. Returns a list of up to limit start times at which
+    booking_create would accept a booking of that many covers and of
+    that duration, nearest to around first. Times are tried every
+    granularity before and after around, up to horizon away. Returns
+    None if there is no such restaurant. Raises a ValueError if
+    granularity is not positive or limit is negative.
+
+    Each opening period's seating plan is only looked up once however
+    many times are tried within it.
+    '''
+
+    if granularity <= timedelta(0):
+        raise ValueError('Slots must be searched for in positive steps.')
+    elif limit < 0:
+        raise ValueError('The number of slots cannot be negative.')
+
+    restaurant = restaurant_from_id(restaurant_id)
+
+    if not restaurant:
         return None
 
+    if not restaurant.tables:
+        return []
+
+    steps = horizon // granularity
+    offsets = [0]
+
+    for n in range(1, steps + 1):
+        offsets.extend((-n, n))
+
+    slots = []
+    plans = {}
+
+    with _restaurant_lock(restaurant_id):
+        for n in offsets:
+            if len(slots) >= limit:
+                break
+
+            start = around + n * granularity
+
+            booking = entities.Booking(
+                reference=None,
+                covers=covers,
+                start=start,
+                finish=start + duration
+            )
+
+            period = _opening_period(restaurant_id, restaurant, booking)
+
+            if not period:
+                continue
+
+            if period not in plans:
+                plans[period] = _seating_plan(
+                    period[0],
+                    restaurant,
+                    period[1],
+                    period[2]
+                )
+
+            if plans[period].fits(booking):
+                slots.append(start)
+
+    return slots
+
+##############################
+
+def booking_cancel(id):
+    '''
+    Cancels the booking with the given UUID returned by booking_create,
+    freeing its table. Returns True if the booking was cancelled, or
+    False if there is no such booking.
+
+    The booking is removed from the seating plan of each opening period
+    that it falls within, leaving every other booking at its table, and
+    the reports of those periods are discarded.
+    '''
+
+    restaurant_id = _storage.booking_restaurant(id)
+
+    if restaurant_id is None:
+        return False
+
+    restaurant = restaurant_from_id(restaurant_id)
+
+    with _restaurant_lock(restaurant_id):
+        booking = _record_cancellation(id)
+
+        if booking is None:
+            return False
+
+        _update_periods(
+            _booking_period(restaurant_id, restaurant, booking),
+            booking,
+            lambda plan: plan.remove(id)
+        )
+
+    return True
+
+##############################
+
+def booking_update(id, covers=None, start=None, finish=None):
+    '''
+    Changes the covers, start or finish of the booking with the given
+    UUID returned by booking_create, keeping its reference and UUID.
+    Details that are not given are kept as they are, except that if
+    only the start is given then the booking keeps its length. Returns
+    True if the booking was changed, or False if there is no such
+    booking or the changed booking would not be accepted.
+
+    The changed booking must be placed in the seating plan of its
+    opening period with the original booking left out, as a new booking
+    would be. If it can be, the original is removed from, and the
+    changed booking added to, the seating plan of each opening period
+    that they fall within, moving only the bookings that must move.
+    Otherwise nothing is changed.
+    '''
+
+    restaurant_id = _storage.booking_restaurant(id)
+
+    if restaurant_id is None:
+        return False
+
+    restaurant = restaurant_from_id(restaurant_id)
+
+    with _restaurant_lock(restaurant_id):
+        booking = _storage.booking_get(id)
+
+        if booking is None:
+            return False
+
+        if start is not None and finish is None:
+            finish = start + (booking.finish - booking.start)
+
+        changed_booking = entities.Booking(
+            reference=booking.reference,
+            covers=booking.covers if covers is None else covers,
+            start=booking.start if start is None else start,
+            finish=booking.finish if finish is None else finish
+        )
+
+        period = _opening_period(restaurant_id, restaurant, changed_booking)
+
+        if not period or not restaurant.tables:
+            return False
+
+        week_key, opening_time, closing_time = period
+
+        plan = _seating_plan(
+            week_key,
+            restaurant,
+            opening_time,
+            closing_time
+        )
+
+        moves = plan.place(changed_booking, excluding=id)
+
+        if moves is None:
+            return False
+
+        changed_booking.table = moves[None]
+
+        _record_seats(moves)
+        _record_update(id, changed_booking)
+
+        _update_periods(
+            _booking_period(restaurant_id, restaurant, booking),
+            booking,
+            lambda plan: plan.remove(id)
+        )
+        _update_periods(
+            period,
+            changed_booking,
+            lambda plan: plan.insert(id, changed_booking, moves)
+        )
+
+    return True
+
 ##############################
 
 def booking_from_id(id):
@@ -126,46 +822,236 @@ def booking_from_id(id):
     None.
     '''
 
-    try:
-        return _bookings[id]
-    except KeyError:
-        return None
+    return _storage.booking_get(id)
 
 ##############################
 
-def generate_report(restaurant_id, date):
+def booking_restaurant_id(id):
+    '''
+    Returns the UUID of the restaurant that the booking with the given
+    UUID returned by booking_create was made for, or None if there is
+    no such booking.
+    '''
 
-    restaurant = restaurant_from_id(restaurant_id)
+    return _storage.booking_restaurant(id)
 
-    report = ['Restaurant: {}'.format(restaurant.name)]
+##############################
 
-    start_of_day = date.replace(hour=0, minute=0)
-    end_of_day = date.replace(hour=23, minute=59)
+def _overlaps(booking, time_opens, time_closes):
+    '''
+    Returns True if the given booking is in the restaurant for any part
+    of the opening period with the given offsets. Bookings that run
+    into the next week are taken to finish past the end of this one.
+    '''
 
-    matching_times = use.opens_within_times(
+    start_offset = booking.start_dateinfo.offset
+    finish_offset = booking.finish_dateinfo.offset
+
+    if finish_offset < start_offset:
+        finish_offset += MinuteOffset.MINUTES_IN_WEEK
+
+    return start_offset <= time_closes and finish_offset >= time_opens
+
+##############################
+
+def _period_report(time_opens, time_closes, plan):
+    '''
+    Returns the part of a report describing the opening period with the
+    given offsets, listing the bookings of its StableSeatingPlan that
+    are in the restaurant during the period. A plan shared by a chain
+    of periods also holds the bookings of the others.
+    '''
+
+    report = ['Opening Period: {}-{}'.format(time_opens, time_closes)]
+
+    report.append('Tables:')
+    for table, bookings in plan.as_dict().items():
+        report.append(
+            '\t{table_number}: {bookings}'.format(
+                table_number=table,
+                bookings=[
+                    str(x) for x in bookings
+                    if _overlaps(x, time_opens, time_closes)
+                ]
+            )
+        )
+
+    return '\n'.join(report)
+
+##############################
+
+def _report(restaurant, week_key, periods, seating_plans):
+    '''
+    Returns a report for the given restaurant of the given opening
+    periods of the week identified by the given week_key. The parts of
+    the report that have not been kept are generated from the seating
+    plans given by seating_plans, which is called with a list of those
+    periods. Should be called while the restaurant's lock is held.
+    '''
+
+    reports = _week_entries(_reports, week_key, REPORT_WEEKS)
+    missing = [period for period in periods if period not in reports]
+
+    if instrumentation.enabled:
+        instrumentation.count('report_parts_built', len(missing))
+        instrumentation.count('report_parts_kept', len(periods) - len(missing))
+
+    if missing:
+        plans = seating_plans(missing)
+
+        for time_opens, time_closes in missing:
+            reports[(time_opens, time_closes)] = _period_report(
+                time_opens,
+                time_closes,
+                plans[(time_opens, time_closes)]
+            )
+
+    return '\n'.join(
+        ['Restaurant: {}'.format(restaurant.name)] +
+        [reports[period] for period in periods]
+    )
+
+##############################
+
+def _periods_of_day(restaurant, date):
+    '''
+    Returns the opening periods of the given restaurant that open on
+    the day of the given date.
+    '''
+
+    return use.opens_within_times(
         opening_times=restaurant.opening_times,
-        start=start_of_day,
-        finish=end_of_day
+        start=date.replace(hour=0, minute=0),
+        finish=date.replace(hour=23, minute=59)
     )
 
-    for time_opens, time_closes in matching_times:
-        report.append('Opening Period: {}-{}'.format(time_opens, time_closes))
+##############################
+
+def generate_report(restaurant_id, date):
 
-        booked = use.relevant_bookings(
-            bookings=_bookings_by_restaurant[restaurant_id],
-            datetime_context=date,
-            start_offset=time_opens,
-            end_offset=time_closes
+    restaurant = restaurant_from_id(restaurant_id)
+    matching_times = _periods_of_day(restaurant, date)
+
+    week_key = _week_key(restaurant_id, date)
+
+    def seating_plans(periods):
+        return {
+            period: _seating_plan(week_key, restaurant, *period)
+            for period in periods
+        }
+
+    with _restaurant_lock(restaurant_id):
+        return _report(
+            restaurant,
+            week_key,
+            [tuple(period) for period in matching_times],
+            seating_plans
         )
 
-        report.append('Tables:')
-        for table, bookings in use.seating_plan(restaurant.tables, booked).items():
-            report.append(
-                '\t{table_number}: {bookings}'.format(
-                    table_number=table,
-                    bookings=[str(x) for x in bookings]
+##############################
+
+def _week_seating_plans(week_key, restaurant, periods):
+    '''
+    Returns a dictionary of the StableSeatingPlan for each of the given
+    opening periods of the given restaurant in the week identified by
+    the given week_key, each being the plan of the chain of periods
+    holding it, as given by _plan_period. Plans that have not been used
+    before are made together from a single read of the week's bookings,
+    which are divided between the plans they are placed in.
+    '''
+
+    plans = _week_plans(week_key)
+    plan_periods = {
+        period: _plan_period(restaurant, *period) for period in periods
+    }
+    missing = set(
+        plan_period
+        for plan_period in plan_periods.values()
+        if plan_period not in plans
+    )
+
+    if missing:
+        if instrumentation.enabled:
+            instrumentation.count('seating_plans_built', len(missing))
+
+        buckets = {period: [] for period in missing}
+
+        for id, booking in _storage.booking_items_for_week(*week_key):
+            start_offset = booking.start_dateinfo.offset
+            finish_offset = booking.finish_dateinfo.offset
+
+            for time_opens, time_closes in missing:
+                if start_offset >= time_opens and finish_offset <= time_closes:
+                    buckets[(time_opens, time_closes)].append((id, booking))
+
+        for period, items in buckets.items():
+            plans[period] = use.StableSeatingPlan(restaurant.tables, items)
+            _record_seats(plans[period].changes)
+
+    return {
+        period: plans[plan_period]
+        for period, plan_period in plan_periods.items()
+    }
+
+##############################
+
+def generate_report_range(restaurant_id, start_date, end_date):
+    '''
+    Yields a (date, report) pair for each day from the given start_date
+    to the given end_date inclusive, with each report as given by
+    generate_report. The bookings for each week in the range are only
+    read once, and reports are generated a week at a time as they are
+    needed.
+    '''
+
+    restaurant = restaurant_from_id(restaurant_id)
+    days = (end_date.date() - start_date.date()).days + 1
+
+    week = []
+
+    for n in range(days):
+        date = start_date + timedelta(days=n)
+        week.append((date, _periods_of_day(restaurant, date)))
+
+        if n + 1 < days and \
+            _week_key(restaurant_id, date + timedelta(days=1)) == \
+            _week_key(restaurant_id, date):
+            continue
+
+        week_key = _week_key(restaurant_id, date)
+
+        periods = [
+            tuple(period)
+            for _, matching_times in week
+            for period in matching_times
+        ]
+
+        def seating_plans(periods):
+            return _week_seating_plans(week_key, restaurant, periods)
+
+        with _restaurant_lock(restaurant_id):
+
+            '''
+            The seating plans for every part of the week's reports that
+            has not been kept are generated together beforehand.
+            '''
+
+            kept = _week_entries(_reports, week_key, REPORT_WEEKS)
+            seating_plans([x for x in periods if x not in kept])
+
+            reports = [
+                (
+                    day,
+                    _report(
+                        restaurant,
+                        week_key,
+                        [tuple(period) for period in matching_times],
+                        seating_plans
+                    )
                 )
-            )
+                for day, matching_times in week
+            ]
 
-    return '\n'.join(report)
+        week = []
 
+        yield from reports
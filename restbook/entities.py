@@ -3,6 +3,7 @@
 
 ###############################################################################
 
+from bisect import bisect_left, bisect_right
 from collections import UserList
 
 from restbook.time import MinuteOffset, get_dateinfo
@@ -155,6 +156,71 @@ class OpeningTimes(UserList):
 
         super().__init__((convert(a), convert(b)) for a, b in given)
 
+        self._index = None
+        self._indexed = False
+
+##############################
+
+    def _changed(self):
+        '''
+        Marks the index as out of date, so that it is built again when
+        next needed. Each method that changes the list calls this.
+        '''
+
+        self._index = None
+        self._indexed = False
+
+    def __setitem__(self, i, item):
+        super().__setitem__(i, item)
+        self._changed()
+
+    def __delitem__(self, i):
+        super().__delitem__(i)
+        self._changed()
+
+    def __iadd__(self, other):
+        result = super().__iadd__(other)
+        self._changed()
+        return result
+
+    def __imul__(self, n):
+        result = super().__imul__(n)
+        self._changed()
+        return result
+
+    def append(self, item):
+        super().append(item)
+        self._changed()
+
+    def insert(self, i, item):
+        super().insert(i, item)
+        self._changed()
+
+    def pop(self, i=-1):
+        item = super().pop(i)
+        self._changed()
+        return item
+
+    def remove(self, item):
+        super().remove(item)
+        self._changed()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def reverse(self):
+        super().reverse()
+        self._changed()
+
+    def sort(self, *args, **kwds):
+        super().sort(*args, **kwds)
+        self._changed()
+
+    def extend(self, other):
+        super().extend(other)
+        self._changed()
+
 ##############################
 
     def __str__(self):
@@ -177,26 +243,242 @@ class OpeningTimes(UserList):
         else:
             return True
 
+##############################
+
+    def periods_index(self):
+        '''
+        Returns an OpeningTimesIndex of these opening times, or None if
+        they are not valid. The index is only built when first needed
+        and is built again if the opening times have since been changed
+        through the list's methods.
+        '''
+
+        if not self._indexed:
+            if self.is_valid():
+                self._index = OpeningTimesIndex(self.data)
+
+            self._indexed = True
+
+        return self._index
+
+###############################################################################
+
+class OpeningTimesIndex:
+    '''
+    An index of the periods in a valid OpeningTimes. Valid periods are
+    in order and never overlap, so both their opening and closing
+    offsets ascend and the periods that open no later than a given
+    start offset and close no earlier than a given finish offset form a
+    contiguous slice, which can be found by bisection.
+
+    The open minutes of the week are also held as runs, merging periods
+    that overlap or follow on from one another in the next minute. A
+    window that is not within a run cannot be fulfilled by any period
+    or chain of periods.
+
+    Chains of periods, where each opens in the minute after the last
+    closes, are held as groups in the same way as the periods.
+
+    Offsets past the end of the week, from periods that run past
+    Sunday midnight, are kept as they are, so a window is matched
+    against them just as fulfills_times has always done.
+    '''
+
+    def __init__(self, periods):
+        self.periods = list(periods)
+        self.opens = [time_opens for time_opens, _ in self.periods]
+        self.closes = [time_closes for _, time_closes in self.periods]
+
+        self.groups = []
+
+        for period in self.periods:
+            if self.groups and self.groups[-1][-1][1] == period[0] - 1:
+                self.groups[-1].append(period)
+            else:
+                self.groups.append([period])
+
+        self.group_opens = [group[0][0] for group in self.groups]
+        self.group_closes = [group[-1][1] for group in self.groups]
+
+        self.run_opens = []
+        self.run_closes = []
+
+        for time_opens, time_closes in self.periods:
+            if self.run_closes and time_opens <= self.run_closes[-1] + 1:
+                self.run_closes[-1] = max(self.run_closes[-1], time_closes)
+            else:
+                self.run_opens.append(time_opens)
+                self.run_closes.append(time_closes)
+
+##############################
+
+    @staticmethod
+    def _spanning(opens, closes, start_offset, finish_offset):
+        '''
+        Returns the first and last indices of the slice of the given
+        sorted opens and closes which open no later than start_offset
+        and close no earlier than finish_offset.
+        '''
+
+        return (
+            bisect_left(closes, finish_offset),
+            bisect_right(opens, start_offset)
+        )
+
+##############################
+
+    def is_open(self, start_offset, finish_offset):
+        '''
+        Returns True if a single run of open minutes begins by the given
+        start_offset and lasts until the given finish_offset.
+        '''
+
+        first, last = self._spanning(
+            self.run_opens,
+            self.run_closes,
+            start_offset,
+            finish_offset
+        )
+
+        return first < last
+
+##############################
+
+    def fulfilling(self, start_offset, finish_offset):
+        '''
+        Returns a list of the periods which each open no later than the
+        given start_offset and close no earlier than the given
+        finish_offset, in order.
+        '''
+
+        first, last = self._spanning(
+            self.opens,
+            self.closes,
+            start_offset,
+            finish_offset
+        )
+
+        return self.periods[first:last]
+
+##############################
+
+    def chain_fulfilling(self, start_offset, finish_offset):
+        '''
+        Returns the first group of chained periods which opens no later
+        than the given start_offset and closes no earlier than the given
+        finish_offset, or an empty list if there is none.
+        '''
+
+        first, last = self._spanning(
+            self.group_opens,
+            self.group_closes,
+            start_offset,
+            finish_offset
+        )
+
+        if first < last:
+            return self.groups[first]
+        else:
+            return []
+
+##############################
+
+    def opening_between(self, start_offset, finish_offset):
+        '''
+        Returns a list of the periods which open no earlier than the
+        given start_offset and no later than the given finish_offset,
+        in order.
+        '''
+
+        return self.periods[
+            bisect_left(self.opens, start_offset):
+            bisect_right(self.opens, finish_offset)
+        ]
+
 ###############################################################################
 
 class Booking:
     '''
     A booking has a reference that may or may not be unique. It also
     has a number of covers (guests) and a start and finish-time
-    represented using datetime objects.
+    represented using datetime objects. Once accepted, a booking keeps
+    the number of the table it is seated at, or None if it has not
+    been seated.
+
+    Bookings are numerous, so their attributes are held in slots rather
+    than in a dictionary for each booking. The DateInfo for the start
+    and finish-time are worked out when first needed and kept until
+    the time is changed.
     '''
 
+    __slots__ = (
+        'reference',
+        'covers',
+        'table',
+        '_start',
+        '_finish',
+        '_start_dateinfo',
+        '_finish_dateinfo',
+    )
+
     @classmethod
     def validate(cls, booking):
 
         if booking.start > booking.finish:
             raise ValueError('Booking must start before it finishes.')
 
-    def __init__(self, reference, covers, start, finish):
+    def __init__(self, reference, covers, start, finish, table=None):
         self.reference = reference
         self.covers = covers
         self.start = start
         self.finish = finish
+        self.table = table
+
+##############################
+
+    @property
+    def start(self):
+        return self._start
+
+    @start.setter
+    def start(self, value):
+        self._start = value
+        self._start_dateinfo = None
+
+    @property
+    def finish(self):
+        return self._finish
+
+    @finish.setter
+    def finish(self, value):
+        self._finish = value
+        self._finish_dateinfo = None
+
+##############################
+
+    @property
+    def start_dateinfo(self):
+        '''
+        The DateInfo for the start-time of the booking.
+        '''
+
+        if self._start_dateinfo is None:
+            self._start_dateinfo = get_dateinfo(self._start)
+
+        return self._start_dateinfo
+
+    @property
+    def finish_dateinfo(self):
+        '''
+        The DateInfo for the finish-time of the booking.
+        '''
+
+        if self._finish_dateinfo is None:
+            self._finish_dateinfo = get_dateinfo(self._finish)
+
+        return self._finish_dateinfo
+
+##############################
 
     def __str__(self):
         return '{reference} x{covers} @ {hour:02d}.{minute:02d}'.format(
@@ -233,8 +515,8 @@ class Booking:
         '''
 
         context = get_dateinfo(datetime_context)
-        start_context = get_dateinfo(self.start)
-        finish_context = get_dateinfo(self.finish)
+        start_context = self.start_dateinfo
+        finish_context = self.finish_dateinfo
 
         if context.week != start_context.week:
             return False
@@ -0,0 +1,241 @@
+'''Opt-in counters and timings of the controller's and usecases' hot paths.'''
+
+###############################################################################
+
+from collections import defaultdict
+import functools
+import threading
+from time import perf_counter
+
+###############################################################################
+
+'''
+Nothing is recorded until enable is called. Timed functions are only
+wrapped while instrumentation is enabled, so that they are called
+directly otherwise, and work is only counted where the caller has first
+checked that enabled is True.
+'''
+
+enabled = False
+
+'''
+The functions timed once enabled, given as the name of the module, the
+name of the class or None, and the name of the attribute. Each is
+recorded under its class and attribute name.
+
+Bookings and reports made through the controller run through
+StableSeatingPlan and the storage's reads of each period and week, and
+SeatingPlan is only used there when a StableSeatingPlan seats a run of
+bookings again. relevant_bookings, seating_plan, space_available and
+SeatingPlan.fits are only called by code using usecases directly, so
+their timings stay empty under the controller's own traffic.
+'''
+
+TIMED = (
+    ('restbook.controller', None, 'booking_create'),
+    ('restbook.controller', None, 'bookings_create_many'),
+    ('restbook.controller', None, 'booking_update'),
+    ('restbook.controller', None, 'booking_cancel'),
+    ('restbook.controller', None, 'find_available_slots'),
+    ('restbook.controller', None, 'generate_report'),
+    ('restbook.usecases', None, 'fulfills_times'),
+    ('restbook.usecases', None, 'opens_within_times'),
+    ('restbook.usecases', 'StableSeatingPlan', '__init__'),
+    ('restbook.usecases', 'StableSeatingPlan', 'place'),
+    ('restbook.usecases', 'StableSeatingPlan', '_replan'),
+    ('restbook.usecases', 'StableSeatingPlan', 'insert'),
+    ('restbook.usecases', 'StableSeatingPlan', 'remove'),
+    ('restbook.usecases', 'SeatingPlan', '__init__'),
+    ('restbook.storage', 'MemoryStorage', 'booking_items_for_period'),
+    ('restbook.storage', 'MemoryStorage', 'booking_items_for_week'),
+    ('restbook.storage', 'ColumnarStorage', 'booking_items_for_period'),
+    ('restbook.storage', 'ColumnarStorage', 'booking_items_for_week'),
+    ('restbook.storage', 'SQLiteStorage', 'booking_items_for_period'),
+    ('restbook.storage', 'SQLiteStorage', 'booking_items_for_week'),
+    ('restbook.usecases', None, 'relevant_bookings'),
+    ('restbook.usecases', None, 'seating_plan'),
+    ('restbook.usecases', None, 'space_available'),
+    ('restbook.usecases', 'SeatingPlan', 'fits'),
+)
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timings = {}
+_originals = {}
+
+###############################################################################
+
+class Histogram:
+    '''
+    The latencies of calls to a function. Latencies are counted in
+    buckets of whole microseconds, each bucket holding latencies up to
+    twice those of the bucket before it.
+    '''
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.longest = 0.0
+        self.buckets = defaultdict(int)
+
+##############################
+
+    def record(self, seconds):
+        '''
+        Adds a call that took the given number of seconds.
+        '''
+
+        self.calls += 1
+        self.total += seconds
+        self.longest = max(self.longest, seconds)
+        self.buckets[int(seconds * 1e6).bit_length()] += 1
+
+##############################
+
+    def as_dict(self):
+        '''
+        Returns a dictionary of plain values describing the histogram,
+        with each bucket keyed on the most microseconds it holds.
+        '''
+
+        return {
+            'calls': self.calls,
+            'total_us': self.total * 1e6,
+            'mean_us': self.total * 1e6 / self.calls if self.calls else 0.0,
+            'max_us': self.longest * 1e6,
+            'buckets': {
+                (1 << n) - 1: self.buckets[n]
+                for n in sorted(self.buckets)
+            },
+        }
+
+###############################################################################
+
+def count(name, n=1):
+    '''
+    Adds n to the counter with the given name. Callers should check
+    that enabled is True first.
+    '''
+
+    with _lock:
+        _counters[name] += n
+
+##############################
+
+def _record(name, seconds):
+    with _lock:
+        try:
+            histogram = _timings[name]
+        except KeyError:
+            histogram = _timings[name] = Histogram()
+
+        histogram.record(seconds)
+
+##############################
+
+def _timed(name, function):
+    '''
+    Returns a wrapper of the given function that records how long each
+    call takes under the given name.
+    '''
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _record(name, perf_counter() - started)
+
+    return wrapper
+
+##############################
+
+def _owner(module_name, class_name):
+    '''
+    Returns the module or class holding a timed function.
+    '''
+
+    module = __import__(module_name, fromlist=['_'])
+
+    if class_name is None:
+        return module
+    else:
+        return getattr(module, class_name)
+
+###############################################################################
+
+def enable():
+    '''
+    Starts recording counters and timings. Those already recorded are
+    kept.
+    '''
+
+    global enabled
+
+    with _lock:
+        if enabled:
+            return
+
+        for module_name, class_name, attribute in TIMED:
+            owner = _owner(module_name, class_name)
+            original = owner.__dict__[attribute]
+            name = attribute if class_name is None else \
+                '{}.{}'.format(class_name, attribute)
+
+            _originals[(module_name, class_name, attribute)] = original
+            setattr(owner, attribute, _timed(name, original))
+
+        enabled = True
+
+##############################
+
+def disable():
+    '''
+    Stops recording counters and timings, and calls the timed functions
+    directly once again. Those already recorded are kept.
+    '''
+
+    global enabled
+
+    with _lock:
+        if not enabled:
+            return
+
+        enabled = False
+
+        for (module_name, class_name, attribute), original in \
+            _originals.items():
+            setattr(_owner(module_name, class_name), attribute, original)
+
+        _originals.clear()
+
+##############################
+
+def reset():
+    '''
+    Discards the counters and timings recorded so far.
+    '''
+
+    with _lock:
+        _counters.clear()
+        _timings.clear()
+
+##############################
+
+def snapshot():
+    '''
+    Returns a dictionary holding a copy of the counters, keyed on their
+    names, and the timings, as given by Histogram.as_dict and keyed on
+    the names of the timed functions, recorded so far.
+    '''
+
+    with _lock:
+        return {
+            'enabled': enabled,
+            'counters': dict(_counters),
+            'timings': {
+                name: histogram.as_dict()
+                for name, histogram in _timings.items()
+            },
+        }
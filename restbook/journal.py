@@ -0,0 +1,306 @@
+
+'''An append-only journal of the changes accepted by the controller.'''
+
+###############################################################################
+
+import json
+import os
+import uuid
+
+##############################
+
+from restbook import storage
+
+###############################################################################
+
+class Journal:
+    '''
+    Records each restaurant and booking accepted, and each booking
+    changed, seated or cancelled, by the controller in a journal file
+    within the given directory, so that they can be restored into a new
+    storage object after a restart.
+
+    Every snapshot_every records, the whole contents of the storage are
+    written to a snapshot file along with the position in the journal
+    that they account for. Restoring then reads the latest snapshot and
+    only the part of the journal written after it. Entries are copied
+    straight into storage, so bookings are not checked for space again.
+
+    If fsync is True, each record is forced to disk before the change
+    it describes is made. Otherwise records are only flushed to the
+    operating system.
+    '''
+
+    JOURNAL_NAME = 'journal.jsonl'
+    SNAPSHOT_NAME = 'snapshot.jsonl'
+
+    def __init__(self, directory, snapshot_every=10000, fsync=False):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+
+        self.journal_path = os.path.join(directory, self.JOURNAL_NAME)
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_NAME)
+
+        self._file = None
+        self._since_snapshot = 0
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+##############################
+
+    @staticmethod
+    def _restaurant_entry(id, restaurant):
+        return {
+            'type': 'restaurant',
+            'id': str(id),
+            'restaurant': storage.restaurant_to_dict(restaurant),
+        }
+
+    @staticmethod
+    def _booking_entry(id, restaurant_id, booking):
+        return {
+            'type': 'booking',
+            'id': str(id),
+            'restaurant_id': str(restaurant_id),
+            'booking': storage.booking_to_dict(booking),
+        }
+
+    @staticmethod
+    def _update_entry(id, booking):
+        return {
+            'type': 'update',
+            'id': str(id),
+            'booking': storage.booking_to_dict(booking),
+        }
+
+    @staticmethod
+    def _seat_entry(id, table):
+        return {
+            'type': 'seat',
+            'id': str(id),
+            'table': table,
+        }
+
+    @staticmethod
+    def _cancellation_entry(id):
+        return {
+            'type': 'cancellation',
+            'id': str(id),
+        }
+
+##############################
+
+    @staticmethod
+    def _encode(entry):
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+
+        return line.encode('utf-8')
+
+##############################
+
+    @staticmethod
+    def _apply(entry, target):
+        '''
+        Makes the change described by the given journal entry to the
+        given storage object.
+        '''
+
+        if entry['type'] == 'restaurant':
+            target.restaurant_add(
+                uuid.UUID(entry['id']),
+                storage.restaurant_from_dict(entry['restaurant'])
+            )
+        elif entry['type'] == 'booking':
+            target.booking_add(
+                uuid.UUID(entry['id']),
+                uuid.UUID(entry['restaurant_id']),
+                storage.booking_from_dict(entry['booking'])
+            )
+        elif entry['type'] == 'update':
+            target.booking_replace(
+                uuid.UUID(entry['id']),
+                storage.booking_from_dict(entry['booking'])
+            )
+        elif entry['type'] == 'seat':
+            target.booking_seat(uuid.UUID(entry['id']), entry['table'])
+        elif entry['type'] == 'cancellation':
+            target.booking_remove(uuid.UUID(entry['id']))
+        else:
+            raise ValueError('Unknown journal entry: {}'.format(entry['type']))
+
+##############################
+
+    @staticmethod
+    def _read_entries(file):
+        '''
+        Yields the entries in the given file from its current position
+        along with the position following each entry. A final line
+        that was only partly written is ignored.
+        '''
+
+        while True:
+            line = file.readline()
+
+            if not line.endswith(b'\n'):
+                break
+
+            yield json.loads(line.decode('utf-8')), file.tell()
+
+##############################
+
+    def restore(self, target):
+        '''
+        Adds the restaurants and bookings recorded by the latest
+        snapshot and the journal that follows it to the given storage
+        object. Returns the number of journal entries replayed.
+        '''
+
+        journal_offset = 0
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'rb') as snapshot:
+                header = json.loads(snapshot.readline().decode('utf-8'))
+                journal_offset = header['journal_offset']
+
+                for entry, _ in self._read_entries(snapshot):
+                    self._apply(entry, target)
+
+        replayed = 0
+
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'rb') as journal:
+                journal.seek(journal_offset)
+
+                for entry, journal_offset in self._read_entries(journal):
+                    self._apply(entry, target)
+                    replayed += 1
+
+            '''
+            Anything after the last complete entry was cut short, so it
+            is discarded before the journal is appended to again.
+            '''
+
+            with open(self.journal_path, 'r+b') as journal:
+                journal.truncate(journal_offset)
+
+        self._since_snapshot = replayed
+
+        return replayed
+
+##############################
+
+    def _write(self, entry):
+        if self._file is None:
+            self._file = open(self.journal_path, 'ab')
+
+        self._file.write(self._encode(entry))
+        self._file.flush()
+
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+        self._since_snapshot += 1
+
+##############################
+
+    def restaurant_created(self, id, restaurant):
+        '''
+        Records that the given Restaurant was stored under the given id.
+        '''
+        self._write(self._restaurant_entry(id, restaurant))
+
+##############################
+
+    def booking_created(self, id, restaurant_id, booking):
+        '''
+        Records that the given Booking was stored under the given id as
+        a booking for the restaurant with the given restaurant_id.
+        '''
+        self._write(self._booking_entry(id, restaurant_id, booking))
+
+##############################
+
+    def booking_updated(self, id, booking):
+        '''
+        Records that the booking stored under the given id was replaced
+        by the given Booking.
+        '''
+        self._write(self._update_entry(id, booking))
+
+##############################
+
+    def booking_seated(self, id, table):
+        '''
+        Records that the booking stored under the given id was moved to
+        the table with the given number.
+        '''
+        self._write(self._seat_entry(id, table))
+
+##############################
+
+    def booking_cancelled(self, id):
+        '''
+        Records that the booking stored under the given id was removed.
+        '''
+        self._write(self._cancellation_entry(id))
+
+##############################
+
+    def snapshot_due(self):
+        '''
+        Returns True if snapshot_every records have been written since
+        the last snapshot.
+        '''
+
+        return bool(self.snapshot_every) and \
+            self._since_snapshot >= self.snapshot_every
+
+##############################
+
+    def snapshot(self, source):
+        '''
+        Writes the contents of the given storage object to a new
+        snapshot, which replaces the previous one once it is complete.
+        The storage should hold exactly what has been recorded so far.
+        '''
+
+        if self._file is not None:
+            journal_offset = self._file.tell()
+        elif os.path.exists(self.journal_path):
+            journal_offset = os.path.getsize(self.journal_path)
+        else:
+            journal_offset = 0
+
+        partial_path = self.snapshot_path + '.partial'
+
+        with open(partial_path, 'wb') as snapshot:
+            snapshot.write(self._encode({'journal_offset': journal_offset}))
+
+            for id, restaurant in source.restaurants():
+                snapshot.write(
+                    self._encode(self._restaurant_entry(id, restaurant))
+                )
+
+            for id, restaurant_id, booking in source.bookings():
+                entry = self._booking_entry(id, restaurant_id, booking)
+                snapshot.write(self._encode(entry))
+
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+
+        os.replace(partial_path, self.snapshot_path)
+
+        self._since_snapshot = 0
+
+##############################
+
+    def close(self):
+        '''
+        Closes the journal file.
+        '''
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,343 @@
+
+'''Spreads restaurants across several processes, each with a controller.'''
+
+###############################################################################
+
+from bisect import bisect
+import functools
+import hashlib
+import multiprocessing
+import os
+import threading
+import uuid
+
+##############################
+
+from restbook import controller
+
+###############################################################################
+
+class HashRing:
+    '''
+    Assigns keys to a fixed number of shards by consistent hashing.
+
+    Each shard is placed at several points around a ring of hash
+    values, and a key belongs to the shard at the first point after the
+    key's own hash. Changing the number of shards only moves the keys
+    next to the points that were added or removed.
+    '''
+
+    def __init__(self, shards, replicas=64):
+        self.shards = shards
+
+        points = sorted(
+            (self._hash('{}:{}'.format(shard, replica)), shard)
+            for shard in range(shards)
+            for replica in range(replicas)
+        )
+
+        self._hashes = [hash_value for hash_value, _ in points]
+        self._shards = [shard for _, shard in points]
+
+##############################
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.md5(str(key).encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big')
+
+##############################
+
+    def shard_for(self, key):
+        '''
+        Returns the index of the shard that the given key belongs to.
+        '''
+
+        index = bisect(self._hashes, self._hash(key))
+
+        return self._shards[index % len(self._shards)]
+
+###############################################################################
+
+'''
+Booking UUIDs are generated by the shard that makes the booking. Each
+shard uses a node field of its own in the UUIDs it generates, made of
+SHARD_NODE with the shard's index in the low bits, so the shard that
+holds a booking can be read from the booking's UUID. The multicast bit
+is set, as it should be for node fields that are not MAC addresses.
+'''
+
+SHARD_NODE = 0x015242000000
+SHARD_NODE_MASK = 0xFFFFFF000000
+
+##############################
+
+def _serve(index, connection, initializer):
+    '''
+    Handles requests from the ShardedEngine on the given connection in
+    a worker process, until None is received. Each request names a
+    controller function and gives the arguments to call it with. The
+    result is sent back, or the exception raised if there is one.
+    '''
+
+    controller.generate_id = functools.partial(
+        uuid.uuid1,
+        node=SHARD_NODE | index
+    )
+
+    if initializer is not None:
+        initializer(index)
+
+    while True:
+        request = connection.recv()
+
+        if request is None:
+            break
+
+        name, args, kwargs = request
+
+        try:
+            result = getattr(controller, name)(*args, **kwargs)
+        except Exception as exception:
+            connection.send((False, exception))
+        else:
+            connection.send((True, result))
+
+    connection.close()
+
+###############################################################################
+
+class ShardedEngine:
+    '''
+    Runs a controller in each of several worker processes and forwards
+    each call to the process that owns the restaurant concerned, so
+    that restaurants are served in parallel on separate cores.
+
+    Restaurants are assigned to shards by a HashRing over their UUIDs.
+    If no number of shards is given then one is started for each CPU.
+    An initializer may be given, to be called with the shard's index
+    in each worker process before it handles any requests, such as to
+    give each shard storage or a journal of its own.
+
+    Calls may be made from several threads at once. Calls for different
+    shards are handled in parallel and calls for the same shard are
+    handled in turn.
+    '''
+
+    def __init__(self, shards=None, initializer=None):
+        if shards is None:
+            shards = os.cpu_count() or 1
+
+        self.ring = HashRing(shards)
+
+        self._connections = []
+        self._locks = []
+        self._processes = []
+
+        for index in range(shards):
+            connection, worker_connection = multiprocessing.Pipe()
+
+            process = multiprocessing.Process(
+                target=_serve,
+                args=(index, worker_connection, initializer),
+                daemon=True
+            )
+            process.start()
+            worker_connection.close()
+
+            self._connections.append(connection)
+            self._locks.append(threading.Lock())
+            self._processes.append(process)
+
+##############################
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception_info):
+        self.close()
+
+##############################
+
+    def close(self):
+        '''
+        Stops every worker process. Anything they stored in memory is
+        lost.
+        '''
+
+        for connection, lock in zip(self._connections, self._locks):
+            with lock:
+                connection.send(None)
+                connection.close()
+
+        for process in self._processes:
+            process.join()
+
+        self._connections = []
+        self._processes = []
+
+##############################
+
+    def _call(self, shard, function, *args, **kwargs):
+        '''
+        Calls the controller function with the given function name in
+        the worker process for the given shard, and returns its result.
+        '''
+
+        with self._locks[shard]:
+            self._connections[shard].send((function, args, kwargs))
+            succeeded, result = self._connections[shard].recv()
+
+        if succeeded:
+            return result
+        else:
+            raise result
+
+##############################
+
+    def _booking_shard(self, id):
+        '''
+        Returns the shard that generated the given booking UUID, or None
+        if it was not generated by any of them.
+        '''
+
+        try:
+            node = id.node
+        except AttributeError:
+            return None
+
+        shard = node & ~SHARD_NODE_MASK
+
+        if node & SHARD_NODE_MASK != SHARD_NODE or shard >= self.ring.shards:
+            return None
+
+        return shard
+
+###############################################################################
+
+    def restaurant_create(
+        self,
+        name,
+        description,
+        opening_times=None,
+        tables=None
+    ):
+        '''
+        Generates a UUID for a new restaurant and has the shard that it
+        belongs to create the restaurant, as controller.restaurant_create.
+        '''
+
+        id = uuid.uuid1()
+
+        return self._call(
+            self.ring.shard_for(id),
+            'restaurant_create',
+            name=name,
+            description=description,
+            opening_times=opening_times,
+            tables=tables,
+            id=id
+        )
+
+##############################
+
+    def restaurant_from_id(self, id):
+        '''
+        As controller.restaurant_from_id.
+        '''
+
+        return self._call(self.ring.shard_for(id), 'restaurant_from_id', id)
+
+##############################
+
+    def booking_create(self, restaurant_id, reference, covers, start, finish):
+        '''
+        As controller.booking_create.
+        '''
+
+        return self._call(
+            self.ring.shard_for(restaurant_id),
+            'booking_create',
+            restaurant_id=restaurant_id,
+            reference=reference,
+            covers=covers,
+            start=start,
+            finish=finish
+        )
+
+##############################
+
+    def bookings_create_many(self, restaurant_id, bookings):
+        '''
+        As controller.bookings_create_many.
+        '''
+
+        return self._call(
+            self.ring.shard_for(restaurant_id),
+            'bookings_create_many',
+            restaurant_id=restaurant_id,
+            bookings=list(bookings)
+        )
+
+##############################
+
+    def booking_from_id(self, id):
+        '''
+        As controller.booking_from_id.
+        '''
+
+        shard = self._booking_shard(id)
+
+        if shard is None:
+            return None
+
+        return self._call(shard, 'booking_from_id', id)
+
+##############################
+
+    def booking_update(self, id, covers=None, start=None, finish=None):
+        '''
+        As controller.booking_update.
+        '''
+
+        shard = self._booking_shard(id)
+
+        if shard is None:
+            return False
+
+        return self._call(
+            shard,
+            'booking_update',
+            id,
+            covers=covers,
+            start=start,
+            finish=finish
+        )
+
+##############################
+
+    def booking_cancel(self, id):
+        '''
+        As controller.booking_cancel.
+        '''
+
+        shard = self._booking_shard(id)
+
+        if shard is None:
+            return False
+
+        return self._call(shard, 'booking_cancel', id)
+
+##############################
+
+    def generate_report(self, restaurant_id, date):
+        '''
+        As controller.generate_report.
+        '''
+
+        return self._call(
+            self.ring.shard_for(restaurant_id),
+            'generate_report',
+            restaurant_id,
+            date
+        )
@@ -0,0 +1,1347 @@
+
+'''Storage for the restaurants and bookings managed by the controller.'''
+
+###############################################################################
+
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+import datetime
+import json
+import sqlite3
+import threading
+import uuid
+
+##############################
+
+from restbook import entities
+
+###############################################################################
+
+'''
+Restaurants and bookings are converted to and from dictionaries of
+plain values wherever they must be written outside of memory.
+'''
+
+def restaurant_to_dict(restaurant):
+    '''
+    Returns a dictionary of plain values describing the given
+    Restaurant.
+    '''
+
+    return {
+        'name': restaurant.name,
+        'description': restaurant.description,
+        'opening_times': [
+            [int(time_opens), int(time_closes)]
+            for time_opens, time_closes in restaurant.opening_times
+        ],
+        'tables': list(restaurant.tables),
+    }
+
+##############################
+
+def restaurant_from_dict(values):
+    '''
+    Returns a Restaurant from a dictionary given by restaurant_to_dict.
+    '''
+
+    return entities.Restaurant(
+        name=values['name'],
+        description=values['description'],
+        opening_times=values['opening_times'],
+        tables=values['tables']
+    )
+
+##############################
+
+def booking_to_dict(booking):
+    '''
+    Returns a dictionary of plain values describing the given Booking.
+    Start and finish times are given as ISO 8601 strings.
+    '''
+
+    return {
+        'reference': booking.reference,
+        'covers': booking.covers,
+        'start': booking.start.isoformat(),
+        'finish': booking.finish.isoformat(),
+        'table': booking.table,
+    }
+
+##############################
+
+def booking_from_dict(values):
+    '''
+    Returns a Booking from a dictionary given by booking_to_dict. The
+    table is taken to be None if it is missing, as it is from
+    dictionaries written before tables were kept.
+    '''
+
+    return entities.Booking(
+        reference=values['reference'],
+        covers=values['covers'],
+        start=datetime.datetime.fromisoformat(values['start']),
+        finish=datetime.datetime.fromisoformat(values['finish']),
+        table=values.get('table')
+    )
+
+###############################################################################
+
+class Storage:
+    '''
+    The interface through which the controller stores restaurants and
+    bookings. Restaurants and bookings are identified by the UUIDs
+    generated for them by the controller.
+    '''
+
+    def restaurant_add(self, id, restaurant):
+        '''
+        Stores the given Restaurant under the given id.
+        '''
+        raise NotImplementedError
+
+    def restaurant_get(self, id):
+        '''
+        Returns the Restaurant stored under the given id, or None if
+        there is no such restaurant.
+        '''
+        raise NotImplementedError
+
+    def booking_add(self, id, restaurant_id, booking):
+        '''
+        Stores the given Booking under the given id as a booking for
+        the restaurant with the given restaurant_id.
+        '''
+        raise NotImplementedError
+
+    def booking_get(self, id):
+        '''
+        Returns the Booking stored under the given id, or None if there
+        is no such booking.
+        '''
+        raise NotImplementedError
+
+    def booking_restaurant(self, id):
+        '''
+        Returns the id of the restaurant that the booking stored under
+        the given id was made for, or None if there is no such booking.
+        '''
+        raise NotImplementedError
+
+    def booking_remove(self, id):
+        '''
+        Removes the booking stored under the given id and returns it, or
+        returns None if there is no such booking.
+        '''
+        raise NotImplementedError
+
+    def booking_replace(self, id, booking):
+        '''
+        Replaces the booking stored under the given id with the given
+        Booking, for the same restaurant, and returns the booking it
+        replaced, or returns None if there is no such booking. The
+        replacement is ordered as though it were stored afresh.
+
+        By default the booking is removed and the replacement added.
+        '''
+
+        restaurant_id = self.booking_restaurant(id)
+
+        if restaurant_id is None:
+            return None
+
+        replaced = self.booking_remove(id)
+        self.booking_add(id, restaurant_id, booking)
+
+        return replaced
+
+    def booking_seat(self, id, table):
+        '''
+        Sets the table of the booking stored under the given id, without
+        changing the order in which bookings are listed. Does nothing if
+        there is no such booking.
+        '''
+        raise NotImplementedError
+
+    def bookings_for_week(self, restaurant_id, year, week):
+        '''
+        Returns a list of the bookings for the restaurant with the given
+        restaurant_id which start in the given ISO year and week. The
+        bookings are listed in the order they were stored.
+        '''
+        raise NotImplementedError
+
+    def bookings_for_period(
+        self,
+        restaurant_id,
+        year,
+        week,
+        start_offset,
+        end_offset
+    ):
+        '''
+        Returns a list of the bookings for the restaurant with the given
+        restaurant_id which start in the given ISO year and week, and
+        which start no earlier than start_offset and finish no later
+        than end_offset, as Booking.within. The bookings are listed in
+        the order they were stored.
+
+        By default the bookings for the whole week are filtered.
+        '''
+
+        return [
+            booking
+            for booking in self.bookings_for_week(restaurant_id, year, week)
+            if booking.start_dateinfo.offset >= start_offset
+            and booking.finish_dateinfo.offset <= end_offset
+        ]
+
+    def booking_items_for_week(self, restaurant_id, year, week):
+        '''
+        As bookings_for_week, but listing an (id, booking) pair for each
+        booking.
+        '''
+        raise NotImplementedError
+
+    def booking_items_for_period(
+        self,
+        restaurant_id,
+        year,
+        week,
+        start_offset,
+        end_offset
+    ):
+        '''
+        As bookings_for_period, but listing an (id, booking) pair for
+        each booking.
+
+        By default the bookings for the whole week are filtered.
+        '''
+
+        return [
+            (id, booking)
+            for id, booking in self.booking_items_for_week(
+                restaurant_id,
+                year,
+                week
+            )
+            if booking.start_dateinfo.offset >= start_offset
+            and booking.finish_dateinfo.offset <= end_offset
+        ]
+
+    def restaurants(self):
+        '''
+        Returns an iterable of (id, restaurant) pairs for every stored
+        restaurant, in the order they were stored.
+        '''
+        raise NotImplementedError
+
+    def bookings(self):
+        '''
+        Returns an iterable of (id, restaurant_id, booking) tuples for
+        every stored booking, in the order they were stored.
+        '''
+        raise NotImplementedError
+
+###############################################################################
+
+class WeekBookings:
+    '''
+    The bookings for a restaurant which start in a single week, kept
+    in the order they were added and also sorted by the offset at which
+    they start, so that the bookings within an opening period can be
+    found by bisection rather than by looking through the whole week.
+
+    A booking which finishes at an earlier offset than it starts, such
+    as one running into the following week, may still be within a
+    period that it starts after. Such bookings are kept aside and
+    checked one by one.
+    '''
+
+    def __init__(self):
+        self._bookings = OrderedDict()
+        self._sequence = 0
+        self._keys_of = {}
+        self._keys = []
+        self._ids = []
+        self._irregular = OrderedDict()
+
+##############################
+
+    def __len__(self):
+        return len(self._bookings)
+
+    def __iter__(self):
+        return iter(self._bookings.values())
+
+    def items(self):
+        return self._bookings.items()
+
+##############################
+
+    def add(self, id, booking):
+        '''
+        Adds the given Booking under the given id.
+        '''
+
+        start_offset = booking.start_dateinfo.offset
+        finish_offset = booking.finish_dateinfo.offset
+
+        key = (start_offset, self._sequence)
+        self._sequence += 1
+
+        self._bookings[id] = booking
+        self._keys_of[id] = key
+
+        if finish_offset < start_offset:
+            self._irregular[id] = booking
+        else:
+            index = bisect_left(self._keys, key)
+            self._keys.insert(index, key)
+            self._ids.insert(index, id)
+
+##############################
+
+    def remove(self, id):
+        '''
+        Removes the booking added under the given id and returns it.
+        Raises a KeyError if there is no such booking.
+        '''
+
+        booking = self._bookings.pop(id)
+        key = self._keys_of.pop(id)
+
+        if self._irregular.pop(id, None) is None:
+            index = bisect_left(self._keys, key)
+            del self._keys[index]
+            del self._ids[index]
+
+        return booking
+
+##############################
+
+    def within(self, start_offset, end_offset):
+        '''
+        Returns a list of the bookings which start no earlier than the
+        given start_offset and finish no later than the given
+        end_offset, in the order they were added.
+        '''
+
+        return [
+            booking
+            for _, booking in self.items_within(start_offset, end_offset)
+        ]
+
+##############################
+
+    def items_within(self, start_offset, end_offset):
+        '''
+        As within, but listing an (id, booking) pair for each booking.
+        '''
+
+        found = []
+
+        first = bisect_left(self._keys, (start_offset,))
+        last = bisect_left(self._keys, (end_offset + 1,))
+
+        for key, id in zip(self._keys[first:last], self._ids[first:last]):
+            booking = self._bookings[id]
+
+            if booking.finish_dateinfo.offset <= end_offset:
+                found.append((key[1], id, booking))
+
+        for id, booking in self._irregular.items():
+            if booking.start_dateinfo.offset >= start_offset and \
+                booking.finish_dateinfo.offset <= end_offset:
+                found.append((self._keys_of[id][1], id, booking))
+
+        found.sort(key=lambda entry: entry[0])
+
+        return [(id, booking) for _, id, booking in found]
+
+###############################################################################
+
+class MemoryStorage(Storage):
+    '''
+    Stores restaurants and bookings in dictionaries with their unique
+    id acting as the key. Bookings are also kept in a WeekBookings
+    for each restaurant ID along with the ISO year and week in which
+    each booking starts.
+    '''
+
+    def __init__(self):
+        self._restaurants = OrderedDict()
+        self._bookings = OrderedDict()
+        self._bookings_by_week = defaultdict(WeekBookings)
+        self._restaurant_ids = {}
+
+##############################
+
+    def restaurant_add(self, id, restaurant):
+        self._restaurants[id] = restaurant
+
+##############################
+
+    def restaurant_get(self, id):
+        try:
+            return self._restaurants[id]
+        except KeyError:
+            return None
+
+##############################
+
+    def booking_add(self, id, restaurant_id, booking):
+        dateinfo = booking.start_dateinfo
+
+        self._bookings[id] = booking
+        self._restaurant_ids[id] = restaurant_id
+        self._bookings_by_week[
+            (restaurant_id, dateinfo.year, dateinfo.week)
+        ].add(id, booking)
+
+##############################
+
+    def booking_get(self, id):
+        try:
+            return self._bookings[id]
+        except KeyError:
+            return None
+
+##############################
+
+    def booking_restaurant(self, id):
+        return self._restaurant_ids.get(id)
+
+##############################
+
+    def booking_remove(self, id):
+        try:
+            booking = self._bookings.pop(id)
+        except KeyError:
+            return None
+
+        restaurant_id = self._restaurant_ids.pop(id)
+        dateinfo = booking.start_dateinfo
+
+        self._bookings_by_week[
+            (restaurant_id, dateinfo.year, dateinfo.week)
+        ].remove(id)
+
+        return booking
+
+##############################
+
+    def booking_seat(self, id, table):
+        try:
+            self._bookings[id].table = table
+        except KeyError:
+            pass
+
+##############################
+
+    def bookings_for_week(self, restaurant_id, year, week):
+        return list(self._bookings_by_week.get((restaurant_id, year, week), []))
+
+##############################
+
+    def booking_items_for_week(self, restaurant_id, year, week):
+        bookings = self._bookings_by_week.get((restaurant_id, year, week))
+
+        if bookings is None:
+            return []
+
+        return list(bookings.items())
+
+##############################
+
+    def bookings_for_period(
+        self,
+        restaurant_id,
+        year,
+        week,
+        start_offset,
+        end_offset
+    ):
+        bookings = self._bookings_by_week.get((restaurant_id, year, week))
+
+        if bookings is None:
+            return []
+
+        return bookings.within(start_offset, end_offset)
+
+##############################
+
+    def booking_items_for_period(
+        self,
+        restaurant_id,
+        year,
+        week,
+        start_offset,
+        end_offset
+    ):
+        bookings = self._bookings_by_week.get((restaurant_id, year, week))
+
+        if bookings is None:
+            return []
+
+        return bookings.items_within(start_offset, end_offset)
+
+##############################
+
+    def restaurants(self):
+        return list(self._restaurants.items())
+
+##############################
+
+    def bookings(self):
+        return [
+            (id, self._restaurant_ids[id], booking)
+            for id, booking in self._bookings.items()
+        ]
+
+###############################################################################
+
+class BookingColumns:
+    '''
+    Holds the bookings for a single restaurant as columns rather than
+    as Booking objects. Start and finish times are kept as whole minutes
+    since the start of 1970, covers as unsigned integers and tables as
+    signed integers with -1 for None, each in an array, with references
+    in a list. Bookings are given row numbers in the order they are
+    appended.
+
+    Bookings that cannot be held exactly in the arrays, such as those
+    with timezones or with times that are not whole minutes, are kept
+    as they are, apart from the columns.
+    '''
+
+    EPOCH = datetime.datetime(1970, 1, 1)
+    MINUTE = datetime.timedelta(minutes=1)
+
+    '''
+    EPOCH falls on a Thursday, so a time's offset within its week is
+    its minutes since EPOCH, plus those from Monday to Thursday, modulo
+    the minutes in a week.
+    '''
+
+    EPOCH_OFFSET = 3 * 24 * 60
+    MINUTES_IN_WEEK = 7 * 24 * 60
+
+    def __init__(self):
+        self.references = []
+        self.covers = array('L')
+        self.starts = array('q')
+        self.finishes = array('q')
+        self.tables = array('l')
+        self._exceptions = {}
+
+##############################
+
+    def __len__(self):
+        return len(self.references)
+
+##############################
+
+    @classmethod
+    def _to_minutes(cls, value):
+        '''
+        Returns the given datetime as minutes since EPOCH, or None if
+        it cannot be given exactly in that way.
+        '''
+
+        if type(value) is not datetime.datetime or value.tzinfo is not None \
+            or value.second or value.microsecond:
+            return None
+
+        return (value - cls.EPOCH) // cls.MINUTE
+
+##############################
+
+    def append(self, booking):
+        '''
+        Adds the given Booking as a new row and returns its row number.
+        '''
+
+        row = len(self.references)
+        start = self._to_minutes(booking.start)
+        finish = self._to_minutes(booking.finish)
+        covers = booking.covers
+
+        if start is None or finish is None or type(covers) is not int \
+            or not 0 <= covers < 2 ** (8 * self.covers.itemsize):
+            self._exceptions[row] = booking
+            start = finish = covers = 0
+
+        self.references.append(booking.reference)
+        self.covers.append(covers)
+        self.starts.append(start)
+        self.finishes.append(finish)
+        self.tables.append(-1 if booking.table is None else booking.table)
+
+        return row
+
+##############################
+
+    def seat(self, row, table):
+        '''
+        Sets the table of the booking in the given row.
+        '''
+
+        self.tables[row] = -1 if table is None else table
+
+        if row in self._exceptions:
+            self._exceptions[row].table = table
+
+##############################
+
+    def booking(self, row):
+        '''
+        Returns a new Booking made from the given row.
+        '''
+
+        try:
+            return self._exceptions[row]
+        except KeyError:
+            pass
+
+        table = self.tables[row]
+
+        return entities.Booking(
+            reference=self.references[row],
+            covers=self.covers[row],
+            start=self.EPOCH + self.starts[row] * self.MINUTE,
+            finish=self.EPOCH + self.finishes[row] * self.MINUTE,
+            table=None if table < 0 else table
+        )
+
+##############################
+
+    def rows_within(self, rows, start_offset, end_offset):
+        '''
+        Returns a list of those of the given rows whose bookings start
+        no earlier than start_offset and finish no later than
+        end_offset, as offsets within their weeks, in the order given.
+        Only the rows kept apart from the columns are made into
+        Bookings to be checked.
+        '''
+
+        found = []
+
+        for row in rows:
+            if row in self._exceptions:
+                booking = self._exceptions[row]
+                start = booking.start_dateinfo.offset
+                finish = booking.finish_dateinfo.offset
+            else:
+                start = (self.starts[row] + self.EPOCH_OFFSET) % \
+                    self.MINUTES_IN_WEEK
+                finish = (self.finishes[row] + self.EPOCH_OFFSET) % \
+                    self.MINUTES_IN_WEEK
+
+            if start >= start_offset and finish <= end_offset:
+                found.append(row)
+
+        return found
+
+###############################################################################
+
+class ColumnarStorage(Storage):
+    '''
+    Stores bookings in a BookingColumns for each restaurant, so that
+    many bookings can be held in memory compactly. Booking objects are
+    only made when bookings are read. Bookings are also listed by row
+    number in arrays keyed on the restaurant ID along with the ISO year
+    and week in which each booking starts.
+
+    The controller only keeps bookings for different restaurants from
+    being made at once, and bookings share the arrays that locate them,
+    so every read and write is made while holding a lock.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._restaurants = OrderedDict()
+        self._columns = defaultdict(BookingColumns)
+        self._rows_by_week = defaultdict(lambda: array('L'))
+        self._ids_by_row = defaultdict(list)
+
+        '''
+        Each booking's id is mapped to its position in the order that
+        bookings were stored, which gives the restaurant and row that
+        hold it through a pair of arrays.
+        '''
+
+        self._positions = {}
+        self._restaurant_ids = []
+        self._restaurant_numbers = {}
+        self._restaurant_of = array('L')
+        self._row_of = array('L')
+
+##############################
+
+    def restaurant_add(self, id, restaurant):
+        with self._lock:
+            self._restaurants[id] = restaurant
+
+##############################
+
+    def restaurant_get(self, id):
+        with self._lock:
+            try:
+                return self._restaurants[id]
+            except KeyError:
+                return None
+
+##############################
+
+    def booking_add(self, id, restaurant_id, booking):
+        with self._lock:
+            dateinfo = booking.start_dateinfo
+            row = self._columns[restaurant_id].append(booking)
+
+            try:
+                number = self._restaurant_numbers[restaurant_id]
+            except KeyError:
+                number = len(self._restaurant_ids)
+                self._restaurant_ids.append(restaurant_id)
+                self._restaurant_numbers[restaurant_id] = number
+
+            self._positions[id] = len(self._row_of)
+            self._restaurant_of.append(number)
+            self._row_of.append(row)
+            self._ids_by_row[restaurant_id].append(id)
+            self._rows_by_week[
+                (restaurant_id, dateinfo.year, dateinfo.week)
+            ].append(row)
+
+##############################
+
+    def _booking_at(self, position):
+        '''
+        Returns the restaurant ID and Booking stored at the given
+        position. The lock must already be held.
+        '''
+
+        restaurant_id = self._restaurant_ids[self._restaurant_of[position]]
+
+        return (
+            restaurant_id,
+            self._columns[restaurant_id].booking(self._row_of[position])
+        )
+
+##############################
+
+    def booking_get(self, id):
+        with self._lock:
+            try:
+                position = self._positions[id]
+            except KeyError:
+                return None
+
+            return self._booking_at(position)[1]
+
+##############################
+
+    def booking_restaurant(self, id):
+        with self._lock:
+            try:
+                position = self._positions[id]
+            except KeyError:
+                return None
+
+            return self._restaurant_ids[self._restaurant_of[position]]
+
+##############################
+
+    def booking_remove(self, id):
+        '''
+        The booking's row is left in its restaurant's columns, but is no
+        longer listed for its week or reachable from its id. Rows are
+        listed for each week in ascending order, so the row is found by
+        bisection.
+        '''
+
+        with self._lock:
+            try:
+                position = self._positions.pop(id)
+            except KeyError:
+                return None
+
+            restaurant_id, booking = self._booking_at(position)
+            dateinfo = booking.start_dateinfo
+
+            rows = self._rows_by_week[
+                (restaurant_id, dateinfo.year, dateinfo.week)
+            ]
+            del rows[bisect_left(rows, self._row_of[position])]
+
+            return booking
+
+##############################
+
+    def booking_seat(self, id, table):
+        with self._lock:
+            try:
+                position = self._positions[id]
+            except KeyError:
+                return
+
+            number = self._restaurant_of[position]
+            restaurant_id = self._restaurant_ids[number]
+            self._columns[restaurant_id].seat(self._row_of[position], table)
+
+##############################
+
+    def bookings_for_week(self, restaurant_id, year, week):
+        with self._lock:
+            rows = self._rows_by_week.get((restaurant_id, year, week))
+
+            if rows is None:
+                return []
+
+            columns = self._columns[restaurant_id]
+
+            return [columns.booking(row) for row in rows]
+
+##############################
+
+    def booking_items_for_week(self, restaurant_id, year, week):
+        with self._lock:
+            rows = self._rows_by_week.get((restaurant_id, year, week))
+
+            if rows is None:
+                return []
+
+            columns = self._columns[restaurant_id]
+            ids = self._ids_by_row[restaurant_id]
+
+            return [(ids[row], columns.booking(row)) for row in rows]
+
+##############################
+
+    def bookings_for_period(
+        self,
+        restaurant_id,
+        year,
+        week,
+        start_offset,
+        end_offset
+    ):
+        with self._lock:
+            rows = self._rows_by_week.get((restaurant_id, year, week))
+
+            if rows is None:
+                return []
+
+            columns = self._columns[restaurant_id]
+
+            return [
+                columns.booking(row)
+                for row in columns.rows_within(rows, start_offset, end_offset)
+            ]
+
+##############################
+
+    def booking_items_for_period(
+        self,
+        restaurant_id,
+        year,
+        week,
+        start_offset,
+        end_offset
+    ):
+        '''
+        Bookings are only made for the rows within the period, which
+        are found from the start and finish columns.
+        '''
+
+        with self._lock:
+            rows = self._rows_by_week.get((restaurant_id, year, week))
+
+            if rows is None:
+                return []
+
+            columns = self._columns[restaurant_id]
+            ids = self._ids_by_row[restaurant_id]
+
+            return [
+                (ids[row], columns.booking(row))
+                for row in columns.rows_within(rows, start_offset, end_offset)
+            ]
+
+##############################
+
+    def restaurants(self):
+        with self._lock:
+            return list(self._restaurants.items())
+
+##############################
+
+    def bookings(self):
+        with self._lock:
+            return [
+                (id,) + self._booking_at(position)
+                for id, position in self._positions.items()
+            ]
+
+###############################################################################
+
+class SQLiteStorage(Storage):
+    '''
+    Stores restaurants and bookings in an SQLite database at the given
+    path, which is created if it does not already exist.
+
+    Bookings are indexed on their restaurant, the ISO year and week in
+    which they start and their start time, so that only the bookings
+    for the week in question are ever read. Restaurants are few and do
+    not change once stored, so they are kept in memory once read.
+
+    A single connection is shared by every thread that uses the storage.
+
+    The offset of each booking's finish is kept beside its start, so
+    that the bookings for a period are read between the two offsets,
+    with the few that run into the next week found through an index of
+    their own.
+
+    Databases made before tables or finish offsets were kept are given
+    the missing columns when opened.
+    '''
+
+    SCHEMA = (
+        '''
+        CREATE TABLE IF NOT EXISTS restaurants (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            description TEXT NOT NULL,
+            opening_times TEXT NOT NULL,
+            tables TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS bookings (
+            id TEXT PRIMARY KEY,
+            restaurant_id TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            week INTEGER NOT NULL,
+            start_offset INTEGER NOT NULL,
+            reference TEXT,
+            covers INTEGER NOT NULL,
+            start TEXT NOT NULL,
+            finish TEXT NOT NULL,
+            table_number INTEGER,
+            finish_offset INTEGER
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS bookings_by_week
+            ON bookings (restaurant_id, year, week, start_offset)
+        ''',
+    )
+
+    COLUMNS = (
+        ('table_number', 'INTEGER'),
+        ('finish_offset', 'INTEGER'),
+    )
+
+    INDEXES = (
+        '''
+        CREATE INDEX IF NOT EXISTS bookings_running_over
+            ON bookings (restaurant_id, year, week, start_offset)
+            WHERE finish_offset < start_offset
+        ''',
+    )
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, path=':memory:'):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._restaurants = {}
+
+        for statement in self.SCHEMA:
+            self._execute(statement, commit=True)
+
+        columns = [
+            column[1]
+            for column in self._execute('PRAGMA table_info(bookings)')
+        ]
+
+        for name, kind in self.COLUMNS:
+            if name not in columns:
+                self._execute(
+                    'ALTER TABLE bookings ADD COLUMN %s %s' % (name, kind),
+                    commit=True
+                )
+
+        self._add_finish_offsets()
+
+        for statement in self.INDEXES:
+            self._execute(statement, commit=True)
+
+##############################
+
+    def _add_finish_offsets(self):
+        '''
+        Fills in the finish offsets of bookings stored before they were
+        kept.
+        '''
+
+        rows = self._execute(
+            'SELECT rowid, reference, covers, start, finish, table_number '
+            'FROM bookings WHERE finish_offset IS NULL'
+        )
+
+        if not rows:
+            return
+
+        offsets = [
+            (int(booking.finish_dateinfo.offset), row[0])
+            for row, booking in zip(
+                rows,
+                self._bookings_from_rows([row[1:] for row in rows])
+            )
+        ]
+
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    'UPDATE bookings SET finish_offset = ? WHERE rowid = ?',
+                    offsets
+                )
+
+##############################
+
+    def _execute(self, statement, parameters=(), commit=False):
+        '''
+        Executes the given statement and returns a list of the rows it
+        gives. The connection is shared by every thread, so statements
+        are executed one at a time.
+        '''
+
+        with self._lock:
+            if commit:
+                with self._connection:
+                    return self._connection.execute(
+                        statement,
+                        parameters
+                    ).fetchall()
+            else:
+                return self._connection.execute(
+                    statement,
+                    parameters
+                ).fetchall()
+
+##############################
+
+    def close(self):
+        '''
+        Closes the connection to the database.
+        '''
+
+        with self._lock:
+            self._connection.close()
+
+##############################
+
+    def restaurant_add(self, id, restaurant):
+        values = restaurant_to_dict(restaurant)
+
+        self._execute(
+            'INSERT INTO restaurants VALUES (?, ?, ?, ?, ?)',
+            (
+                str(id),
+                values['name'],
+                values['description'],
+                json.dumps(values['opening_times']),
+                json.dumps(values['tables']),
+            ),
+            commit=True
+        )
+
+        self._restaurants[str(id)] = restaurant
+
+##############################
+
+    def restaurant_get(self, id):
+        try:
+            return self._restaurants[str(id)]
+        except KeyError:
+            pass
+
+        rows = self._execute(
+            'SELECT name, description, opening_times, tables '
+            'FROM restaurants WHERE id = ?',
+            (str(id),)
+        )
+
+        if not rows:
+            return None
+
+        name, description, opening_times, tables = rows[0]
+
+        restaurant = restaurant_from_dict({
+            'name': name,
+            'description': description,
+            'opening_times': json.loads(opening_times),
+            'tables': json.loads(tables),
+        })
+
+        return self._restaurants.setdefault(str(id), restaurant)
+
+##############################
+
+    INSERT_BOOKING = (
+        'INSERT INTO bookings (id, restaurant_id, year, week, start_offset, '
+        'reference, covers, start, finish, table_number, finish_offset) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+    )
+
+    @staticmethod
+    def _booking_row(id, restaurant_id, booking):
+        '''
+        Returns the values inserted to store the given booking.
+        '''
+
+        dateinfo = booking.start_dateinfo
+        values = booking_to_dict(booking)
+
+        return (
+            str(id),
+            str(restaurant_id),
+            dateinfo.year,
+            dateinfo.week,
+            int(dateinfo.offset),
+            values['reference'],
+            values['covers'],
+            values['start'],
+            values['finish'],
+            values['table'],
+            int(booking.finish_dateinfo.offset),
+        )
+
+##############################
+
+    def booking_add(self, id, restaurant_id, booking):
+        self._execute(
+            self.INSERT_BOOKING,
+            self._booking_row(id, restaurant_id, booking),
+            commit=True
+        )
+
+##############################
+
+    def _bookings_from_rows(self, rows):
+        return [
+            booking_from_dict({
+                'reference': reference,
+                'covers': covers,
+                'start': start,
+                'finish': finish,
+                'table': table,
+            })
+            for reference, covers, start, finish, table in rows
+        ]
+
+##############################
+
+    def booking_get(self, id):
+        bookings = self._bookings_from_rows(
+            self._execute(
+                'SELECT reference, covers, start, finish, table_number '
+                'FROM bookings WHERE id = ?',
+                (str(id),)
+            )
+        )
+
+        if bookings:
+            return bookings[0]
+        else:
+            return None
+
+##############################
+
+    def booking_restaurant(self, id):
+        rows = self._execute(
+            'SELECT restaurant_id FROM bookings WHERE id = ?',
+            (str(id),)
+        )
+
+        if rows:
+            return uuid.UUID(rows[0][0])
+        else:
+            return None
+
+##############################
+
+    def booking_remove(self, id):
+        booking = self.booking_get(id)
+
+        if booking is not None:
+            self._execute(
+                'DELETE FROM bookings WHERE id = ?',
+                (str(id),),
+                commit=True
+            )
+
+        return booking
+
+##############################
+
+    def booking_replace(self, id, booking):
+        '''
+        The booking is deleted and its replacement inserted within a
+        single transaction, so that the replacement is given a new rowid
+        and there is never a moment when neither is stored.
+        '''
+
+        replaced = self.booking_get(id)
+
+        if replaced is None:
+            return None
+
+        with self._lock, self._connection:
+            restaurant_id, = self._connection.execute(
+                'SELECT restaurant_id FROM bookings WHERE id = ?',
+                (str(id),)
+            ).fetchone()
+            self._connection.execute(
+                'DELETE FROM bookings WHERE id = ?',
+                (str(id),)
+            )
+            self._connection.execute(
+                self.INSERT_BOOKING,
+                self._booking_row(id, restaurant_id, booking)
+            )
+
+        return replaced
+
+##############################
+
+    def booking_seat(self, id, table):
+        self._execute(
+            'UPDATE bookings SET table_number = ? WHERE id = ?',
+            (table, str(id)),
+            commit=True
+        )
+
+##############################
+
+    def bookings_for_week(self, restaurant_id, year, week):
+        return [
+            booking for _, booking in self.booking_items_for_week(
+                restaurant_id,
+                year,
+                week
+            )
+        ]
+
+##############################
+
+    def booking_items_for_week(self, restaurant_id, year, week):
+        rows = self._execute(
+            'SELECT id, reference, covers, start, finish, table_number '
+            'FROM bookings WHERE restaurant_id = ? AND year = ? AND week = ? '
+            'ORDER BY rowid',
+            (str(restaurant_id), year, week)
+        )
+
+        return list(zip(
+            [uuid.UUID(row[0]) for row in rows],
+            self._bookings_from_rows([row[1:] for row in rows])
+        ))
+
+##############################
+
+    def bookings_for_period(
+        self,
+        restaurant_id,
+        year,
+        week,
+        start_offset,
+        end_offset
+    ):
+        return [
+            booking for _, booking in self.booking_items_for_period(
+                restaurant_id,
+                year,
+                week,
+                start_offset,
+                end_offset
+            )
+        ]
+
+##############################
+
+    def booking_items_for_period(
+        self,
+        restaurant_id,
+        year,
+        week,
+        start_offset,
+        end_offset
+    ):
+        '''
+        Only bookings which start between start_offset and end_offset
+        are read, using the index on start offsets, along with those
+        which run into the next week, using the index kept for them.
+        '''
+
+        parameters = (str(restaurant_id), year, week, int(start_offset))
+
+        rows = self._execute(
+            'SELECT rowid, id, reference, covers, start, finish, '
+            'table_number FROM bookings '
+            'WHERE restaurant_id = ? AND year = ? AND week = ? '
+            'AND start_offset BETWEEN ? AND ? '
+            'AND finish_offset >= start_offset AND finish_offset <= ? '
+            'UNION ALL '
+            'SELECT rowid, id, reference, covers, start, finish, '
+            'table_number FROM bookings '
+            'WHERE restaurant_id = ? AND year = ? AND week = ? '
+            'AND start_offset >= ? '
+            'AND finish_offset < start_offset AND finish_offset <= ? '
+            'ORDER BY 1',
+            parameters + (int(end_offset), int(end_offset)) +
+            parameters + (int(end_offset),)
+        )
+
+        return list(zip(
+            [uuid.UUID(row[1]) for row in rows],
+            self._bookings_from_rows([row[2:] for row in rows])
+        ))
+
+##############################
+
+    def restaurants(self):
+        rows = self._execute('SELECT id FROM restaurants ORDER BY rowid')
+
+        return [(uuid.UUID(id), self.restaurant_get(id)) for id, in rows]
+
+##############################
+
+    def bookings(self):
+        '''
+        Bookings are read BATCH_SIZE rows at a time, so that they need
+        not all be held in memory at once.
+        '''
+
+        last_row = 0
+
+        while True:
+            rows = self._execute(
+                'SELECT rowid, id, restaurant_id, reference, covers, start, '
+                'finish, table_number FROM bookings WHERE rowid > ? '
+                'ORDER BY rowid LIMIT ?',
+                (last_row, self.BATCH_SIZE)
+            )
+
+            if not rows:
+                break
+
+            for row, id, restaurant_id, *values in rows:
+                booking, = self._bookings_from_rows([values])
+
+                yield uuid.UUID(id), uuid.UUID(restaurant_id), booking
+
+                last_row = row
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import datetime
+from unittest import TestCase
+
+from restbook import aio
+
+###############################################################################
+
+class AsyncControllerTest(TestCase):
+
+    def test_can_book_and_report(self):
+        '''
+        The awaitable functions should make and retreive bookings just
+        as the controller does.
+        '''
+
+        async def scenario():
+            restaurant_id = await aio.restaurant_create(
+                name='Safe',
+                description='Example',
+                opening_times=[
+                    ('Monday 12.00', 'Monday 16.00'),
+                ],
+                tables=[2]
+            )
+
+            booking_id = await aio.booking_create(
+                restaurant_id=restaurant_id,
+                reference='Successful',
+                covers=2,
+                start=datetime(2016, 5, 2, 13, 0),
+                finish=datetime(2016, 5, 2, 15, 0)
+            )
+
+            booking = await aio.booking_from_id(booking_id)
+            report = await aio.generate_report(
+                restaurant_id,
+                datetime(2016, 5, 2)
+            )
+
+            return booking, report
+
+        booking, report = asyncio.run(scenario())
+
+        self.assertEqual(booking.reference, 'Successful')
+        self.assertTrue('Successful x2' in report)
+
+##############################
+
+    def test_concurrent_bookings_cannot_overbook(self):
+        '''
+        When many bookings for the only table are in flight at once,
+        exactly one of them should succeed.
+        '''
+
+        async def scenario():
+            restaurant_id = await aio.restaurant_create(
+                name='Safe',
+                description='Example',
+                opening_times=[
+                    ('Monday 12.00', 'Monday 16.00'),
+                ],
+                tables=[4]
+            )
+
+            return await asyncio.gather(*[
+                aio.booking_create(
+                    restaurant_id=restaurant_id,
+                    reference=str(n),
+                    covers=n % 4 + 1,
+                    start=datetime(2016, 5, 2, 13, 0),
+                    finish=datetime(2016, 5, 2, 15, 0)
+                )
+                for n in range(100)
+            ])
+
+        results = asyncio.run(scenario())
+
+        self.assertEqual(
+            len([x for x in results if x is not None]),
+            1,
+            'Only one concurrent booking should get the only table.'
+        )
+
+##############################
+
+    def test_cancellations_wait_for_the_restaurant(self):
+        '''
+        Cancellations should wait on the restaurant's lock, as bookings
+        do, rather than being handed to the executor at once.
+        '''
+
+        async def scenario():
+            restaurant_id = await aio.restaurant_create(
+                name='Safe',
+                description='Example',
+                opening_times=[
+                    ('Monday 12.00', 'Monday 16.00'),
+                ],
+                tables=[2]
+            )
+
+            booking_id = await aio.booking_create(
+                restaurant_id=restaurant_id,
+                reference='Cancelled',
+                covers=2,
+                start=datetime(2016, 5, 2, 13, 0),
+                finish=datetime(2016, 5, 2, 15, 0)
+            )
+
+            async with aio._restaurant_lock(restaurant_id):
+                cancellation = asyncio.ensure_future(
+                    aio.booking_cancel(booking_id)
+                )
+                await asyncio.sleep(0.05)
+                waited = not cancellation.done()
+
+            cancelled = await cancellation
+
+            return waited, cancelled, await aio.booking_cancel(booking_id)
+
+        waited, cancelled, cancelled_again = asyncio.run(scenario())
+
+        self.assertTrue(waited)
+        self.assertTrue(cancelled)
+        self.assertFalse(cancelled_again)
+
+##############################
+
+    def test_updates_wait_for_the_restaurant(self):
+        '''
+        Changes to bookings should wait on the restaurant's lock, as
+        bookings do.
+        '''
+
+        async def scenario():
+            restaurant_id = await aio.restaurant_create(
+                name='Safe',
+                description='Example',
+                opening_times=[
+                    ('Monday 12.00', 'Monday 16.00'),
+                ],
+                tables=[2]
+            )
+
+            booking_id = await aio.booking_create(
+                restaurant_id=restaurant_id,
+                reference='Changed',
+                covers=2,
+                start=datetime(2016, 5, 2, 13, 0),
+                finish=datetime(2016, 5, 2, 15, 0)
+            )
+
+            async with aio._restaurant_lock(restaurant_id):
+                update = asyncio.ensure_future(
+                    aio.booking_update(booking_id, covers=1)
+                )
+                await asyncio.sleep(0.05)
+                waited = not update.done()
+
+            updated = await update
+
+            return waited, updated, await aio.booking_from_id(booking_id)
+
+        waited, updated, booking = asyncio.run(scenario())
+
+        self.assertTrue(waited)
+        self.assertTrue(updated)
+        self.assertEqual(booking.covers, 1)
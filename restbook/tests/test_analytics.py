@@ -0,0 +1,137 @@
+import datetime
+from unittest import TestCase, skipIf
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from restbook import entities, usecases
+from restbook.time import MinuteOffset
+
+if numpy is not None:
+    from restbook import analytics
+
+###############################################################################
+
+@skipIf(numpy is None, 'NumPy is not installed.')
+class OccupancyTest(TestCase):
+
+    def setUp(self):
+        self.plan = usecases.seating_plan(
+            tables=[2, 4],
+            bookings=[
+                entities.Booking(
+                    reference='lunch',
+                    covers=2,
+                    start=datetime.datetime(2016, 5, 2, 12, 0),
+                    finish=datetime.datetime(2016, 5, 2, 13, 0),
+                ),
+                entities.Booking(
+                    reference='overlapping',
+                    covers=3,
+                    start=datetime.datetime(2016, 5, 2, 12, 30),
+                    finish=datetime.datetime(2016, 5, 2, 14, 0),
+                ),
+                entities.Booking(
+                    reference='unseated',
+                    covers=4,
+                    start=datetime.datetime(2016, 5, 2, 12, 30),
+                    finish=datetime.datetime(2016, 5, 2, 13, 30),
+                ),
+            ]
+        )
+
+        self.opening_times = entities.OpeningTimes(
+            [('Monday 12.00', 'Monday 16.00')]
+        )
+
+##############################
+
+    def test_matrix_matches_seated_bookings(self):
+        '''
+        Each minute of each table should hold the covers of the booking
+        seated there, and bookings not seated should be left out.
+        '''
+
+        occupancy = analytics.occupancy(self.plan)
+        noon = MinuteOffset.from_string('Monday 12.00')
+
+        self.assertEqual(occupancy.matrix.shape, (2, MinuteOffset.MINUTES_IN_WEEK))
+        self.assertEqual(occupancy.matrix[0, noon - 1], 0)
+        self.assertEqual(occupancy.matrix[0, noon], 2)
+        self.assertEqual(occupancy.matrix[0, noon + 60], 0)
+        self.assertEqual(occupancy.matrix[1, noon + 30], 3)
+        self.assertEqual(occupancy.matrix[1, noon + 119], 3)
+        self.assertEqual(occupancy.matrix[1, noon + 120], 0)
+
+##############################
+
+    def test_summaries(self):
+        '''
+        Summaries should reduce the matrix within the opening times.
+        '''
+
+        occupancy = analytics.occupancy(self.plan)
+
+        self.assertEqual(occupancy.peak_covers(), 5)
+        self.assertEqual(
+            occupancy.occupied_minutes(self.opening_times).tolist(),
+            [60, 90]
+        )
+        self.assertEqual(
+            occupancy.idle_table_minutes(self.opening_times),
+            2 * 240 - 150
+        )
+        self.assertEqual(
+            occupancy.utilisation(self.opening_times).tolist(),
+            [60 / 240, 90 / 240]
+        )
+
+##############################
+
+    def test_batches_match_single_plans(self):
+        '''
+        Working out occupancy for several plans at once should give the
+        same matrices as working each out alone.
+        '''
+
+        empty = usecases.seating_plan(tables=[6], bookings=[])
+        plans = [self.plan, empty, self.plan]
+
+        batch = analytics.occupancies(plans)
+
+        self.assertEqual(len(batch), len(plans))
+
+        for plan, occupancy in zip(plans, batch):
+            self.assertTrue(
+                numpy.array_equal(
+                    occupancy.matrix,
+                    analytics.occupancy(plan).matrix
+                )
+            )
+
+##############################
+
+    def test_batches_are_painted_in_chunks(self):
+        '''
+        Plans split across several chunks should give the same matrices
+        as working each out alone.
+        '''
+
+        empty = usecases.seating_plan(tables=[6], bookings=[])
+        plans = [self.plan, empty, self.plan, empty, empty]
+        singles = [analytics.occupancy(plan).matrix for plan in plans]
+
+        stash = analytics.CHUNK_TABLES
+        analytics.CHUNK_TABLES = 3
+
+        try:
+            batch = analytics.occupancies(plans)
+        finally:
+            analytics.CHUNK_TABLES = stash
+
+        self.assertEqual(len(batch), len(plans))
+
+        for single, occupancy in zip(singles, batch):
+            self.assertTrue(numpy.array_equal(occupancy.matrix, single))
@@ -1,5 +1,6 @@
 
-from datetime import datetime
+from datetime import datetime, timedelta
+import threading
 from unittest import TestCase
 
 from hypothesis import assume, given
@@ -269,3 +270,636 @@ class ControllerUnitTest(TestCase):
             'Making a booking should fail if the restaurant is full.'
         )
 
+
+##############################
+
+    def test_bookings_only_compete_within_their_week(self):
+        '''
+        Bookings for the same time in different ISO weeks, including
+        the same week number of different years, should not compete
+        for tables.
+        '''
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+            ],
+            tables=[1]
+        )
+
+        starts = (
+            datetime(2016, 5, 2, 13, 0),  # Monday 13.00, week 18 of 2016
+            datetime(2016, 5, 9, 13, 0),  # Monday 13.00, week 19 of 2016
+            datetime(2017, 5, 1, 13, 0),  # Monday 13.00, week 18 of 2017
+        )
+
+        for start in starts:
+            booking_id = controller.booking_create(
+                restaurant_id=restaurant_id,
+                reference='Successful',
+                covers=1,
+                start=start,
+                finish=start.replace(hour=15)
+            )
+
+            self.assertIsNotNone(
+                booking_id,
+                'Bookings in other weeks should not fill the table.'
+            )
+
+##############################
+
+    def test_bookings_create_many_matches_booking_create(self):
+        '''
+        Making bookings in bulk should accept and reject the same
+        bookings as making them one at a time, in the order given.
+        '''
+
+        def restaurant():
+            return controller.restaurant_create(
+                name='Safe',
+                description='Example',
+                opening_times=[
+                    ('Monday 12.00', 'Monday 16.00'),
+                    ('Monday 18.00', 'Monday 23.00'),
+                ],
+                tables=[2, 4]
+            )
+
+        bookings = [
+            dict(
+                reference=str(n),
+                covers=covers,
+                start=datetime(2016, 5, 2, hour, 0),
+                finish=datetime(2016, 5, 2, hour + 2, 0)
+            )
+            for n, (covers, hour) in enumerate(
+                [(2, 12), (4, 19), (3, 13), (2, 12), (1, 20), (4, 12), (2, 16)]
+            )
+        ]
+
+        restaurant_id = restaurant()
+        expected = [
+            controller.booking_create(restaurant_id, **x) is not None
+            for x in bookings
+        ]
+
+        restaurant_id = restaurant()
+        results = controller.bookings_create_many(restaurant_id, bookings)
+
+        self.assertListEqual(
+            [x is not None for x in results],
+            expected,
+            'Bulk bookings should succeed or fail as single bookings do.'
+        )
+
+        for booking_id, booking in zip(results, bookings):
+            if booking_id is not None:
+                self.assertEqual(
+                    controller.booking_from_id(booking_id).reference,
+                    booking['reference']
+                )
+
+##############################
+
+    def test_concurrent_bookings_cannot_overbook(self):
+        '''
+        When many threads book the only table at the same time, exactly
+        one of them should succeed.
+        '''
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+            ],
+            tables=[4]
+        )
+
+        results = []
+        ready = threading.Barrier(16)
+
+        def book(n):
+            ready.wait()
+            results.append(
+                controller.booking_create(
+                    restaurant_id=restaurant_id,
+                    reference=str(n),
+                    covers=n % 4 + 1,
+                    start=datetime(2016, 5, 2, 13, 0),
+                    finish=datetime(2016, 5, 2, 15, 0)
+                )
+            )
+
+        threads = [threading.Thread(target=book, args=(n,)) for n in range(16)]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(
+            len([x for x in results if x is not None]),
+            1,
+            'Only one concurrent booking should get the only table.'
+        )
+
+##############################
+
+    def test_generate_report_range_matches_generate_report(self):
+        '''
+        generate_report_range should give the same report for each day
+        as generate_report does, across the end of a week.
+        '''
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+                ('Sunday 18.00', 'Sunday 22.00'),
+            ],
+            tables=[2, 4]
+        )
+
+        for start in (
+            datetime(2016, 5, 2, 13, 0),  # Monday, week 18
+            datetime(2016, 5, 8, 19, 0),  # Sunday, week 18
+            datetime(2016, 5, 9, 12, 0),  # Monday, week 19
+        ):
+            controller.booking_create(
+                restaurant_id=restaurant_id,
+                reference='Booked',
+                covers=2,
+                start=start,
+                finish=start.replace(hour=start.hour + 2)
+            )
+
+        reports = list(
+            controller.generate_report_range(
+                restaurant_id,
+                datetime(2016, 5, 2),
+                datetime(2016, 5, 10)
+            )
+        )
+
+        self.assertListEqual(
+            [date.day for date, _ in reports],
+            list(range(2, 11)),
+            'A report should be given for each day in the range.'
+        )
+
+        for date, report in reports:
+            self.assertEqual(
+                report,
+                controller.generate_report(restaurant_id, date)
+            )
+
+##############################
+
+    def test_reports_show_bookings_made_since_last_report(self):
+        '''
+        A report generated again should include bookings accepted since
+        it was last generated.
+        '''
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+                ('Monday 18.00', 'Monday 22.00'),
+            ],
+            tables=[2]
+        )
+
+        date = datetime(2016, 5, 2)
+        before = controller.generate_report(restaurant_id, date)
+
+        self.assertEqual(controller.generate_report(restaurant_id, date), before)
+
+        controller.booking_create(
+            restaurant_id=restaurant_id,
+            reference='Later',
+            covers=2,
+            start=datetime(2016, 5, 2, 19, 0),
+            finish=datetime(2016, 5, 2, 21, 0)
+        )
+
+        after = controller.generate_report(restaurant_id, date)
+
+        self.assertNotIn('Later', before)
+        self.assertIn(
+            'Later',
+            after,
+            'Reports should include bookings made since they were generated.'
+        )
+        self.assertEqual(
+            after.split('Opening Period: Monday 18.00')[0],
+            before.split('Opening Period: Monday 18.00')[0],
+            'Other opening periods should be reported as before.'
+        )
+
+##############################
+
+    def test_find_available_slots_are_accepted_nearest_first(self):
+        '''
+        Each slot found should be accepted by booking_create, and slots
+        should be given nearest to the requested time first.
+        '''
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+            ],
+            tables=[2]
+        )
+
+        controller.booking_create(
+            restaurant_id=restaurant_id,
+            reference='Taken',
+            covers=2,
+            start=datetime(2016, 5, 2, 13, 0),
+            finish=datetime(2016, 5, 2, 14, 0)
+        )
+
+        slots = controller.find_available_slots(
+            restaurant_id=restaurant_id,
+            covers=2,
+            duration=timedelta(hours=1),
+            around=datetime(2016, 5, 2, 13, 30),
+            limit=3
+        )
+
+        self.assertEqual(
+            slots,
+            [
+                datetime(2016, 5, 2, 14, 0),
+                datetime(2016, 5, 2, 14, 15),
+                datetime(2016, 5, 2, 14, 30),
+            ]
+        )
+
+        self.assertIsNotNone(
+            controller.booking_create(
+                restaurant_id=restaurant_id,
+                reference='Found',
+                covers=2,
+                start=slots[0],
+                finish=slots[0] + timedelta(hours=1)
+            ),
+            'Slots found should be accepted by booking_create.'
+        )
+
+##############################
+
+    def test_find_available_slots_checks_its_arguments(self):
+        '''
+        Slots should only be searched for in positive steps and up to a
+        limit of no fewer than zero slots.
+        '''
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+            ],
+            tables=[2]
+        )
+
+        for granularity in (timedelta(0), timedelta(minutes=-15)):
+            with self.assertRaises(ValueError):
+                controller.find_available_slots(
+                    restaurant_id=restaurant_id,
+                    covers=2,
+                    duration=timedelta(hours=1),
+                    around=datetime(2016, 5, 2, 13, 30),
+                    granularity=granularity
+                )
+
+        with self.assertRaises(ValueError):
+            controller.find_available_slots(
+                restaurant_id=restaurant_id,
+                covers=2,
+                duration=timedelta(hours=1),
+                around=datetime(2016, 5, 2, 13, 30),
+                limit=-1
+            )
+
+        self.assertListEqual(
+            controller.find_available_slots(
+                restaurant_id=restaurant_id,
+                covers=2,
+                duration=timedelta(hours=1),
+                around=datetime(2016, 5, 2, 13, 30),
+                limit=0
+            ),
+            []
+        )
+
+##############################
+
+    def test_cancelled_bookings_free_their_table(self):
+        '''
+        Once a booking is cancelled it should no longer be found, its
+        table should be free again and reports should leave it out.
+        '''
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+            ],
+            tables=[2]
+        )
+
+        def book(reference):
+            return controller.booking_create(
+                restaurant_id=restaurant_id,
+                reference=reference,
+                covers=2,
+                start=datetime(2016, 5, 2, 13, 0),
+                finish=datetime(2016, 5, 2, 15, 0)
+            )
+
+        booking_id = book('Cancelled')
+        date = datetime(2016, 5, 2)
+
+        self.assertIn('Cancelled', controller.generate_report(restaurant_id, date))
+        self.assertIsNone(book('Refused'))
+
+        self.assertTrue(controller.booking_cancel(booking_id))
+        self.assertFalse(controller.booking_cancel(booking_id))
+        self.assertIsNone(controller.booking_from_id(booking_id))
+        self.assertNotIn(
+            'Cancelled',
+            controller.generate_report(restaurant_id, date)
+        )
+
+        self.assertIsNotNone(
+            book('Accepted'),
+            'A cancelled booking should free its table.'
+        )
+
+##############################
+
+    def test_updated_bookings_are_checked_without_the_original(self):
+        '''
+        A booking should be changed if it fits once the original is
+        left out, and left as it was if it does not fit.
+        '''
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+            ],
+            tables=[2]
+        )
+
+        booking_id = controller.booking_create(
+            restaurant_id=restaurant_id,
+            reference='Moved',
+            covers=2,
+            start=datetime(2016, 5, 2, 13, 0),
+            finish=datetime(2016, 5, 2, 15, 0)
+        )
+
+        self.assertTrue(
+            controller.booking_update(
+                booking_id,
+                start=datetime(2016, 5, 2, 14, 0)
+            ),
+            'A booking should be able to move into its own time.'
+        )
+
+        booking = controller.booking_from_id(booking_id)
+
+        self.assertEqual(booking.reference, 'Moved')
+        self.assertEqual(booking.start, datetime(2016, 5, 2, 14, 0))
+        self.assertEqual(booking.finish, datetime(2016, 5, 2, 16, 0))
+
+        self.assertIsNotNone(
+            controller.booking_create(
+                restaurant_id=restaurant_id,
+                reference='Early',
+                covers=2,
+                start=datetime(2016, 5, 2, 12, 0),
+                finish=datetime(2016, 5, 2, 14, 0)
+            ),
+            'The original time should be free once a booking has moved.'
+        )
+
+        self.assertFalse(
+            controller.booking_update(
+                booking_id,
+                start=datetime(2016, 5, 2, 13, 0)
+            )
+        )
+        self.assertFalse(controller.booking_update(booking_id, covers=3))
+        self.assertEqual(
+            controller.booking_from_id(booking_id).start,
+            datetime(2016, 5, 2, 14, 0),
+            'A change that does not fit should leave the booking as it was.'
+        )
+
+        self.assertIn(
+            'Moved x2 @ 14.00',
+            controller.generate_report(restaurant_id, datetime(2016, 5, 2))
+        )
+
+##############################
+
+    def test_bookings_keep_their_tables(self):
+        '''
+        Each booking should keep the table it was given, between reports
+        and once seating plans are made again from storage. Bookings
+        should only be moved when a new booking could not otherwise be
+        seated.
+        '''
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+            ],
+            tables=[2, 4]
+        )
+
+        def book(reference, covers, start, finish):
+            return controller.booking_create(
+                restaurant_id=restaurant_id,
+                reference=reference,
+                covers=covers,
+                start=datetime(2016, 5, 2, start, 0),
+                finish=datetime(2016, 5, 2, finish, 0)
+            )
+
+        def tables():
+            return [controller.booking_from_id(x).table for x in booking_ids]
+
+        date = datetime(2016, 5, 2)
+        booking_ids = [book('Late', 2, 14, 15), book('Long', 2, 13, 15)]
+
+        self.assertListEqual(tables(), [0, 1])
+
+        report = controller.generate_report(restaurant_id, date)
+
+        '''
+        Setting the storage again discards the kept seating plans, so
+        they are made again from the stored bookings.
+        '''
+
+        controller.use_storage(controller.use_storage(None))
+
+        self.assertEqual(
+            controller.generate_report(restaurant_id, date),
+            report
+        )
+        self.assertListEqual(tables(), [0, 1])
+
+        booking_ids.append(book('Four', 4, 12, 14))
+
+        self.assertIsNotNone(
+            booking_ids[-1],
+            'Bookings should be moved to seat a booking that needs it.'
+        )
+        self.assertListEqual(tables(), [1, 0, 1])
+
+        self.assertTrue(controller.booking_cancel(booking_ids[-1]))
+        booking_ids.pop()
+
+        self.assertListEqual(
+            tables(),
+            [1, 0],
+            'Cancelling a booking should leave the others where they are.'
+        )
+
+##############################
+
+    def test_bookings_across_chained_periods_keep_plans_in_step(self):
+        '''
+        Bookings moved to seat a booking that runs across chained
+        opening periods should be moved in the seating plan too, and
+        that booking should be seated in the plan of the chain, even
+        once plans are made again from storage.
+        '''
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 15.00'),
+                ('Monday 15.01', 'Monday 23.00'),
+            ],
+            tables=[2, 4]
+        )
+
+        def book(reference, covers, start, finish):
+            return controller.booking_create(
+                restaurant_id=restaurant_id,
+                reference=reference,
+                covers=covers,
+                start=datetime(2016, 5, 2, *start),
+                finish=datetime(2016, 5, 2, *finish)
+            )
+
+        date = datetime(2016, 5, 2)
+
+        cancelled_id = book('Cancelled', 2, (13, 45), (14, 15))
+        moved_id = book('Moved', 2, (14, 0), (14, 30))
+
+        self.assertEqual(controller.booking_from_id(moved_id).table, 1)
+        self.assertTrue(controller.booking_cancel(cancelled_id))
+
+        chained_id = book('Chained', 4, (14, 0), (16, 0))
+
+        self.assertEqual(controller.booking_from_id(chained_id).table, 1)
+        self.assertEqual(controller.booking_from_id(moved_id).table, 0)
+        self.assertIn(
+            "0: ['Moved x2 @ 14.00']",
+            controller.generate_report(restaurant_id, date)
+        )
+        self.assertIsNone(
+            book('Refused', 2, (14, 0), (14, 30)),
+            'A moved booking should not leave its new table free.'
+        )
+
+        controller.use_storage(controller.use_storage(None))
+
+        self.assertIsNone(
+            book('Refused', 4, (14, 30), (15, 0)),
+            'A chained booking should be seated once plans are made again.'
+        )
+
+##############################
+
+    def test_chained_periods_share_their_tables(self):
+        '''
+        A booking within a later period of a chain should not be given
+        the table of a booking that runs across the chain, and reports
+        of each period should list the bookings in it at the time.
+        '''
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 15.00'),
+                ('Monday 15.01', 'Monday 23.00'),
+            ],
+            tables=[4]
+        )
+
+        def book(reference, start, finish):
+            return controller.booking_create(
+                restaurant_id=restaurant_id,
+                reference=reference,
+                covers=4,
+                start=datetime(2016, 5, 2, *start),
+                finish=datetime(2016, 5, 2, *finish)
+            )
+
+        date = datetime(2016, 5, 2)
+
+        self.assertIsNotNone(book('Chained', (14, 0), (16, 0)))
+        self.assertIsNone(
+            book('Later', (15, 30), (16, 30)),
+            'A later period should not give out a table already taken.'
+        )
+
+        later_id = book('Later', (16, 0), (17, 0))
+
+        self.assertIsNotNone(later_id)
+        self.assertFalse(
+            controller.booking_update(
+                later_id,
+                start=datetime(2016, 5, 2, 15, 30)
+            ),
+            'A change should not be given a table already taken.'
+        )
+
+        controller.use_storage(controller.use_storage(None))
+
+        self.assertIsNone(
+            book('Refused', (14, 30), (15, 0)),
+            'Plans made again from storage should seat both bookings.'
+        )
+
+        report = controller.generate_report(restaurant_id, date)
+        first, second = report.split('Opening Period: ')[1:]
+
+        self.assertIn("0: ['Chained x4 @ 14.00']", first)
+        self.assertIn(
+            "0: ['Chained x4 @ 14.00', 'Later x4 @ 16.00']",
+            second
+        )
@@ -506,6 +506,90 @@ class OpeningTimesUnitTest(TestCase):
         finally:
             entities.OpeningTimes.validate = stash
 
+##############################
+
+    def test_periods_index_follows_opening_times(self):
+        '''
+        OpeningTimes.periods_index should give None for invalid opening times
+        and should be rebuilt whenever the opening times change.
+        '''
+
+        opening_times = entities.OpeningTimes([(600, 800), (900, 1000)])
+        index = opening_times.periods_index()
+
+        self.assertIs(
+            opening_times.periods_index(),
+            index,
+            'The index should be kept while the opening times are unchanged.'
+        )
+        self.assertListEqual(index.fulfilling(650, 750), [(600, 800)])
+        self.assertListEqual(index.fulfilling(650, 950), [])
+
+        opening_times.append((1001, 1100))
+
+        self.assertListEqual(
+            opening_times.periods_index().fulfilling(950, 1050),
+            [],
+            'A chain of periods should not fulfill a window by itself.'
+        )
+        self.assertTrue(opening_times.periods_index().is_open(950, 1050))
+        self.assertListEqual(
+            opening_times.periods_index().chain_fulfilling(950, 1050),
+            [(900, 1000), (1001, 1100)]
+        )
+        self.assertListEqual(
+            opening_times.periods_index().chain_fulfilling(750, 950),
+            []
+        )
+        self.assertListEqual(
+            opening_times.periods_index().opening_between(600, 1000),
+            [(600, 800), (900, 1000)]
+        )
+        self.assertListEqual(
+            opening_times.periods_index().opening_between(601, 899),
+            []
+        )
+        self.assertFalse(opening_times.periods_index().is_open(750, 950))
+
+        opening_times.append((0, 100))
+
+        self.assertIsNone(
+            opening_times.periods_index(),
+            'Invalid opening times should not be indexed.'
+        )
+
+        opening_times.pop()
+
+        self.assertTrue(opening_times.periods_index().is_open(950, 1050))
+
+        opening_times[2] = (1101, 1200)
+
+        self.assertFalse(opening_times.periods_index().is_open(950, 1050))
+
+        del opening_times[1:]
+
+        self.assertListEqual(
+            opening_times.periods_index().opening_between(0, 10080),
+            [(600, 800)]
+        )
+
+        opening_times += [(900, 1000)]
+
+        self.assertTrue(opening_times.periods_index().is_open(950, 1000))
+
+        self.assertEqual(
+            opening_times.index((900, 1000)),
+            1,
+            'OpeningTimes should still find periods as a list does.'
+        )
+
+        opening_times.clear()
+
+        self.assertListEqual(
+            opening_times.periods_index().opening_between(0, 10080),
+            []
+        )
+
 ###############################################################################
 
 class BookingUnitTest(TestCase):
@@ -609,6 +693,31 @@ class BookingUnitTest(TestCase):
         finally:
             entities.Booking.validate = stash
 
+##############################
+
+    def test_booking_dateinfo_follows_times(self):
+        '''
+        A booking's DateInfo should be worked out again whenever its
+        start or finish-time is changed.
+        '''
+
+        booking = entities.Booking(
+            reference='Moved',
+            covers=1,
+            start=datetime.datetime(2016, 5, 2, 12, 0),
+            finish=datetime.datetime(2016, 5, 2, 14, 0)
+        )
+
+        self.assertEqual(booking.start_dateinfo.offset, 12 * 60)
+        self.assertEqual(booking.finish_dateinfo.offset, 14 * 60)
+
+        booking.start = datetime.datetime(2016, 5, 3, 12, 0)
+        booking.finish = datetime.datetime(2016, 5, 3, 14, 0)
+
+        self.assertEqual(booking.start_dateinfo.datetime, booking.start)
+        self.assertEqual(booking.start_dateinfo.offset, (24 + 12) * 60)
+        self.assertEqual(booking.finish_dateinfo.offset, (24 + 14) * 60)
+
 ##############################
 
     @given(
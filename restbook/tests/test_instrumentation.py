@@ -0,0 +1,110 @@
+from datetime import datetime
+from unittest import TestCase
+
+from restbook import controller, instrumentation, storage, usecases
+
+###############################################################################
+
+class InstrumentationTest(TestCase):
+
+    def setUp(self):
+        instrumentation.reset()
+        self.previous_storage = controller.use_storage(storage.MemoryStorage())
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+        controller.use_storage(self.previous_storage)
+
+    def _booking_and_report(self):
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+            ],
+            tables=[2, 4]
+        )
+
+        for reference in ('First', 'Second'):
+            controller.booking_create(
+                restaurant_id=restaurant_id,
+                reference=reference,
+                covers=2,
+                start=datetime(2016, 5, 2, 13, 0),
+                finish=datetime(2016, 5, 2, 15, 0)
+            )
+
+        controller.generate_report(restaurant_id, datetime(2016, 5, 2))
+
+##############################
+
+    def test_nothing_is_recorded_until_enabled(self):
+        '''
+        Timed functions should be called directly and nothing recorded
+        while instrumentation is disabled.
+        '''
+
+        originals = (
+            controller.booking_create,
+            usecases.fulfills_times,
+            usecases.SeatingPlan.fits,
+        )
+
+        instrumentation.enable()
+        instrumentation.disable()
+
+        self.assertEqual(
+            (
+                controller.booking_create,
+                usecases.fulfills_times,
+                usecases.SeatingPlan.fits,
+            ),
+            originals
+        )
+
+        self._booking_and_report()
+
+        snapshot = instrumentation.snapshot()
+
+        self.assertFalse(snapshot['enabled'])
+        self.assertEqual(snapshot['counters'], {})
+        self.assertEqual(snapshot['timings'], {})
+
+##############################
+
+    def test_snapshot_records_calls_and_work(self):
+        '''
+        Once enabled, calls to the hot paths should be timed and the
+        work they do counted.
+        '''
+
+        instrumentation.enable()
+        self._booking_and_report()
+
+        snapshot = instrumentation.snapshot()
+        timings = snapshot['timings']
+
+        for name in (
+            'booking_create',
+            'StableSeatingPlan.place',
+            'generate_report'
+        ):
+            self.assertEqual(
+                sum(timings[name]['buckets'].values()),
+                timings[name]['calls']
+            )
+
+        self.assertEqual(timings['booking_create']['calls'], 2)
+        self.assertEqual(timings['StableSeatingPlan.place']['calls'], 2)
+        self.assertEqual(timings['generate_report']['calls'], 1)
+        self.assertEqual(timings['StableSeatingPlan.__init__']['calls'], 1)
+        self.assertEqual(timings['StableSeatingPlan.insert']['calls'], 2)
+        self.assertEqual(
+            timings['MemoryStorage.booking_items_for_period']['calls'],
+            1
+        )
+        self.assertEqual(snapshot['counters']['seating_plans_built'], 1)
+        self.assertEqual(snapshot['counters']['seating_plans_kept'], 2)
+        self.assertEqual(snapshot['counters']['report_parts_built'], 1)
+        self.assertGreater(snapshot['counters']['overlap_comparisons'], 0)
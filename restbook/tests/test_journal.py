@@ -0,0 +1,257 @@
+from datetime import datetime
+import shutil
+import tempfile
+from unittest import TestCase
+
+from restbook import controller, journal, storage
+
+###############################################################################
+
+class JournalTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.previous_storage = controller.use_storage(storage.MemoryStorage())
+
+    def tearDown(self):
+        controller.use_journal(None)
+        controller.use_storage(self.previous_storage)
+        shutil.rmtree(self.directory)
+
+    def make_bookings(self, count):
+        '''
+        Creates a restaurant and the given number of bookings, returning
+        the restaurant's id and the ids of the bookings.
+        '''
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+            ],
+            tables=[4] * count
+        )
+
+        booking_ids = [
+            controller.booking_create(
+                restaurant_id=restaurant_id,
+                reference=str(n),
+                covers=2,
+                start=datetime(2016, 5, 2, 13, 0),
+                finish=datetime(2016, 5, 2, 15, 0)
+            )
+            for n in range(count)
+        ]
+
+        return restaurant_id, booking_ids
+
+    def restart(self, **kwargs):
+        '''
+        Replaces the controller's storage and journal as though the
+        process had been restarted. Returns the number of journal
+        entries replayed.
+        '''
+
+        controller.use_journal(None)
+        controller.use_storage(storage.MemoryStorage())
+
+        return controller.use_journal(
+            journal.Journal(self.directory, **kwargs)
+        )
+
+##############################
+
+    def test_restores_journalled_changes(self):
+        '''
+        Restaurants and bookings should be restored from the journal.
+        '''
+
+        controller.use_journal(journal.Journal(self.directory))
+        restaurant_id, booking_ids = self.make_bookings(3)
+
+        self.assertEqual(self.restart(), 4)
+
+        self.assertEqual(controller.restaurant_from_id(restaurant_id).name, 'Safe')
+
+        for n, booking_id in enumerate(booking_ids):
+            self.assertEqual(
+                controller.booking_from_id(booking_id).reference,
+                str(n)
+            )
+
+        self.assertIsNone(
+            controller.booking_create(
+                restaurant_id, 'Full', 4,
+                datetime(2016, 5, 2, 13, 0), datetime(2016, 5, 2, 15, 0)
+            ),
+            'Restored bookings should still occupy their tables.'
+        )
+
+##############################
+
+    def test_restores_journalled_cancellations(self):
+        '''
+        Bookings cancelled should stay cancelled once restored.
+        '''
+
+        controller.use_journal(journal.Journal(self.directory))
+        restaurant_id, booking_ids = self.make_bookings(2)
+
+        self.assertTrue(controller.booking_cancel(booking_ids[0]))
+        self.assertEqual(self.restart(), 4)
+
+        self.assertIsNone(controller.booking_from_id(booking_ids[0]))
+        self.assertEqual(controller.booking_from_id(booking_ids[1]).reference, '1')
+
+##############################
+
+    def test_restores_journalled_updates(self):
+        '''
+        Bookings changed should be restored as they were changed.
+        '''
+
+        controller.use_journal(journal.Journal(self.directory))
+        restaurant_id, booking_ids = self.make_bookings(2)
+
+        self.assertTrue(controller.booking_update(booking_ids[0], covers=4))
+        self.assertEqual(self.restart(), 4)
+
+        self.assertEqual(controller.booking_from_id(booking_ids[0]).covers, 4)
+        self.assertEqual(controller.booking_from_id(booking_ids[1]).covers, 2)
+
+##############################
+
+    def test_restores_journalled_seats(self):
+        '''
+        Bookings moved to make room for another should be restored at
+        the tables they were moved to.
+        '''
+
+        controller.use_journal(journal.Journal(self.directory))
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+            ],
+            tables=[2, 4]
+        )
+
+        booking_ids = [
+            controller.booking_create(
+                restaurant_id=restaurant_id,
+                reference=reference,
+                covers=covers,
+                start=datetime(2016, 5, 2, start, 0),
+                finish=datetime(2016, 5, 2, finish, 0)
+            )
+            for reference, covers, start, finish in (
+                ('Late', 2, 14, 15),
+                ('Long', 2, 13, 15),
+                ('Four', 4, 12, 14),
+            )
+        ]
+
+        tables = [controller.booking_from_id(x).table for x in booking_ids]
+
+        self.assertListEqual(tables, [1, 0, 1])
+        self.assertEqual(self.restart(), 6)
+        self.assertListEqual(
+            [controller.booking_from_id(x).table for x in booking_ids],
+            tables
+        )
+
+##############################
+
+    def test_journals_distinct_tables_across_chained_periods(self):
+        '''
+        A booking within a later period of a chain, made while a booking
+        runs across the chain, should be stored and restored at another
+        table.
+        '''
+
+        controller.use_journal(journal.Journal(self.directory))
+
+        restaurant_id = controller.restaurant_create(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 15.00'),
+                ('Monday 15.01', 'Monday 23.00'),
+            ],
+            tables=[4, 4]
+        )
+
+        booking_ids = [
+            controller.booking_create(
+                restaurant_id=restaurant_id,
+                reference=reference,
+                covers=4,
+                start=datetime(2016, 5, 2, *start),
+                finish=datetime(2016, 5, 2, *finish)
+            )
+            for reference, start, finish in (
+                ('Chained', (14, 0), (16, 0)),
+                ('Later', (15, 30), (16, 30)),
+            )
+        ]
+
+        tables = [controller.booking_from_id(x).table for x in booking_ids]
+
+        self.assertCountEqual(tables, [0, 1])
+
+        self.restart()
+
+        self.assertListEqual(
+            [controller.booking_from_id(x).table for x in booking_ids],
+            tables
+        )
+
+##############################
+
+    def test_only_replays_journal_after_snapshot(self):
+        '''
+        When a snapshot has been taken, only the journal entries written
+        after it should be replayed.
+        '''
+
+        controller.use_journal(journal.Journal(self.directory, snapshot_every=3))
+        restaurant_id, booking_ids = self.make_bookings(4)
+
+        self.assertEqual(
+            self.restart(snapshot_every=3),
+            2,
+            'Only the entries after the snapshot should be replayed.'
+        )
+
+        self.assertEqual(
+            [controller.booking_from_id(x).reference for x in booking_ids],
+            ['0', '1', '2', '3']
+        )
+
+##############################
+
+    def test_ignores_partly_written_entries(self):
+        '''
+        A final journal entry that was cut short should be ignored and
+        discarded before the journal is written to again.
+        '''
+
+        controller.use_journal(journal.Journal(self.directory))
+        restaurant_id, booking_ids = self.make_bookings(2)
+        controller.use_journal(None)
+
+        with open(journal.Journal(self.directory).journal_path, 'ab') as file:
+            file.write(b'{"type":"booking","id":')
+
+        self.assertEqual(self.restart(), 3)
+
+        booking_id = controller.booking_create(
+            restaurant_id, 'Later', 1,
+            datetime(2016, 5, 2, 12, 0), datetime(2016, 5, 2, 13, 0)
+        )
+
+        self.assertEqual(self.restart(), 4)
+        self.assertEqual(controller.booking_from_id(booking_id).reference, 'Later')
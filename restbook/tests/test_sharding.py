@@ -0,0 +1,107 @@
+from datetime import datetime
+import uuid
+from unittest import TestCase
+
+from restbook import sharding
+
+###############################################################################
+
+class HashRingTest(TestCase):
+
+    def test_few_keys_move_when_a_shard_is_added(self):
+        '''
+        Adding a shard should only move keys onto the new shard.
+        '''
+
+        before = sharding.HashRing(4)
+        after = sharding.HashRing(5)
+
+        for n in range(1000):
+            key = uuid.UUID(int=n)
+
+            if before.shard_for(key) != after.shard_for(key):
+                self.assertEqual(after.shard_for(key), 4)
+
+###############################################################################
+
+class ShardedEngineTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = sharding.ShardedEngine(shards=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.close()
+
+##############################
+
+    def test_can_book_and_report(self):
+        '''
+        Bookings should be made with and retrieved from whichever shard
+        holds the restaurant.
+        '''
+
+        restaurant_ids = [
+            self.engine.restaurant_create(
+                name='Safe {}'.format(n),
+                description='Example',
+                opening_times=[
+                    ('Monday 12.00', 'Monday 16.00'),
+                ],
+                tables=[2]
+            )
+            for n in range(8)
+        ]
+
+        self.assertEqual(
+            {self.engine.ring.shard_for(x) for x in restaurant_ids},
+            {0, 1},
+            'Restaurants should be spread across both shards.'
+        )
+
+        for n, restaurant_id in enumerate(restaurant_ids):
+            self.assertEqual(
+                self.engine.restaurant_from_id(restaurant_id).name,
+                'Safe {}'.format(n)
+            )
+
+            booking_id = self.engine.booking_create(
+                restaurant_id=restaurant_id,
+                reference='Successful',
+                covers=2,
+                start=datetime(2016, 5, 2, 13, 0),
+                finish=datetime(2016, 5, 2, 15, 0)
+            )
+
+            self.assertEqual(
+                self.engine.booking_from_id(booking_id).reference,
+                'Successful'
+            )
+
+            self.assertEqual(
+                self.engine.bookings_create_many(restaurant_id, [
+                    {
+                        'reference': 'Overbooked',
+                        'covers': 2,
+                        'start': datetime(2016, 5, 2, 14, 0),
+                        'finish': datetime(2016, 5, 2, 15, 0),
+                    },
+                ]),
+                [None]
+            )
+
+            self.assertIn(
+                'Successful',
+                self.engine.generate_report(restaurant_id, datetime(2016, 5, 2))
+            )
+
+##############################
+
+    def test_unknown_ids_give_none(self):
+        '''
+        Looking up ids that no shard has stored should give None.
+        '''
+
+        self.assertIsNone(self.engine.restaurant_from_id(uuid.uuid1()))
+        self.assertIsNone(self.engine.booking_from_id(uuid.uuid1()))
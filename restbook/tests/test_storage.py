@@ -0,0 +1,665 @@
+from datetime import datetime, timedelta, timezone
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import TestCase
+import uuid
+
+from restbook import controller, entities, storage
+
+###############################################################################
+
+class StorageTests:
+    '''
+    Tests that every storage class should pass. Subclasses should
+    provide a create_storage method.
+    '''
+
+    def setUp(self):
+        self.storage = self.create_storage()
+
+        self.restaurant = entities.Restaurant(
+            name='Safe',
+            description='Example',
+            opening_times=[
+                ('Monday 12.00', 'Monday 16.00'),
+            ],
+            tables=[2, 4]
+        )
+
+    def booking(self, reference, start):
+        return entities.Booking(
+            reference=reference,
+            covers=2,
+            start=start,
+            finish=start.replace(hour=start.hour + 1)
+        )
+
+##############################
+
+    def test_can_retreive_stored_restaurants(self):
+        '''
+        Restaurants should be retreived as they were stored.
+        '''
+
+        id = uuid.uuid1()
+
+        self.storage.restaurant_add(id, self.restaurant)
+        restaurant = self.storage.restaurant_get(id)
+
+        self.assertEqual(restaurant.name, self.restaurant.name)
+        self.assertEqual(restaurant.description, self.restaurant.description)
+        self.assertListEqual(
+            list(restaurant.opening_times),
+            list(self.restaurant.opening_times)
+        )
+        self.assertListEqual(restaurant.tables, self.restaurant.tables)
+
+##############################
+
+    def test_unknown_ids_give_none(self):
+        '''
+        Retreiving a restaurant or booking that was never stored should
+        give None.
+        '''
+
+        self.assertIsNone(self.storage.restaurant_get(uuid.uuid1()))
+        self.assertIsNone(self.storage.booking_get(uuid.uuid1()))
+
+##############################
+
+    def test_can_retreive_stored_bookings(self):
+        '''
+        Bookings should be retreived as they were stored.
+        '''
+
+        id = uuid.uuid1()
+        booking = self.booking('Stored', datetime(2016, 5, 2, 13, 0))
+
+        self.storage.booking_add(id, uuid.uuid1(), booking)
+        stored = self.storage.booking_get(id)
+
+        self.assertEqual(stored.reference, booking.reference)
+        self.assertEqual(stored.covers, booking.covers)
+        self.assertEqual(stored.start, booking.start)
+        self.assertEqual(stored.finish, booking.finish)
+
+##############################
+
+    def test_bookings_for_week(self):
+        '''
+        Only the bookings for the given restaurant and ISO week should
+        be listed, in the order they were stored.
+        '''
+
+        restaurant_id = uuid.uuid1()
+
+        samples = (
+            (restaurant_id, 'Late', datetime(2016, 5, 8, 20, 0)),
+            (restaurant_id, 'Early', datetime(2016, 5, 2, 12, 0)),
+            (restaurant_id, 'Next week', datetime(2016, 5, 9, 12, 0)),
+            (restaurant_id, 'Next year', datetime(2017, 5, 1, 12, 0)),
+            (uuid.uuid1(), 'Elsewhere', datetime(2016, 5, 3, 12, 0)),
+        )
+
+        for id, reference, start in samples:
+            self.storage.booking_add(
+                uuid.uuid1(),
+                id,
+                self.booking(reference, start)
+            )
+
+        self.assertListEqual(
+            [
+                x.reference
+                for x in self.storage.bookings_for_week(restaurant_id, 2016, 18)
+            ],
+            ['Late', 'Early'],
+            'Only bookings for the given restaurant and week should be listed.'
+        )
+
+##############################
+
+    def test_bookings_for_period(self):
+        '''
+        Only the bookings within the given period should be listed, in
+        the order they were stored.
+        '''
+
+        restaurant_id = uuid.uuid1()
+
+        samples = (
+            ('Late', datetime(2016, 5, 2, 15, 0)),
+            ('Too early', datetime(2016, 5, 2, 11, 0)),
+            ('Early', datetime(2016, 5, 2, 12, 0)),
+            ('Too late', datetime(2016, 5, 2, 15, 30)),
+        )
+
+        for reference, start in samples:
+            self.storage.booking_add(
+                uuid.uuid1(),
+                restaurant_id,
+                self.booking(reference, start)
+            )
+
+        self.assertListEqual(
+            [
+                x.reference
+                for x in self.storage.bookings_for_period(
+                    restaurant_id, 2016, 18, 12 * 60, 16 * 60
+                )
+            ],
+            ['Late', 'Early'],
+            'Only bookings within the given period should be listed.'
+        )
+
+##############################
+
+    def test_bookings_running_into_the_next_week(self):
+        '''
+        Bookings which run into the next week should be listed for
+        periods which do so too.
+        '''
+
+        restaurant_id = uuid.uuid1()
+
+        samples = (
+            ('Overnight', datetime(2016, 5, 8, 23, 0), 2),
+            ('Monday', datetime(2016, 5, 2, 23, 0), 2),
+            ('Sunday', datetime(2016, 5, 8, 22, 0), 1),
+            ('Too long', datetime(2016, 5, 8, 23, 0), 4),
+        )
+
+        for reference, start, hours in samples:
+            self.storage.booking_add(
+                uuid.uuid1(),
+                restaurant_id,
+                entities.Booking(
+                    reference=reference,
+                    covers=2,
+                    start=start,
+                    finish=start + timedelta(hours=hours)
+                )
+            )
+
+        self.assertListEqual(
+            [
+                x.reference
+                for x in self.storage.bookings_for_period(
+                    restaurant_id, 2016, 18, 6 * 24 * 60 + 22 * 60, 2 * 60
+                )
+            ],
+            ['Overnight'],
+            'Only bookings within the given period should be listed.'
+        )
+
+##############################
+
+    def test_removed_bookings_are_forgotten(self):
+        '''
+        Removing a booking should return it, after which it should no
+        longer be found or listed.
+        '''
+
+        restaurant_id = uuid.uuid1()
+        ids = [uuid.uuid1() for _ in range(3)]
+
+        for id, hour in zip(ids, (12, 13, 14)):
+            self.storage.booking_add(
+                id,
+                restaurant_id,
+                self.booking(str(hour), datetime(2016, 5, 2, hour, 0))
+            )
+
+        self.assertEqual(self.storage.booking_restaurant(ids[1]), restaurant_id)
+        self.assertEqual(self.storage.booking_remove(ids[1]).reference, '13')
+
+        self.assertIsNone(self.storage.booking_get(ids[1]))
+        self.assertIsNone(self.storage.booking_restaurant(ids[1]))
+        self.assertIsNone(self.storage.booking_remove(ids[1]))
+        self.assertListEqual(
+            [
+                x.reference
+                for x in self.storage.bookings_for_week(restaurant_id, 2016, 18)
+            ],
+            ['12', '14']
+        )
+        self.assertListEqual(
+            [id for id, _, _ in self.storage.bookings()],
+            [ids[0], ids[2]]
+        )
+
+##############################
+
+    def test_replaced_bookings_are_ordered_as_new(self):
+        '''
+        Replacing a booking should return the original and list the
+        replacement as though it had just been stored.
+        '''
+
+        restaurant_id = uuid.uuid1()
+        ids = [uuid.uuid1() for _ in range(3)]
+
+        for id, hour in zip(ids, (12, 13, 14)):
+            self.storage.booking_add(
+                id,
+                restaurant_id,
+                self.booking(str(hour), datetime(2016, 5, 2, hour, 0))
+            )
+
+        replaced = self.storage.booking_replace(
+            ids[0],
+            self.booking('15', datetime(2016, 5, 2, 15, 0))
+        )
+
+        self.assertEqual(replaced.reference, '12')
+        self.assertIsNone(
+            self.storage.booking_replace(
+                uuid.uuid1(),
+                self.booking('Unknown', datetime(2016, 5, 2, 15, 0))
+            )
+        )
+        self.assertEqual(self.storage.booking_get(ids[0]).reference, '15')
+        self.assertEqual(self.storage.booking_restaurant(ids[0]), restaurant_id)
+        self.assertListEqual(
+            [
+                x.reference
+                for x in self.storage.bookings_for_week(restaurant_id, 2016, 18)
+            ],
+            ['13', '14', '15']
+        )
+
+##############################
+
+    def test_seated_tables_are_kept(self):
+        '''
+        Each booking should be stored with its table, which should be
+        changed in place by booking_seat, and listed with its id.
+        '''
+
+        restaurant_id = uuid.uuid1()
+        ids = [uuid.uuid1() for _ in range(3)]
+
+        for id, hour in zip(ids, (12, 13, 14)):
+            booking = self.booking(str(hour), datetime(2016, 5, 2, hour, 0))
+            booking.table = hour - 12 if hour < 14 else None
+            self.storage.booking_add(id, restaurant_id, booking)
+
+        self.storage.booking_seat(ids[1], 0)
+        self.storage.booking_seat(ids[2], 1)
+        self.storage.booking_seat(uuid.uuid1(), 1)
+
+        self.assertEqual(self.storage.booking_get(ids[0]).table, 0)
+        self.assertListEqual(
+            [
+                (id, x.table)
+                for id, x in self.storage.booking_items_for_week(
+                    restaurant_id,
+                    2016,
+                    18
+                )
+            ],
+            [(ids[0], 0), (ids[1], 0), (ids[2], 1)]
+        )
+        self.assertListEqual(
+            [
+                id for id, _ in self.storage.booking_items_for_period(
+                    restaurant_id,
+                    2016,
+                    18,
+                    13 * 60,
+                    15 * 60
+                )
+            ],
+            ids[1:]
+        )
+        self.assertListEqual(
+            [x.table for _, _, x in self.storage.bookings()],
+            [0, 0, 1]
+        )
+
+###############################################################################
+
+class WeekBookingsTest(TestCase):
+
+    def test_removed_bookings_are_not_listed(self):
+        '''
+        Bookings should no longer be listed once they are removed.
+        '''
+
+        bookings = storage.WeekBookings()
+
+        for n in range(4):
+            bookings.add(
+                n,
+                entities.Booking(
+                    reference=str(n),
+                    covers=2,
+                    start=datetime(2016, 5, 2, 12 + n, 0),
+                    finish=datetime(2016, 5, 2, 13 + n, 0)
+                )
+            )
+
+        self.assertEqual(bookings.remove(1).reference, '1')
+        self.assertListEqual([x.reference for x in bookings], ['0', '2', '3'])
+        self.assertListEqual(
+            [x.reference for x in bookings.within(12 * 60, 15 * 60)],
+            ['0', '2']
+        )
+
+###############################################################################
+
+class MemoryStorageTest(StorageTests, TestCase):
+
+    def create_storage(self):
+        return storage.MemoryStorage()
+
+###############################################################################
+
+class ColumnarStorageTest(StorageTests, TestCase):
+
+    def create_storage(self):
+        return storage.ColumnarStorage()
+
+##############################
+
+    def test_keeps_bookings_that_do_not_fit_columns(self):
+        '''
+        Bookings with timezones or times that are not whole minutes
+        should be retreived just as they were stored.
+        '''
+
+        samples = (
+            datetime(2016, 5, 2, 13, 0, tzinfo=timezone(timedelta(hours=1))),
+            datetime(2016, 5, 2, 13, 0, 30),
+            datetime(1969, 12, 31, 22, 59),
+        )
+
+        for start in samples:
+            id = uuid.uuid1()
+            booking = self.booking('Exact', start)
+
+            self.storage.booking_add(id, uuid.uuid1(), booking)
+            stored = self.storage.booking_get(id)
+
+            self.assertEqual(stored.start, booking.start)
+            self.assertEqual(stored.start.tzinfo, booking.start.tzinfo)
+            self.assertEqual(stored.finish, booking.finish)
+
+##############################
+
+    def test_reads_and_writes_wait_for_the_lock(self):
+        '''
+        Bookings for different restaurants share the arrays that locate
+        them, so adding and reading bookings should wait on the
+        storage's lock.
+        '''
+
+        id = uuid.uuid1()
+        restaurant_id = uuid.uuid1()
+        booking = self.booking('Locked', datetime(2016, 5, 2, 13, 0))
+
+        calls = [
+            lambda: self.storage.booking_add(id, restaurant_id, booking),
+            lambda: self.storage.booking_get(id),
+            lambda: self.storage.bookings_for_period(
+                restaurant_id, 2016, 18, 12 * 60, 16 * 60
+            ),
+        ]
+
+        for call in calls:
+            with self.storage._lock:
+                thread = threading.Thread(target=call)
+                thread.start()
+                thread.join(0.05)
+                waited = thread.is_alive()
+
+            thread.join()
+
+            self.assertTrue(waited)
+
+        self.assertEqual(self.storage.booking_get(id).reference, 'Locked')
+
+##############################
+
+    def test_periods_only_make_bookings_within_them(self):
+        '''
+        Reading the bookings for a period should only make Bookings for
+        the rows within it.
+        '''
+
+        restaurant_id = uuid.uuid1()
+
+        for hour in range(10, 22):
+            self.storage.booking_add(
+                uuid.uuid1(),
+                restaurant_id,
+                self.booking(str(hour), datetime(2016, 5, 2, hour, 0))
+            )
+
+        columns = self.storage._columns[restaurant_id]
+        made = []
+        booking = columns.booking
+
+        def count(row):
+            made.append(row)
+            return booking(row)
+
+        columns.booking = count
+
+        self.assertListEqual(
+            [
+                x.reference
+                for x in self.storage.bookings_for_period(
+                    restaurant_id, 2016, 18, 12 * 60, 16 * 60
+                )
+            ],
+            ['12', '13', '14', '15']
+        )
+        self.assertEqual(len(made), 4)
+
+###############################################################################
+
+class SQLiteStorageTest(StorageTests, TestCase):
+
+    def create_storage(self):
+        return storage.SQLiteStorage()
+
+##############################
+
+    def test_stored_data_persists(self):
+        '''
+        Restaurants and bookings should still be available when the
+        database is opened again.
+        '''
+
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'restbook.sqlite')
+
+        restaurant_id = uuid.uuid1()
+        booking_id = uuid.uuid1()
+
+        first = storage.SQLiteStorage(path)
+        first.restaurant_add(restaurant_id, self.restaurant)
+        first.booking_add(
+            booking_id,
+            restaurant_id,
+            self.booking('Persisted', datetime(2016, 5, 2, 13, 0))
+        )
+        first.close()
+
+        second = storage.SQLiteStorage(path)
+
+        self.assertEqual(second.restaurant_get(restaurant_id).name, 'Safe')
+        self.assertEqual(second.booking_get(booking_id).reference, 'Persisted')
+
+        second.close()
+        os.remove(path)
+        os.rmdir(directory)
+
+##############################
+
+    def test_adds_table_column_to_older_databases(self):
+        '''
+        Databases made before tables were kept should be given a column
+        for them when opened, with bookings already stored unseated.
+        '''
+
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'restbook.sqlite')
+
+        connection = sqlite3.connect(path)
+        connection.execute(
+            '''
+            CREATE TABLE bookings (
+                id TEXT PRIMARY KEY,
+                restaurant_id TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                week INTEGER NOT NULL,
+                start_offset INTEGER NOT NULL,
+                reference TEXT,
+                covers INTEGER NOT NULL,
+                start TEXT NOT NULL,
+                finish TEXT NOT NULL
+            )
+            '''
+        )
+        connection.execute(
+            'INSERT INTO bookings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                str(uuid.UUID(int=1)),
+                str(uuid.UUID(int=2)),
+                2016,
+                18,
+                13 * 60,
+                'Older',
+                2,
+                '2016-05-02T13:00:00',
+                '2016-05-02T14:00:00',
+            )
+        )
+        connection.commit()
+        connection.close()
+
+        opened = storage.SQLiteStorage(path)
+        booking = opened.booking_get(uuid.UUID(int=1))
+
+        self.assertEqual(booking.reference, 'Older')
+        self.assertIsNone(booking.table)
+
+        opened.booking_seat(uuid.UUID(int=1), 1)
+
+        self.assertEqual(opened.booking_get(uuid.UUID(int=1)).table, 1)
+
+        opened.close()
+        os.remove(path)
+        os.rmdir(directory)
+
+##############################
+
+    def test_adds_finish_offsets_to_older_databases(self):
+        '''
+        Databases made before finish offsets were kept should have them
+        filled in when opened, so that bookings running into the next
+        week are still found.
+        '''
+
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'restbook.sqlite')
+
+        connection = sqlite3.connect(path)
+        connection.execute(
+            '''
+            CREATE TABLE bookings (
+                id TEXT PRIMARY KEY,
+                restaurant_id TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                week INTEGER NOT NULL,
+                start_offset INTEGER NOT NULL,
+                reference TEXT,
+                covers INTEGER NOT NULL,
+                start TEXT NOT NULL,
+                finish TEXT NOT NULL,
+                table_number INTEGER
+            )
+            '''
+        )
+        connection.execute(
+            'INSERT INTO bookings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                str(uuid.UUID(int=1)),
+                str(uuid.UUID(int=2)),
+                2016,
+                18,
+                6 * 24 * 60 + 23 * 60,
+                'Older',
+                2,
+                '2016-05-08T23:00:00',
+                '2016-05-09T01:00:00',
+                None,
+            )
+        )
+        connection.commit()
+        connection.close()
+
+        opened = storage.SQLiteStorage(path)
+
+        self.assertListEqual(
+            [
+                x.reference
+                for x in opened.bookings_for_period(
+                    uuid.UUID(int=2), 2016, 18, 6 * 24 * 60 + 22 * 60, 2 * 60
+                )
+            ],
+            ['Older']
+        )
+
+        opened.close()
+        os.remove(path)
+        os.rmdir(directory)
+
+##############################
+
+    def test_controller_can_use_sqlite(self):
+        '''
+        The controller should make bookings in the same way whichever
+        storage is used.
+        '''
+
+        previous_storage = controller.use_storage(self.storage)
+
+        try:
+            restaurant_id = controller.restaurant_create(
+                name='Safe',
+                description='Example',
+                opening_times=[
+                    ('Monday 12.00', 'Monday 16.00'),
+                ],
+                tables=[1]
+            )
+
+            start = datetime(2016, 5, 2, 13, 0)  # Monday 13.00
+            finish = datetime(2016, 5, 2, 15, 0) # Monday 15.00
+
+            booking_id = controller.booking_create(
+                restaurant_id, 'Successful', 1, start, finish
+            )
+
+            self.assertEqual(
+                controller.booking_from_id(booking_id).reference,
+                'Successful'
+            )
+            self.assertIsNone(
+                controller.booking_create(
+                    restaurant_id, 'Full', 1, start, finish
+                ),
+                'Making a booking should fail if the restaurant is full.'
+            )
+            self.assertTrue(
+                'Successful x1' in controller.generate_report(
+                    restaurant_id, start
+                )
+            )
+        finally:
+            controller.use_storage(previous_storage)
@@ -1,4 +1,5 @@
 
+import datetime
 from unittest import TestCase
 
 from hypothesis import given
@@ -32,6 +33,27 @@ class DateInfoTest(TestCase):
         assert(day == dateinfo.weekday)
         assert(offset == dateinfo.offset)
 
+##############################
+
+    def test_date_info_keeps_given_datetime(self):
+        '''
+        Equal datetimes in different timezones fall on different
+        wall-clock times, so each should be given its own DateInfo.
+        '''
+
+        utc = datetime.datetime(2016, 5, 1, 23, 30, tzinfo=datetime.timezone.utc)
+        ahead = utc.astimezone(datetime.timezone(datetime.timedelta(hours=1)))
+
+        for _ in range(2):
+            utc_info = time.get_dateinfo(utc)
+            ahead_info = time.get_dateinfo(ahead)
+
+            self.assertIs(utc_info.datetime, utc)
+            self.assertIs(ahead_info.datetime, ahead)
+            self.assertEqual((utc_info.week, utc_info.weekday), (17, 6))
+            self.assertEqual((ahead_info.week, ahead_info.weekday), (18, 0))
+            self.assertEqual(ahead_info.offset, 30)
+
 ###############################################################################
 
 class MinuteOffsetUnitTest(TestCase):
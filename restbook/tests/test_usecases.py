@@ -299,6 +299,96 @@ class SeatingPlanUnitTest(TestCase):
 
 ###############################################################################
 
+class TableScheduleTest(TestCase):
+
+    def test_overlapping_finds_clashing_bookings(self):
+        '''
+        TableSchedule.overlapping should return the keys of exactly
+        those bookings that overlap the given booking.
+        '''
+
+        day = datetime.datetime(2016, 5, 2)  # Monday 2nd May 2016
+
+        def booking(start_hour, finish_hour):
+            return entities.Booking(
+                reference='{}-{}'.format(start_hour, finish_hour),
+                covers=1,
+                start=day.replace(hour=start_hour),
+                finish=day.replace(hour=finish_hour),
+            )
+
+        schedule = usecases.TableSchedule()
+
+        for key, hours in enumerate([(12, 13), (13, 15), (15, 15), (18, 20)]):
+            schedule.add(key, booking(*hours))
+
+        samples = (
+            ((11, 12), []),
+            ((11, 13), [0]),
+            ((12, 16), [0, 1, 2]),
+            ((15, 18), []),
+            ((14, 19), [1, 2, 3]),
+            ((21, 22), []),
+        )
+
+        for hours, expected in samples:
+            self.assertListEqual(
+                sorted(schedule.overlapping(booking(*hours))),
+                expected,
+                'Only overlapping bookings should be found.'
+            )
+
+        schedule.remove(1, booking(13, 15))
+
+        self.assertListEqual(
+            sorted(schedule.overlapping(booking(12, 16))),
+            [0, 2],
+            'Removed bookings should no longer be found.'
+        )
+
+###############################################################################
+
+class SeatingPlanFitsTest(TestCase):
+
+    def setUp(self):
+        start = datetime.datetime(2016, 5, 2, 12, 0)  # Monday 12.00
+
+        self.tables = [2, 4, 4, 6]
+        self.bookings = [
+            entities.Booking(
+                reference=str(n),
+                covers=covers,
+                start=start + datetime.timedelta(minutes=30*(n % 5)),
+                finish=start + datetime.timedelta(minutes=30*(n % 5) + 90),
+            )
+            for n, covers in enumerate([4, 2, 6, 1, 4, 3, 2, 5, 4, 1])
+        ]
+
+    def test_fits_matches_space_available(self):
+        '''
+        SeatingPlan.fits should agree with space_available and should
+        leave the plan unchanged.
+        '''
+
+        existing = self.bookings[:6]
+        plan = usecases.SeatingPlan(self.tables, existing)
+        before = plan.as_dict()
+
+        for booking in self.bookings[6:]:
+            self.assertEqual(
+                plan.fits(booking),
+                usecases.space_available(booking, self.tables, existing),
+                'SeatingPlan.fits should agree with space_available.'
+            )
+
+        self.assertEqual(
+            plan.as_dict(),
+            before,
+            'Checking whether a booking fits should not change the plan.'
+        )
+
+###############################################################################
+
 class SpaceAvailableTest(TestCase):
 
     @given(
@@ -349,6 +439,325 @@ class SpaceAvailableTest(TestCase):
 
 ###############################################################################
 
+class SeatingEngineTest(TestCase):
+
+    def setUp(self):
+        monday = datetime.datetime(2016, 5, 2)
+
+        def booking(reference, covers, start, finish):
+            return entities.Booking(
+                reference=reference,
+                covers=covers,
+                start=monday.replace(hour=start),
+                finish=monday.replace(hour=finish)
+            )
+
+        '''
+        Seating by covers puts both pairs at the first free table, which
+        leaves no table of four for the larger party earlier on.
+        '''
+
+        self.tables = [2, 4]
+        self.existing = [
+            booking('late pair', 2, 14, 15),
+            booking('long pair', 2, 13, 15),
+        ]
+        self.requested = booking('four', 4, 12, 14)
+
+    def test_exact_engine_seats_what_greedy_engine_rejects(self):
+        '''
+        The exact engine should accept a booking that can be seated by
+        moving existing bookings, where the greedy engine rejects it.
+        '''
+
+        self.assertFalse(
+            usecases.space_available(
+                self.requested,
+                self.tables,
+                self.existing
+            )
+        )
+        self.assertTrue(
+            usecases.space_available(
+                self.requested,
+                self.tables,
+                self.existing,
+                engine=usecases.ExactEngine()
+            )
+        )
+
+        plan = usecases.seating_plan(
+            self.tables,
+            self.existing + [self.requested],
+            engine=usecases.ExactEngine()
+        )
+
+        self.assertEqual(plan[None], [])
+        self.assertEqual(
+            [x.reference for x in plan[1]],
+            ['four', 'late pair']
+        )
+
+##############################
+
+    def test_exact_engine_fits_when_not_every_booking_can_be_seated(self):
+        '''
+        Where the existing bookings cannot all be seated, the exact
+        engine should accept a booking if some plan seats one more
+        booking with it than the most that can be seated without it.
+        '''
+
+        monday = datetime.datetime(2016, 5, 2)
+
+        def booking(covers, start, finish):
+            return entities.Booking(
+                reference=None,
+                covers=covers,
+                start=monday.replace(hour=start[0], minute=start[1]),
+                finish=monday.replace(hour=finish[0], minute=finish[1])
+            )
+
+        tables = [2, 4, 6]
+        existing = [
+            booking(3, (14, 15), (14, 45)),
+            booking(3, (14, 0), (15, 45)),
+            booking(1, (13, 30), (13, 45)),
+            booking(4, (12, 15), (13, 15)),
+            booking(1, (13, 15), (15, 15)),
+            booking(5, (13, 15), (15, 0)),
+        ]
+        engine = usecases.ExactEngine()
+
+        self.assertEqual(
+            len(usecases.seating_plan(tables, existing, engine=engine)[None]),
+            1
+        )
+        self.assertTrue(
+            usecases.space_available(
+                booking(2, (14, 45), (16, 45)),
+                tables,
+                existing,
+                engine=engine
+            )
+        )
+        self.assertFalse(
+            usecases.space_available(
+                booking(6, (14, 30), (15, 30)),
+                tables,
+                existing,
+                engine=engine
+            )
+        )
+
+##############################
+
+    def test_exact_engine_falls_back_when_out_of_time(self):
+        '''
+        When the time or step budget runs out, the exact engine should
+        give the greedy plan and refuse bookings the greedy engine
+        refuses.
+        '''
+
+        bookings = self.existing + [self.requested]
+
+        for engine in (
+            usecases.ExactEngine(time_budget=-1),
+            usecases.ExactEngine(time_budget=None, step_budget=0),
+        ):
+            self.assertEqual(
+                usecases.seating_plan(self.tables, bookings, engine=engine),
+                usecases.seating_plan(self.tables, bookings)
+            )
+            self.assertFalse(
+                usecases.space_available(
+                    self.requested,
+                    self.tables,
+                    self.existing,
+                    engine=engine
+                )
+            )
+
+###############################################################################
+
+class StableSeatingPlanTest(TestCase):
+
+    def setUp(self):
+        monday = datetime.datetime(2016, 5, 2)
+
+        def booking(reference, covers, start, finish, table=None):
+            return entities.Booking(
+                reference=reference,
+                covers=covers,
+                start=monday.replace(hour=start),
+                finish=monday.replace(hour=finish),
+                table=table
+            )
+
+        self.booking = booking
+        self.tables = [2, 2, 4]
+
+    def test_bookings_keep_the_tables_they_hold(self):
+        '''
+        Bookings should be seated at the tables they hold where those
+        are free, and only the others listed as changes.
+        '''
+
+        items = [
+            (0, self.booking('Kept', 2, 12, 14, table=2)),
+            (1, self.booking('Clashes', 2, 13, 15, table=2)),
+            (2, self.booking('New', 2, 12, 14)),
+        ]
+        plan = usecases.StableSeatingPlan(self.tables, items)
+
+        self.assertListEqual(
+            [plan.table_of(id) for id, _ in items],
+            [2, 0, 1]
+        )
+        self.assertDictEqual(dict(plan.changes), {1: 0, 2: 1})
+
+##############################
+
+    def test_plans_of_unseated_bookings_match_seating_plan(self):
+        '''
+        Bookings that hold no table should be seated as seating_plan
+        would seat them.
+        '''
+
+        bookings = [
+            self.booking(str(n), covers, 12 + n % 3, 14 + n % 3)
+            for n, covers in enumerate([2, 4, 1, 2, 3, 2])
+        ]
+        plan = usecases.StableSeatingPlan(self.tables, enumerate(bookings))
+        expected = usecases.seating_plan(self.tables, bookings)
+
+        for table, seated in plan.as_dict().items():
+            self.assertCountEqual(seated, expected[table])
+
+##############################
+
+    def test_unseated_bookings_are_not_placed_ahead_of_the_others(self):
+        '''
+        Bookings that hold no table should all be given the smallest
+        free table before any are placed by moving others, so that no
+        more are left unseated than by seating_plan.
+        '''
+
+        monday = datetime.datetime(2016, 5, 2)
+        tables = [2, 6]
+        bookings = [
+            entities.Booking(
+                reference=str(n),
+                covers=covers,
+                start=monday.replace(hour=start[0], minute=start[1]),
+                finish=monday.replace(hour=finish[0], minute=finish[1])
+            )
+            for n, (covers, start, finish) in enumerate([
+                (2, (15, 0), (17, 15)),
+                (3, (13, 30), (15, 0)),
+                (2, (14, 30), (17, 0)),
+                (3, (13, 30), (14, 15)),
+                (5, (17, 0), (19, 0)),
+            ])
+        ]
+        plan = usecases.StableSeatingPlan(tables, enumerate(bookings))
+        expected = usecases.seating_plan(tables, bookings)
+
+        for table, seated in plan.as_dict().items():
+            self.assertCountEqual(seated, expected[table])
+
+##############################
+
+    def test_as_few_bookings_as_possible_are_moved(self):
+        '''
+        A booking should be placed at a free table if there is one, and
+        otherwise by moving the fewest bookings. Placing a booking
+        should leave the plan unchanged.
+        '''
+
+        plan = usecases.StableSeatingPlan(
+            self.tables,
+            [
+                (0, self.booking('Pair', 2, 12, 14, table=0)),
+                (1, self.booking('Pair', 2, 13, 15, table=2)),
+            ]
+        )
+
+        self.assertDictEqual(plan.place(self.booking('Pair', 2, 12, 13)), {
+            None: 1,
+        })
+        self.assertDictEqual(plan.place(self.booking('Four', 4, 14, 16)), {
+            None: 2,
+            1: 1,
+        })
+        self.assertListEqual([plan.table_of(id) for id in (0, 1)], [0, 2])
+
+        self.assertTrue(plan.insert(2, self.booking('Four', 4, 14, 16)))
+        self.assertListEqual(
+            [plan.table_of(id) for id in (0, 1, 2)],
+            [0, 1, 2]
+        )
+
+        self.assertFalse(plan.fits(self.booking('Four', 4, 15, 16)))
+        self.assertTrue(plan.fits_replacing(2, self.booking('Four', 4, 15, 16)))
+
+##############################
+
+    def test_bookings_are_seated_again_if_moving_one_is_not_enough(self):
+        '''
+        Where no table can be freed by moving bookings elsewhere, every
+        booking should be seated again, as by ExactEngine.
+        '''
+
+        plan = usecases.StableSeatingPlan(
+            [2, 4],
+            [
+                (0, self.booking('Late', 2, 14, 15)),
+                (1, self.booking('Long', 2, 13, 15)),
+            ]
+        )
+
+        self.assertDictEqual(plan.place(self.booking('Four', 4, 12, 14)), {
+            None: 1,
+            0: 1,
+            1: 0,
+        })
+        self.assertIsNone(plan.place(self.booking('Four', 4, 12, 15)))
+
+        limited = usecases.StableSeatingPlan(
+            [2, 4],
+            [
+                (0, self.booking('Late', 2, 14, 15)),
+                (1, self.booking('Long', 2, 13, 15)),
+            ],
+            step_budget=0
+        )
+
+        self.assertIsNone(
+            limited.place(self.booking('Four', 4, 12, 14)),
+            'A search beyond the step budget should refuse the booking.'
+        )
+
+##############################
+
+    def test_removing_bookings_moves_no_others(self):
+        '''
+        Removing a booking should leave every other booking where it
+        is.
+        '''
+
+        items = [
+            (n, self.booking(str(n), 2, 12, 14))
+            for n in range(3)
+        ]
+        plan = usecases.StableSeatingPlan(self.tables, items)
+
+        self.assertTrue(plan.remove(0))
+        self.assertFalse(plan.remove(0))
+        self.assertListEqual([plan.table_of(id) for id in (1, 2)], [1, 2])
+        self.assertEqual(plan.as_dict()[0], [])
+
+###############################################################################
+
 class FulfillsTimesTest(TestCase):
 
     @given(
@@ -475,6 +884,38 @@ class FulfillsTimesTest(TestCase):
             'disparate opening times should not fulfill time windows.'
         )
 
+##############################
+
+    def test_fulfills_times_with_chains_after_a_break(self):
+        '''
+        Chains of opening times that follow a break between opening
+        times should still fulfill time windows.
+        '''
+
+        for opening_times in (
+            entities.OpeningTimes([
+                ('Monday 12.00', 'Monday 14.00'),
+                ('Monday 18.00', 'Monday 20.00'),
+                ('Monday 20.01', 'Monday 23.00'),
+            ]),
+            [
+                (720, 840),
+                (1080, 1200),
+                (1201, 1380),
+            ],
+        ):
+            self.assertListEqual(
+                list(
+                    usecases.fulfills_times(
+                        opening_times,
+                        datetime.datetime(2016, 5, 2, 19, 0),
+                        datetime.datetime(2016, 5, 2, 22, 0)
+                    )
+                ),
+                [(1080, 1200), (1201, 1380)],
+                'fulfills_times should return the chain fulfilling the window.'
+            )
+
 ###############################################################################
 
 class OpensWithinTimesTest(TestCase):
@@ -3,6 +3,7 @@
 
 from collections import namedtuple
 import datetime
+import functools
 import re
 
 ###############################################################################
@@ -125,16 +126,41 @@ DateInfo = namedtuple('DateInfo',
 
 ##############################
 
-def get_dateinfo(datetime_context):
+'''
+Working out the ISO calendar fields of a datetime is costly and the
+same times are looked up again and again, so the fields are cached for
+up to DATEINFO_CACHE_SIZE wall-clock times. The cache is keyed on the
+wall-clock fields rather than on datetimes themselves, since datetimes
+with different timezones can compare equal.
+'''
+
+DATEINFO_CACHE_SIZE = 65536
+
+@functools.lru_cache(maxsize=DATEINFO_CACHE_SIZE)
+def _calendar_fields(year, month, day, hour, minute):
     '''
-    Return a DateInfo tuple from the given datetime.
+    Returns the ISO year, week and weekday along with the MinuteOffset
+    for the given wall-clock time.
     '''
 
-    year, week, iso_day = datetime_context.isocalendar()
+    iso_year, week, iso_day = datetime.date(year, month, day).isocalendar()
     weekday = iso_day - 1
 
-    offset = MinuteOffset.from_integers(
-        weekday, 
+    offset = MinuteOffset.from_integers(weekday, hour, minute)
+
+    return iso_year, week, weekday, offset
+
+##############################
+
+def get_dateinfo(datetime_context):
+    '''
+    Return a DateInfo tuple from the given datetime.
+    '''
+
+    year, week, weekday, offset = _calendar_fields(
+        datetime_context.year,
+        datetime_context.month,
+        datetime_context.day,
         datetime_context.hour,
         datetime_context.minute
     )
@@ -146,4 +172,3 @@ def get_dateinfo(datetime_context):
         weekday=weekday,
         offset=offset
     )
-
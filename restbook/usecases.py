@@ -1,8 +1,11 @@
 
 '''Implements core functionality of the application.'''
 
-from collections import OrderedDict, namedtuple
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from time import perf_counter
 
+from restbook import instrumentation
 from restbook.entities import OpeningTimes
 from restbook.time import get_dateinfo
 
@@ -20,6 +23,10 @@ def relevant_bookings(bookings, datetime_context, start_offset, end_offset):
     that the time window represents.
     '''
 
+    if instrumentation.enabled:
+        bookings = list(bookings)
+        instrumentation.count('bookings_scanned', len(bookings))
+
     return [
         b for b in bookings
         if b.within(datetime_context, start_offset, end_offset)
@@ -27,68 +34,1104 @@ def relevant_bookings(bookings, datetime_context, start_offset, end_offset):
 
 ###############################################################################
 
-def seating_plan(tables, bookings):
+class TableSchedule:
     '''
-    Generates a seating plan as a dictionary where the keys are table
-    numbers and the values a list of bookings assigned to that table.
+    The bookings seated at a single table, indexed by their start and
+    finish times.
 
-    The given tables should be a list of positive integers denoting a
-    tables size. The table's number is taken from its index in the
-    given list.
+    Bookings at the same table never overlap, so once they are sorted
+    by start time their finish times are sorted too. The bookings that
+    overlap a given window can then be found by bisecting both.
 
-    Bookings which do not fit into the seating plan are assigned to a
-    table with the key None and returned normally as part of the
-    dictionary.
+    Bookings that finish before they start would break that ordering,
+    so they are kept aside and checked individually.
     '''
 
-    IndexedTable = namedtuple('IndexedTable', ['index', 'covers'])
+    def __init__(self):
+        self.keys = []
+        self._owners = []
+        self._spans = []
+        self._finishes = []
+        self._inverted = {}
 
-    plan = OrderedDict([(None, [])] + [(n, []) for n in range(len(tables))])
+##############################
 
-    indexed_tables = sorted(
-        [
-            IndexedTable(index=n, covers=tables[n])
-            for n in range(len(tables))
-        ],
-        key=lambda x: x.covers
-    )
+    def add(self, key, booking):
+        '''
+        Adds the given booking under the given key.
+        '''
+
+        insort(self.keys, key)
+
+        if booking.finish < booking.start:
+            self._inverted[key] = booking
+            return
+
+        span = (booking.start, booking.finish)
+        index = bisect_right(self._spans, span)
+
+        self._spans.insert(index, span)
+        self._finishes.insert(index, booking.finish)
+        self._owners.insert(index, key)
+
+##############################
+
+    def remove(self, key, booking):
+        '''
+        Removes the booking added under the given key.
+        '''
+
+        del self.keys[bisect_left(self.keys, key)]
+
+        if key in self._inverted:
+            del self._inverted[key]
+            return
+
+        span = (booking.start, booking.finish)
+        index = bisect_left(self._spans, span)
+
+        while self._owners[index] != key:
+            index += 1
+
+        del self._spans[index]
+        del self._finishes[index]
+        del self._owners[index]
 
-    for booking in sorted(bookings, key=lambda x: x.covers):
-        suitable_tables = (
-            x for x in indexed_tables if booking.covers <= x.covers
+##############################
+
+    def overlapping(self, booking):
+        '''
+        Returns the keys of the bookings that overlap the given booking.
+        '''
+
+        first = bisect_right(self._finishes, booking.start)
+        last = bisect_left(self._spans, (booking.finish,))
+
+        keys = self._owners[first:last]
+
+        if self._inverted:
+            keys += [
+                key for key, other in self._inverted.items()
+                if booking.overlaps(other)
+            ]
+
+        return keys
+
+###############################################################################
+
+class SeatingPlan:
+    '''
+    A seating plan of the given bookings, which can tell whether
+    another booking would fit without seating every booking again.
+
+    Bookings are seated in order of covers, with bookings of equal
+    covers taken in the order they were given. Each is assigned to the
+    smallest table with no overlapping booking, or to None if there is
+    no such table.
+
+    Checking a booking gives the same answer as seating every booking
+    again from scratch, but only the bookings that overlap one that
+    would change table are reconsidered.
+    '''
+
+    def __init__(self, tables, bookings=None):
+        '''
+        Takes a list of table sizes and, optionally, a list of bookings
+        to seat. The table's number is taken from its index in the
+        given list.
+        '''
+
+        self.tables = list(tables)
+
+        self._tables_by_size = sorted(
+            range(len(self.tables)),
+            key=lambda n: self.tables[n]
+        )
+        self._sizes = [self.tables[n] for n in self._tables_by_size]
+
+        '''
+        Bookings are keyed on their covers and the order in which they
+        were given, so that the keys sort in the order they are seated.
+        '''
+
+        self._sequence = 0
+        self._keys = []
+        self._bookings = {}
+        self._table_of = {}
+        self._seated = OrderedDict(
+            (table, TableSchedule())
+            for table in [None] + list(range(len(self.tables)))
         )
 
-        for table in suitable_tables:
-            if [x for x in plan[table.index] if booking.overlaps(x)]:
+        for booking in bookings or []:
+            key = self._next_key(booking)
+            self._keys.append(key)
+            self._bookings[key] = booking
+
+        self._keys.sort()
+
+        if instrumentation.enabled:
+            instrumentation.count('bookings_scanned', len(self._keys))
+
+        for key in self._keys:
+            table = self._choose_table(key, self._bookings[key], {}, {})
+            self._table_of[key] = table
+            self._seated[table].add(key, self._bookings[key])
+
+##############################
+
+    def _next_key(self, booking):
+        key = (booking.covers, self._sequence)
+        self._sequence += 1
+        return key
+
+##############################
+
+    def _clashes(self, table, key, booking, moves, arrivals):
+        '''
+        Returns True if the given booking overlaps a booking seated
+        ahead of it at the given table once the given moves are made.
+        The given arrivals list the bookings moved to each table.
+        '''
+
+        overlapping = self._seated[table].overlapping(booking)
+        arrived = arrivals.get(table, ())
+
+        if instrumentation.enabled:
+            instrumentation.count(
+                'overlap_comparisons',
+                len(overlapping) + len(arrived)
+            )
+
+        for other_key in overlapping:
+            if other_key < key and other_key not in moves:
+                return True
+
+        for other in arrived:
+            if booking.overlaps(other):
+                return True
+
+        return False
+
+##############################
+
+    def _choose_table(self, key, booking, moves, arrivals):
+        '''
+        Returns the smallest table that the given booking can be seated
+        at once the given moves are made, or None if there is no such
+        table.
+        '''
+
+        smallest = bisect_left(self._sizes, booking.covers)
+
+        for table in self._tables_by_size[smallest:]:
+            if not self._clashes(table, key, booking, moves, arrivals):
+                return table
+
+        return None
+
+##############################
+
+    def _reseat(self, key, booking):
+        '''
+        Works out how the plan would change if the given booking were
+        added under the given key. Returns a dictionary mapping the keys
+        of bookings that would be seated differently, including the
+        given key, to their new table. The plan itself is unchanged.
+        '''
+
+        table = self._choose_table(key, booking, {}, {})
+
+        return self._follow(key, {key: table}, {table: [booking]}, [booking])
+
+##############################
+
+    def _follow(self, key, moves, arrivals, disturbed):
+        '''
+        Works out how the bookings seated after the given key would
+        change once the given moves are made, where the given disturbed
+        bookings are those that have moved. Returns the given moves
+        along with those of the bookings that would be seated
+        differently.
+        '''
+
+        following = self._keys[bisect_right(self._keys, key):]
+
+        if instrumentation.enabled:
+            instrumentation.count('bookings_scanned', len(following))
+
+        for other_key in following:
+            other = self._bookings[other_key]
+
+            '''
+            A booking that overlaps nothing which has moved sees the same
+            tables as before, so it would stay where it is.
+            '''
+
+            if not any(other.overlaps(x) for x in disturbed):
                 continue
-            else:
-                plan[table.index].append(booking)
-                break
+
+            table = self._choose_table(other_key, other, moves, arrivals)
+
+            if table != self._table_of[other_key]:
+                moves[other_key] = table
+                arrivals.setdefault(table, []).append(other)
+                disturbed.append(other)
+
+        return moves
+
+##############################
+
+    def _displaces(self, key, moves):
+        '''
+        Returns True if making the given moves would change which of
+        the existing bookings are assigned to None, or would assign the
+        booking with the given key to None.
+        '''
+
+        for other_key, table in moves.items():
+            if other_key == key:
+                if table is None:
+                    return True
+            elif (table is None) != (self._table_of[other_key] is None):
+                return True
+
+        return False
+
+##############################
+
+    def fits(self, booking):
+        '''
+        Returns True or False depending upon whether the given booking
+        could be added without displacing any booking already in the
+        plan. The plan is left unchanged.
+        '''
+
+        key = (booking.covers, self._sequence)
+
+        return not self._displaces(key, self._reseat(key, booking))
+
+##############################
+
+    def as_dict(self):
+        '''
+        Returns the plan in the form given by seating_plan.
+        '''
+
+        return OrderedDict(
+            (table, [self._bookings[key] for key in schedule.keys])
+            for table, schedule in self._seated.items()
+        )
+
+###############################################################################
+
+class SeatingEngine:
+    '''
+    Works out seating plans and whether a booking can be added to one.
+    Engines are passed to seating_plan and space_available to choose
+    how bookings are seated.
+    '''
+
+    def plan(self, tables, bookings):
+        '''
+        Returns a seating plan of the given bookings at tables of the
+        given sizes, in the form given by seating_plan.
+        '''
+
+        raise NotImplementedError
+
+    def fits(self, requested_booking, tables, existing_bookings):
+        '''
+        Returns True or False depending upon whether the requested
+        booking can be added to the plan of the existing bookings
+        without displacing any of them.
+        '''
+
+        raise NotImplementedError
+
+##############################
+
+class GreedyEngine(SeatingEngine):
+    '''
+    Seats bookings as SeatingPlan does, in order of covers at the
+    smallest table with no overlapping booking.
+    '''
+
+    def plan(self, tables, bookings):
+        return SeatingPlan(tables, bookings).as_dict()
+
+    def fits(self, requested_booking, tables, existing_bookings):
+        if not tables:
+            return False
+
+        return SeatingPlan(tables, existing_bookings).fits(requested_booking)
+
+##############################
+
+class _OutOfTime(Exception):
+    pass
+
+##############################
+
+class ExactEngine(SeatingEngine):
+    '''
+    Seats as many bookings as possible by searching the assignments of
+    bookings to tables, starting from the plan given by GreedyEngine.
+
+    Bookings are taken in order of start time. Tables free at the start
+    of a booking can then only differ in size, so only one table of
+    each size is tried, and the outcome of each combination of booking
+    and busy tables is remembered rather than searched again.
+
+    A search that takes longer than time_budget seconds, or that takes
+    more than step_budget steps, is abandoned, in which case plan gives
+    the greedy plan and fits gives False unless the greedy plan seats
+    every booking. Either budget may be None for no limit. Only a step
+    budget gives the same outcome however busy the machine is. The
+    greedy plan is also used for bookings that finish before they
+    start.
+    '''
+
+    def __init__(self, time_budget=0.05, step_budget=None):
+        self.time_budget = time_budget
+        self.step_budget = step_budget
+
+##############################
+
+    def _assign(self, tables, bookings, required):
+        '''
+        Returns a list of the table size assigned to each of the given
+        bookings, or None for those left unseated, seating as many as
+        possible. If required is True then only assignments seating
+        every booking are searched, and None is returned if there are
+        none. Raises _OutOfTime if either budget runs out.
+        '''
+
+        if self.time_budget is None:
+            deadline = None
         else:
-            plan[None].append(booking)
+            deadline = perf_counter() + self.time_budget
+
+        steps = [0]
+        order = sorted(
+            range(len(bookings)),
+            key=lambda n: (bookings[n].start, bookings[n].finish)
+        )
+        sizes = sorted(set(tables))
+        capacity = {size: tables.count(size) for size in sizes}
+        outcomes = {}
+
+        '''
+        Each step gives the most bookings that can be seated from the
+        given position in order onwards, or -1 if required is True and
+        not all of them can be. Busy tables are given as a sorted tuple
+        of the finish and size of the booking last seated at each.
+        '''
+
+        def choices(booking, busy):
+            busy = tuple(x for x in busy if x[0] > booking.start)
+            used = {}
+
+            for _, size in busy:
+                used[size] = used.get(size, 0) + 1
+
+            for size in sizes[bisect_left(sizes, booking.covers):]:
+                if used.get(size, 0) < capacity[size]:
+                    yield size, tuple(sorted(busy + ((booking.finish, size),)))
+
+            if not required:
+                yield None, busy
+
+        def step(position, busy):
+            if position == len(order):
+                return 0
+
+            booking = bookings[order[position]]
+            key = (position, tuple(x for x in busy if x[0] > booking.start))
+
+            if key in outcomes:
+                return outcomes[key]
+
+            steps[0] += 1
+
+            if self.step_budget is not None and steps[0] > self.step_budget:
+                raise _OutOfTime()
 
-    return plan
+            if deadline is not None and perf_counter() > deadline:
+                raise _OutOfTime()
+
+            remaining = len(order) - position
+            best = -1
+
+            for size, after in choices(booking, busy):
+                seated = step(position + 1, after)
+
+                if seated >= 0:
+                    best = max(best, seated + (size is not None))
+
+                if best == remaining:
+                    break
+
+            outcomes[key] = best
+            return best
+
+        if step(0, ()) < 0:
+            return None
+
+        assigned = [None] * len(bookings)
+        busy = ()
+
+        for position, n in enumerate(order):
+            target = step(position, busy)
+
+            for size, after in choices(bookings[n], busy):
+                seated = step(position + 1, after)
+
+                if seated >= 0 and seated + (size is not None) == target:
+                    assigned[n] = size
+                    busy = after
+                    break
+
+        return assigned
+
+##############################
+
+    @staticmethod
+    def _as_plan(tables, bookings, assigned):
+        '''
+        Returns the seating plan, in the form given by seating_plan, of
+        the given bookings with the given table sizes assigned to them.
+        Each is seated at the lowest numbered table of its size that is
+        free when it starts.
+        '''
+
+        plan = OrderedDict(
+            (table, [])
+            for table in [None] + list(range(len(tables)))
+        )
+        finishes = {}
+
+        order = sorted(
+            range(len(bookings)),
+            key=lambda n: (bookings[n].start, bookings[n].finish)
+        )
+
+        for n in order:
+            booking = bookings[n]
+
+            if assigned[n] is None:
+                plan[None].append(booking)
+                continue
+
+            for table, size in enumerate(tables):
+                if size == assigned[n] and \
+                    finishes.get(table, booking.start) <= booking.start:
+                    finishes[table] = booking.finish
+                    plan[table].append(booking)
+                    break
+
+        return plan
+
+##############################
+
+    @staticmethod
+    def _searchable(bookings):
+        return all(x.start <= x.finish for x in bookings)
+
+##############################
+
+    def plan(self, tables, bookings):
+        bookings = list(bookings)
+        greedy = SeatingPlan(tables, bookings).as_dict()
+
+        if not greedy[None] or not self._searchable(bookings):
+            return greedy
+
+        try:
+            assigned = self._assign(list(tables), bookings, False)
+        except (_OutOfTime, RecursionError):
+            return greedy
+
+        return self._as_plan(tables, bookings, assigned)
+
+##############################
+
+    def fits(self, requested_booking, tables, existing_bookings):
+        '''
+        The requested booking fits if one more booking can be seated
+        with it than without it, as any plan seating that many must
+        seat it. If not every existing booking can be seated, no one
+        choice of those to seat is fixed beforehand.
+        '''
+
+        if not tables:
+            return False
+
+        existing_bookings = list(existing_bookings)
+        candidates = existing_bookings + [requested_booking]
+
+        if not SeatingPlan(tables, candidates).as_dict()[None]:
+            return True
+
+        if not self._searchable(candidates):
+            return False
+
+        try:
+            if not SeatingPlan(tables, existing_bookings).as_dict()[None]:
+                return self._assign(list(tables), candidates, True) is not None
+
+            before = self._assign(list(tables), existing_bookings, False)
+            after = self._assign(list(tables), candidates, False)
+        except (_OutOfTime, RecursionError):
+            return False
+
+        return sum(x is not None for x in after) > \
+            sum(x is not None for x in before)
 
 ###############################################################################
 
-def space_available(requested_booking, tables, existing_bookings):
+class StableSeatingPlan:
     '''
-    Takes a requested booking, a list of table sizes, and a list of
-    already accepted bookings, and returns True or False depending upon
-    whether a seating plan can be generated without displacing any
-    existing bookings.
+    A seating plan in which each booking keeps its table for as long as
+    it is in the plan, unless a new booking could not be placed without
+    moving it.
+
+    Bookings are given with an id, and are seated at the table they
+    hold if it is large enough and free. Any others are then seated in
+    order of covers at the smallest free table, as SeatingPlan seats
+    bookings, and those left without one are placed as a new booking
+    would be, which may move others to make room. A plan of bookings
+    that hold no tables is therefore seated as SeatingPlan would seat
+    it, except where a booking SeatingPlan leaves unseated can be
+    seated by moving others. Tables that differ from those the bookings
+    hold are listed in changes, keyed on the booking's id.
+
+    A new booking is placed at the smallest free table if there is one.
+    Failing that, the bookings in its way at one table are each moved
+    to another free table, at whichever table the fewest need to move.
+    Failing that, the bookings joined to it by overlapping one another
+    are seated again, by SeatingPlan or else by an ExactEngine with the
+    given step_budget, with the tables of each size relabelled so that
+    as many bookings as possible keep their table. Bookings are checked
+    first for a moment when there are too many to seat, so that a full
+    restaurant refuses bookings without searching. The search is only
+    limited by steps, so whether a booking can be placed never depends
+    on how long the search takes.
     '''
 
-    if not tables:
+    def __init__(self, tables, items=None, step_budget=200):
+        '''
+        Takes a list of table sizes and, optionally, a list of (id,
+        booking) pairs to seat. The table's number is taken from its
+        index in the given list.
+        '''
+
+        self.tables = list(tables)
+        self._engine = ExactEngine(time_budget=None, step_budget=step_budget)
+
+        self._tables_by_size = sorted(
+            range(len(self.tables)),
+            key=lambda n: self.tables[n]
+        )
+        self._sizes = [self.tables[n] for n in self._tables_by_size]
+
+        '''
+        Each booking is also given a key from the order in which it was
+        added, by which the bookings at each table are indexed.
+        '''
+
+        self._sequence = 0
+        self._keys = {}
+        self._ids = {}
+        self._bookings = OrderedDict()
+        self._table_of = {}
+        self._seated = [TableSchedule() for _ in self.tables]
+
+        items = list(items or [])
+        pending = []
+
+        if instrumentation.enabled:
+            instrumentation.count('bookings_scanned', len(items))
+
+        for id, booking in items:
+            self._add(id, booking)
+
+            if self._holds_free_table(booking):
+                self._seat(id, booking.table)
+            else:
+                pending.append(id)
+
+        pending.sort(key=lambda id: self._bookings[id].covers)
+        unseated = []
+
+        for id in pending:
+            booking = self._bookings[id]
+
+            for table in self._fitting(booking.covers):
+                if not self._conflicts(table, booking):
+                    self._seat(id, table)
+                    break
+            else:
+                unseated.append(id)
+
+        for id in unseated:
+            moves = self.place(self._bookings[id], excluding=id)
+
+            if moves is not None:
+                self._apply(id, moves)
+
+        self.changes = OrderedDict(
+            (id, table)
+            for id, table in self._table_of.items()
+            if table != self._bookings[id].table
+        )
+
+##############################
+
+    def _add(self, id, booking):
+        key = self._sequence
+        self._sequence += 1
+
+        self._keys[id] = key
+        self._ids[key] = id
+        self._bookings[id] = booking
+        self._table_of[id] = None
+
+##############################
+
+    def _seat(self, id, table):
+        '''
+        Moves the booking with the given id to the given table, or
+        leaves it unseated if the table is None.
+        '''
+
+        key = self._keys[id]
+        booking = self._bookings[id]
+        current = self._table_of[id]
+
+        if current is not None:
+            self._seated[current].remove(key, booking)
+
+        if table is not None:
+            self._seated[table].add(key, booking)
+
+        self._table_of[id] = table
+
+##############################
+
+    def _apply(self, id, moves):
+        '''
+        Makes the given moves, as given by place, seating the booking
+        with the given id at the table keyed on None. Moves of bookings
+        that are not in the plan are ignored.
+        '''
+
+        for other_id, table in moves.items():
+            if other_id is not None and other_id in self._table_of:
+                self._seat(other_id, table)
+
+        self._seat(id, moves[None])
+
+##############################
+
+    def _holds_free_table(self, booking):
+        table = booking.table
+
+        return table is not None and 0 <= table < len(self.tables) and \
+            self.tables[table] >= booking.covers and \
+            not self._conflicts(table, booking)
+
+##############################
+
+    def _fitting(self, covers):
+        '''
+        Returns the tables with room for the given covers, smallest
+        first.
+        '''
+
+        return self._tables_by_size[bisect_left(self._sizes, covers):]
+
+##############################
+
+    def _conflicts(self, table, booking, excluding=None):
+        '''
+        Returns the ids of the bookings seated at the given table that
+        overlap the given booking, other than the one with the given id
+        to exclude.
+        '''
+
+        keys = self._seated[table].overlapping(booking)
+
+        if instrumentation.enabled:
+            instrumentation.count('overlap_comparisons', len(keys))
+
+        return [
+            self._ids[key] for key in keys
+            if self._ids[key] != excluding
+        ]
+
+##############################
+
+    def _relocate(self, table, booking, excluding):
+        '''
+        Returns the moves that would seat the given booking at the given
+        table by moving each booking in its way to another free table,
+        or None if they cannot all be moved.
+        '''
+
+        moves = {None: table}
+        arrivals = {}
+
+        for id in self._conflicts(table, booking, excluding):
+            other = self._bookings[id]
+
+            for target in self._fitting(other.covers):
+                if target == table or \
+                    self._conflicts(target, other, excluding) or \
+                    any(other.overlaps(x) for x in arrivals.get(target, ())):
+                    continue
+
+                moves[id] = target
+                arrivals.setdefault(target, []).append(other)
+                break
+            else:
+                return None
+
+        return moves
+
+##############################
+
+    def _run_of(self, booking, excluding):
+        '''
+        Returns the ids of the seated bookings, other than the one with
+        the given id to exclude, that are joined to the given booking
+        by a run of bookings each overlapping the next. Bookings outside
+        the run overlap none within it, so they can keep their tables
+        whatever happens within it.
+        '''
+
+        def span(x):
+            return min(x.start, x.finish), max(x.start, x.finish)
+
+        seated = sorted(
+            (span(self._bookings[x]), n, x)
+            for n, (x, table) in enumerate(self._table_of.items())
+            if table is not None and x != excluding
+        )
+        first, last = span(booking)
+
+        '''
+        The run is widened from the given booking's span until no
+        booking that overlaps the run is left outside it.
+        '''
+
+        found = {}
+        widened = True
+
+        while widened:
+            widened = False
+
+            for (start, finish), n, x in seated:
+                if start >= last:
+                    break
+
+                if x not in found and finish > first:
+                    found[x] = n
+
+                    if start < first or finish > last:
+                        first, last = min(first, start), max(last, finish)
+                        widened = True
+
+        return sorted(found, key=found.get)
+
+##############################
+
+    def _crowded(self, booking, excluding):
+        '''
+        Returns True if, at the start of the given booking or of any
+        seated booking under way while it is, the bookings under way
+        could not each be given their own table, leaving out the one
+        with the given id to exclude. No moves could then seat the given
+        booking.
+        '''
+
+        bookings = [
+            self._bookings[x]
+            for table in range(len(self.tables))
+            for x in self._conflicts(table, booking, excluding)
+        ]
+        sizes = sorted(self.tables, reverse=True)
+        moments = [booking.start] + [
+            x.start for x in bookings
+            if booking.start < x.start < booking.finish
+        ]
+
+        for moment in moments:
+            covers = sorted(
+                (
+                    x.covers for x in bookings + [booking]
+                    if x.start <= moment < x.finish
+                ),
+                reverse=True
+            )
+
+            if len(covers) > len(sizes) or \
+                any(n > size for n, size in zip(covers, sizes)):
+                return True
+
         return False
 
-    previous_overflow = seating_plan(tables, existing_bookings)[None]
+##############################
+
+    def _replan(self, booking, excluding):
+        '''
+        Returns the moves that would seat the given booking by seating
+        again the bookings in its run, as given by _run_of, or None if
+        they cannot all be seated along with it.
+        '''
+
+        booking_ids = self._run_of(booking, excluding)
+        bookings = [self._bookings[x] for x in booking_ids] + [booking]
+
+        plan = SeatingPlan(self.tables, bookings).as_dict()
+
+        if plan[None]:
+            if not ExactEngine._searchable(bookings):
+                return None
+
+            try:
+                assigned = self._engine._assign(self.tables, bookings, True)
+            except (_OutOfTime, RecursionError):
+                return None
+
+            if assigned is None:
+                return None
+
+            plan = ExactEngine._as_plan(self.tables, bookings, assigned)
+
+        position = {id(x): n for n, x in enumerate(bookings)}
+        booking_ids.append(None)
+
+        groups = {
+            table: [booking_ids[position[id(x)]] for x in seated]
+            for table, seated in plan.items()
+            if table is not None
+        }
+
+        '''
+        The tables of each size are interchangeable, so each group of
+        bookings is given the table of its size that most of them are
+        already seated at, taking the largest such groups first.
+        '''
 
-    supposed_bookings = existing_bookings + [requested_booking]
+        pairs = sorted(
+            (
+                (
+                    -sum(self._table_of.get(x) == original for x in group),
+                    table,
+                    original
+                )
+                for table, group in groups.items()
+                for original in groups
+                if self.tables[original] == self.tables[table]
+            )
+        )
+        labels = {}
+
+        for _, table, original in pairs:
+            if table not in labels and original not in labels.values():
+                labels[table] = original
+
+        moves = {}
+
+        for table, group in groups.items():
+            for x in group:
+                if x is None or self._table_of[x] != labels[table]:
+                    moves[x] = labels[table]
+
+        return moves
+
+##############################
+
+    def place(self, booking, excluding=None):
+        '''
+        Works out where the given booking would be seated if it were
+        added, leaving the booking with the given id out of the plan if
+        one is given. Returns a dictionary mapping the ids of the
+        bookings that would move to their new table, with the given
+        booking's table keyed on None, or None if it cannot be seated
+        without leaving another booking unseated. The plan itself is
+        unchanged.
+        '''
+
+        fitting = self._fitting(booking.covers)
+
+        for table in fitting:
+            if not self._conflicts(table, booking, excluding):
+                return {None: table}
+
+        if not fitting or self._crowded(booking, excluding):
+            return None
+
+        best = None
+
+        for table in fitting:
+            moves = self._relocate(table, booking, excluding)
+
+            if moves is not None and (best is None or len(moves) < len(best)):
+                best = moves
+
+        if best is not None:
+            return best
+
+        return self._replan(booking, excluding)
+
+##############################
+
+    def fits(self, booking):
+        '''
+        Returns True or False depending upon whether the given booking
+        could be added without leaving any booking in the plan unseated.
+        The plan is left unchanged.
+        '''
+
+        return self.place(booking) is not None
+
+##############################
+
+    def fits_replacing(self, id, replacement):
+        '''
+        Returns True or False depending upon whether the given
+        replacement could be added once the booking with the given id
+        is left out, as fits.
+        '''
+
+        return self.place(replacement, excluding=id) is not None
+
+##############################
+
+    def insert(self, id, booking, moves=None):
+        '''
+        Adds the given booking under the given id, making the given
+        moves as given by place, or those that place gives if none are
+        given. Returns True or False depending upon whether the booking
+        was seated. If it was not, no other booking is moved.
+        '''
+
+        if moves is None:
+            moves = self.place(booking)
+
+        self._add(id, booking)
+
+        if moves is None:
+            return False
+
+        self._apply(id, moves)
+
+        return True
+
+##############################
+
+    def remove(self, id):
+        '''
+        Removes the booking with the given id from the plan, leaving
+        every other booking where it is. Returns True or False
+        depending upon whether there was such a booking in the plan.
+        '''
+
+        if id not in self._bookings:
+            return False
+
+        self._seat(id, None)
+
+        del self._ids[self._keys.pop(id)]
+        del self._bookings[id]
+        del self._table_of[id]
+        self.changes.pop(id, None)
+
+        return True
+
+##############################
+
+    def table_of(self, id):
+        '''
+        Returns the table that the booking with the given id is seated
+        at, or None.
+        '''
+
+        return self._table_of.get(id)
+
+##############################
+
+    def as_dict(self):
+        '''
+        Returns the plan in the form given by seating_plan, with the
+        bookings at each table in the order they were added.
+        '''
+
+        plan = OrderedDict(
+            (table, [])
+            for table in [None] + list(range(len(self.tables)))
+        )
+
+        for id, booking in self._bookings.items():
+            plan[self._table_of[id]].append(booking)
 
-    subsequent_overflow = seating_plan(tables, supposed_bookings)[None]
+        return plan
 
-    return previous_overflow == subsequent_overflow
+###############################################################################
+
+'''
+The engine used by seating_plan and space_available unless another is
+given.
+'''
+
+DEFAULT_ENGINE = GreedyEngine()
+
+##############################
+
+def seating_plan(tables, bookings, engine=None):
+    '''
+    Generates a seating plan as a dictionary where the keys are table
+    numbers and the values a list of bookings assigned to that table.
+
+    The given tables should be a list of positive integers denoting a
+    tables size. The table's number is taken from its index in the
+    given list.
+
+    Bookings which do not fit into the seating plan are assigned to a
+    table with the key None and returned normally as part of the
+    dictionary.
+
+    Bookings are seated by the given SeatingEngine, or DEFAULT_ENGINE
+    if none is given.
+    '''
+
+    return (engine or DEFAULT_ENGINE).plan(tables, bookings)
+
+###############################################################################
+
+def space_available(
+    requested_booking,
+    tables,
+    existing_bookings,
+    engine=None
+):
+    '''
+    Takes a requested booking, a list of table sizes, and a list of
+    already accepted bookings, and returns True or False depending upon
+    whether a seating plan can be generated without displacing any
+    existing bookings.
+
+    Plans are worked out by the given SeatingEngine, or DEFAULT_ENGINE
+    if none is given.
+    '''
+
+    return (engine or DEFAULT_ENGINE).fits(
+        requested_booking,
+        tables,
+        existing_bookings
+    )
 
 ###############################################################################
 
@@ -102,10 +1145,26 @@ def fulfills_times(opening_times, start, finish):
     start_offset = get_dateinfo(start).offset
     finish_offset = get_dateinfo(finish).offset
 
-    fulfilled = [
-        (time_opens, time_closes) for time_opens, time_closes in opening_times
-        if start_offset >= time_opens and finish_offset <= time_closes
-    ]
+    '''
+    Valid OpeningTimes keep an index from which the periods fulfilling
+    the window can be found without looking through each of them.
+    '''
+
+    if isinstance(opening_times, OpeningTimes):
+        index = opening_times.periods_index()
+    else:
+        index = None
+
+    if index is None:
+        fulfilled = [
+            (time_opens, time_closes)
+            for time_opens, time_closes in opening_times
+            if start_offset >= time_opens and finish_offset <= time_closes
+        ]
+    elif not index.is_open(start_offset, finish_offset):
+        return OpeningTimes()
+    else:
+        fulfilled = index.fulfilling(start_offset, finish_offset)
 
     '''
     Simple case: a single opening time fulfills the start and finish.
@@ -118,6 +1177,11 @@ def fulfills_times(opening_times, start, finish):
     Otherwise we need to check for a possible chain of adjacent opening times.
     '''
 
+    if index is not None:
+        return OpeningTimes(
+            index.chain_fulfilling(start_offset, finish_offset)
+        )
+
     adjacent_groups = []
     current_group = list()
 
@@ -130,7 +1194,7 @@ def fulfills_times(opening_times, start, finish):
             current_group.append(opening_times[n])
         else:
             adjacent_groups.append(current_group)
-            current_group = list().append(opening_times[n])
+            current_group = [opening_times[n]]
 
     if current_group:
         adjacent_groups.append(current_group)
@@ -154,7 +1218,15 @@ def opens_within_times(opening_times, start, finish):
 
     start_offset = get_dateinfo(start).offset
     finish_offset = get_dateinfo(finish).offset
-    
+
+    if isinstance(opening_times, OpeningTimes):
+        index = opening_times.periods_index()
+    else:
+        index = None
+
+    if index is not None:
+        return OpeningTimes(index.opening_between(start_offset, finish_offset))
+
     return OpeningTimes(
         [
             (time_opens, time_closes) for time_opens, time_closes in opening_times
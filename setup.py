@@ -6,8 +6,12 @@ setup(
     version='0.1',
     description='Manages restaurant bookings and seating plans.',
     packages=['restbook'],
+    python_requires='>=3.7',
     test_suite='nose.collector',
     install_requires=[],
+    extras_require={
+        'analytics': ['numpy'],
+    },
     tests_require=[
         'hypothesis',
         'nose',